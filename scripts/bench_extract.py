@@ -0,0 +1,120 @@
+"""PDF 抽取后端基准：逐个后端转换同一批 PDF（不用缓存），比较吞吐量，并确认识别结果是否一致。
+
+第一个后端（默认 markitdown）作为基准，其余后端的 flags 逐文件、逐类别与它比较。
+
+用法（项目根目录）：
+    PYTHONPATH=src python scripts/bench_extract.py --input-dir data/raw/CN
+    PYTHONPATH=src python scripts/bench_extract.py --input-dir data/raw --lang en --backends markitdown,pdfium
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from servitization.io_markitdown import convert_file_to_text, extract_options, pdf_backend_names
+from servitization.profiling import EventRecorder, collecting
+
+
+def page_count(path: Path):
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return None
+    doc = pdfium.PdfDocument(str(path))
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def classifier(lang: str):
+    """按语言取“已抽取全文 -> 结果行”的函数（含章节定位），与流水线一致"""
+    if lang == "en":
+        from servitization.pipeline import classify_document
+
+        return classify_document
+    from servitization_cn.pipeline_cn import classify_document_cn
+
+    return classify_document_cn
+
+
+def run_backend(paths: List[Path], backend: str, pages, classify, section: bool) -> Dict:
+    extract = extract_options(backend, pages)
+    seconds, chars, fallbacks, flags = 0.0, 0, 0, {}
+    for path in paths:
+        with collecting(EventRecorder()) as recorder:
+            t0 = time.perf_counter()
+            text = convert_file_to_text(path, extract=extract)
+            seconds += time.perf_counter() - t0
+        fallbacks += sum(e.fields.get("fallbacks", 0) for e in recorder.events if e.name == "convert")
+        chars += len(text)
+        flags[path.name] = classify("", 0, text, str(path), section=section)["flags"]
+    return {"seconds": seconds, "chars": chars, "fallbacks": fallbacks, "flags": flags}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF text extraction backends on throughput and detection results.")
+    parser.add_argument("--input-dir", type=str, default="data/raw/CN")
+    parser.add_argument("--lang", choices=["en", "cn"], default="cn")
+    parser.add_argument(
+        "--backends",
+        type=str,
+        default=",".join(pdf_backend_names()),
+        help="Comma-separated backends; the first one is the reference (default: all registered)",
+    )
+    parser.add_argument("--pdf-pages", type=str, default=None, help="Page range for page-level backends, e.g. 1-120")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N PDFs")
+    parser.add_argument("--full-text", action="store_true", help="Classify the whole text instead of the business section")
+    parser.add_argument("--output-json", type=str, default=None, help="Optional: save the measurements")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.input_dir).rglob("*") if p.suffix.lower() == ".pdf")
+    if args.limit:
+        paths = paths[: args.limit]
+    if not paths:
+        sys.exit(f"[ERROR] No PDF files under {args.input_dir}")
+    n_pages = sum(page_count(p) or 0 for p in paths)
+    classify = classifier(args.lang)
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    results = {}
+    for backend in backends:
+        pages = args.pdf_pages if backend != "markitdown" else None
+        print(f"[INFO] {backend}: converting {len(paths)} PDFs ...", flush=True)
+        results[backend] = run_backend(paths, backend, pages, classify, not args.full_text)
+
+    ref_name = backends[0]
+    ref = results[ref_name]
+    print(f"{len(paths)} PDFs, {n_pages} pages; reference backend: {ref_name}")
+    print(f"{'backend':<12}{'seconds':>9}{'pages/s':>9}{'Mchar/s':>9}{'speedup':>9}{'fallback':>9}{'files ok':>10}{'flags ok':>10}")
+    for name, res in results.items():
+        same_files = sum(res["flags"][f] == ref["flags"][f] for f in ref["flags"])
+        cells = [(f, c) for f in ref["flags"] for c in ref["flags"][f]]
+        same_flags = sum(res["flags"][f][c] == ref["flags"][f][c] for f, c in cells)
+        sec = res["seconds"] or 1e-9
+        print(
+            f"{name:<12}{res['seconds']:9.2f}{n_pages / sec:9.1f}{res['chars'] / sec / 1e6:9.2f}"
+            f"{ref['seconds'] / sec:8.1f}x{res['fallbacks']:9d}"
+            f"{same_files:>6}/{len(paths):<3}{same_flags:>6}/{len(cells):<3}"
+        )
+        for f in ref["flags"]:
+            diff = [
+                f"{c} {ref_name}={ref['flags'][f][c]} {name}={res['flags'][f][c]}"
+                for c in ref["flags"][f]
+                if res["flags"][f][c] != ref["flags"][f][c]
+            ]
+            if diff:
+                print(f"    {f}: " + ", ".join(diff))
+
+    if args.output_json:
+        out = Path(args.output_json)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"files": len(paths), "pages": n_pages, "backends": results}, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] Measurements written to: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""冷启动基准：每次起一个新的 Python 进程，用 CLI 识别一份 .txt，测端到端耗时。
+
+调度器里每个任务都是一个短命进程，小输入时启动开销（解释器 + 导入）占大头；
+pandas / markitdown / spaCy 等重依赖应当只在第一次用到时才导入。中位数超过 --target-ms 时以退出码 1 结束。
+
+用法（项目根目录）：
+    PYTHONPATH=src python scripts/bench_startup.py --runs 10 --target-ms 200
+    PYTHONPATH=src python scripts/bench_startup.py --lang cn --show-imports 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from servitization.synthetic import write_corpus
+
+
+SRC_DIR = str(Path(__file__).resolve().parent.parent / "src")
+CLI_MODULES = {"en": "servitization.pipeline", "cn": "servitization_cn.pipeline_cn"}
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (SRC_DIR, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def time_command(cmd: List[str], runs: int) -> List[float]:
+    """每次都起新进程，返回各次的墙钟耗时（秒）"""
+    env = _env()
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def top_imports(module: str, n: int) -> List[tuple]:
+    """python -X importtime 里累计耗时最多的顶层导入（不含解释器自身启动时的导入）"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    rows = []
+    for line in out.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            rows.append((int(m.group(2)), len(m.group(3)), m.group(4)))
+    rows = [(us, name) for us, depth, name in rows if depth <= 3]
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the CLI on one .txt file.")
+    parser.add_argument("--lang", choices=["en", "cn"], default="en")
+    parser.add_argument("--chars", type=int, default=50_000, help="Size of the synthetic report")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh processes per measurement")
+    parser.add_argument("--target-ms", type=float, default=200.0, help="Budget for the median end-to-end run")
+    parser.add_argument("--show-imports", type=int, default=0, help="Also list the N slowest imports of the CLI module")
+    args = parser.parse_args()
+
+    module = CLI_MODULES[args.lang]
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        write_corpus(work / "in", args.lang, 1, args.chars)
+        cli = [
+            sys.executable, "-m", module,
+            "--input-dir", str(work / "in"),
+            "--output-csv", str(work / "out.csv"),
+            "--output-json", str(work / "out.json"),
+            "--no-cache",
+        ]
+        results = {
+            "interpreter": time_command([sys.executable, "-c", "pass"], args.runs),
+            "import": time_command([sys.executable, "-c", f"import {module}"], args.runs),
+            "classify 1 txt": time_command(cli, args.runs),
+        }
+
+    print(f"{'measurement':<18}{'median ms':>11}{'min ms':>9}")
+    for name, times in results.items():
+        print(f"{name:<18}{statistics.median(times) * 1000:11.1f}{min(times) * 1000:9.1f}")
+
+    if args.show_imports:
+        print(f"slowest imports of {module}:")
+        for us, name in top_imports(module, args.show_imports):
+            print(f"  {us / 1000:8.1f} ms  {name}")
+
+    median_ms = statistics.median(results["classify 1 txt"]) * 1000
+    if median_ms > args.target_ms:
+        print(
+            f"[ERROR] Cold run takes {median_ms:.0f} ms, above the {args.target_ms:.0f} ms target",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    print(f"[INFO] Cold run {median_ms:.0f} ms is within the {args.target_ms:.0f} ms target")
+
+
+if __name__ == "__main__":
+    main()
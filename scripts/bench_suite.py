@@ -0,0 +1,330 @@
+"""分阶段基准测试：在合成 EN/CN 语料（可选加上 data/raw 里的真实 PDF）上测各阶段耗时，
+结果追加到 JSON 历史文件，与历史基线相比变慢超过阈值时以退出码 1 结束。
+计时前先核对英文语料上逐页流式识别（--stream）与整篇识别的 flags 和证据完全一致，以及两种语言上短语索引
+用当前词表算出的 flags（--phrase-index / eval_keywords.py 的基线）与检测器完全一致，不一致时同样以退出码 1 结束。
+
+阶段：convert（读入/抽取）、section（章节定位）、normalize（匹配前的文本归一化）、match（词表匹配）、
+negation（否定判断）、evidence（证据片段）、classify（完整识别）、output（写 CSV/JSON）、
+pipeline（端到端 run_pipeline）。
+
+用法（项目根目录）：
+    PYTHONPATH=src python scripts/bench_suite.py --sizes 100000,1000000 --docs 5
+    PYTHONPATH=src python scripts/bench_suite.py --pdf-fixtures --threshold 0.3
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from servitization.config_keywords import KEYWORDS
+from servitization.detector import (
+    MATCHER,
+    NEGATION,
+    build_row,
+    classify_pages,
+    classify_services,
+    evidence_snippet,
+    preprocess_text,
+)
+from servitization.io_markitdown import PAGE_BREAK, convert_file_to_text
+from servitization.normalize import normalize_text
+from servitization.output import RowWriter
+from servitization.phrase_index import PhraseHitIndex
+from servitization.pipeline import run_pipeline
+from servitization.sections import extract_business_sections_cn, extract_item1
+from servitization.synthetic import write_corpus
+from servitization_cn.config_keywords_cn import KEYWORDS_CN
+from servitization_cn.detector_cn import (
+    MATCHER_CN,
+    NEGATION_CN,
+    build_row_cn,
+    classify_services_cn,
+    evidence_snippet_cn,
+)
+from servitization_cn.pipeline_cn import run_pipeline_cn
+
+
+DEF_HISTORY = "data/bench/history.json"
+DEF_SIZES = "100000,1000000"
+DEF_RAW_DIR = "data/raw"
+
+# 短语索引核对时另加的英文文本：同一类别里被否定的长短语包含一个落在否定窗口外的短短语
+INDEX_CASES_EN = [
+    "we did not provide cloud-based service professional consulting iot service technical training to customers",
+]
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _quiet(func: Callable[[], object]) -> Callable[[], object]:
+    """屏蔽流水线的 [INFO] 输出，避免打乱结果表"""
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+
+    return run
+
+
+def check_stream_en(texts: List[str]) -> None:
+    """逐页流式识别（classify_pages）与整篇识别（classify_services）的 flags 和证据必须完全一致"""
+    for i, text in enumerate(texts):
+        pages = text.split(PAGE_BREAK)
+        streamed = classify_pages(pages)[:2]
+        if streamed != classify_services("".join(page + "\n" for page in pages)):
+            raise SystemExit(f"[ERROR] streaming classifier disagrees with classify_services on document {i}")
+
+
+def check_phrase_index(lang: str, texts: List[str], classify: Callable, keywords: Dict[str, List[str]]) -> None:
+    """短语索引按当前词表算出的 flags（PhraseHitIndex.evaluate）必须与检测器的 flags 完全一致"""
+    index = PhraseHitIndex(lang)
+    expected = []
+    for i, text in enumerate(texts):
+        counts: Dict[str, List] = {}
+        flags = classify(text, phrase_counts=counts)[0]
+        index.add(f"DOC{i:04d}", 2024, None, counts)
+        expected.append([flags[cat] for cat in keywords])
+    index.mark_indexed(p for phrases in keywords.values() for p in phrases)
+    got = index.evaluate(keywords).flags.astype(int).tolist()
+    for i, (row, want) in enumerate(zip(got, expected)):
+        if row != want:
+            raise SystemExit(f"[ERROR] {lang} phrase index disagrees with the detector on document {i}")
+
+
+def bench_en(paths: List[Path], work: Path, repeat: int) -> Dict[str, float]:
+    texts = [convert_file_to_text(p) for p in paths]
+    check_stream_en(texts)
+    check_phrase_index("en", [extract_item1(t) for t in texts] + INDEX_CASES_EN, classify_services, KEYWORDS)
+    sections = [extract_item1(t) for t in texts]
+    raws = [preprocess_text(t) for t in sections]
+    lowers = [normalize_text(t).text for t in sections]
+    spans = [MATCHER.find_spans(low) for low in lowers]
+    neg_indexes = [NEGATION.index(low) for low in lowers]
+    rows = [build_row(f"SYN{i:04d}", 2024, *classify_services(t)) for i, t in enumerate(sections)]
+
+    def negation():
+        for low, by_cat in zip(lowers, spans):
+            idx = NEGATION.index(low)
+            for cat_spans in by_cat.values():
+                for s, e in cat_spans:
+                    NEGATION.is_negated(idx, s, e)
+
+    def evidence():
+        for raw, by_cat, idx in zip(raws, spans, neg_indexes):
+            for cat_spans in by_cat.values():
+                for s, e in cat_spans:
+                    if not NEGATION.is_negated(idx, s, e):
+                        evidence_snippet(raw, s, e)
+
+    return {
+        "convert": best_of(lambda: [convert_file_to_text(p) for p in paths], repeat),
+        "section": best_of(lambda: [extract_item1(t) for t in texts], repeat),
+        "normalize": best_of(lambda: [normalize_text(t) for t in sections], repeat),
+        "match": best_of(lambda: [MATCHER.find_spans(low) for low in lowers], repeat),
+        "negation": best_of(negation, repeat),
+        "evidence": best_of(evidence, repeat),
+        "classify": best_of(lambda: [classify_services(t) for t in sections], repeat),
+        "output": best_of(lambda: _write_rows(rows, work / "en_rows"), repeat),
+        "pipeline": best_of(
+            _quiet(lambda: run_pipeline(str(paths[0].parent), str(work / "en.csv"), cache_dir=None)),
+            repeat,
+        ),
+    }
+
+
+def bench_cn(paths: List[Path], work: Path, repeat: int) -> Dict[str, float]:
+    texts = [convert_file_to_text(p) for p in paths]
+    sections = [extract_business_sections_cn(t) for t in texts]
+    check_phrase_index("cn", sections, classify_services_cn, KEYWORDS_CN)
+    normalized = [normalize_text(t).text for t in sections]
+    positions = [MATCHER_CN.positions_by_phrase(t) for t in normalized]
+    neg_indexes = [NEGATION_CN.index(t) for t in normalized]
+    rows = [
+        build_row_cn(f"9{i:05d}", 2024, *classify_services_cn(t)[:2]) for i, t in enumerate(sections)
+    ]
+
+    def negation():
+        for text, by_phrase in zip(normalized, positions):
+            idx = NEGATION_CN.index(text)
+            for phrase, starts in by_phrase.items():
+                for s in starts:
+                    NEGATION_CN.is_negated(idx, s, s + len(phrase))
+
+    def evidence():
+        for text, by_phrase, idx in zip(normalized, positions, neg_indexes):
+            for phrase, starts in by_phrase.items():
+                for s in starts:
+                    if not NEGATION_CN.is_negated(idx, s, s + len(phrase)):
+                        evidence_snippet_cn(text, s, s + len(phrase))
+
+    return {
+        "convert": best_of(lambda: [convert_file_to_text(p) for p in paths], repeat),
+        "section": best_of(lambda: [extract_business_sections_cn(t) for t in texts], repeat),
+        "normalize": best_of(lambda: [normalize_text(t) for t in sections], repeat),
+        "match": best_of(lambda: [MATCHER_CN.positions_by_phrase(t) for t in normalized], repeat),
+        "negation": best_of(negation, repeat),
+        "evidence": best_of(evidence, repeat),
+        "classify": best_of(lambda: [classify_services_cn(t) for t in sections], repeat),
+        "output": best_of(lambda: _write_rows(rows, work / "cn_rows"), repeat),
+        "pipeline": best_of(
+            _quiet(lambda: run_pipeline_cn(str(paths[0].parent), str(work / "cn.csv"), cache_dir=None)),
+            repeat,
+        ),
+    }
+
+
+def _write_rows(rows: List[Dict], stem: Path) -> None:
+    with RowWriter(str(stem) + ".csv", str(stem) + ".json") as writer:
+        for row in rows:
+            writer.write(row)
+
+
+def bench_pdf_fixtures(raw_dir: Path, limit: int) -> Dict[str, float]:
+    """data/raw 里的真实 PDF 作为抽取阶段的夹具（不走缓存，只跑一遍，markitdown 较慢）"""
+    results = {}
+    for lang, pattern in (("en", "*.pdf"), ("cn", "CN/*.pdf")):
+        pdfs = sorted(raw_dir.glob(pattern))[:limit]
+        if pdfs:
+            results[f"{lang}/pdf/convert"] = best_of(
+                lambda pdfs=pdfs: [convert_file_to_text(p) for p in pdfs], 1
+            )
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def load_history(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def baseline(history: List[Dict], config: Dict, window: int) -> Dict[str, float]:
+    """同一配置最近 window 次记录里各阶段耗时的中位数"""
+    runs = [r for r in history if r.get("config") == config][-window:]
+    by_key: Dict[str, List[float]] = {}
+    for run in runs:
+        for key, seconds in run["results"].items():
+            by_key.setdefault(key, []).append(seconds)
+    return {key: statistics.median(values) for key, values in by_key.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage-level benchmark with regression check.")
+    parser.add_argument("--sizes", type=str, default=DEF_SIZES, help="Comma-separated chars per document")
+    parser.add_argument("--docs", type=int, default=3, help="Documents per language and size")
+    parser.add_argument("--keyword-density", type=float, default=0.05)
+    parser.add_argument("--negation-density", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lang", choices=["en", "cn", "both"], default="both")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of repetitions per stage")
+    parser.add_argument("--pdf-fixtures", action="store_true", help=f"Also time extraction of PDFs in {DEF_RAW_DIR}")
+    parser.add_argument("--pdf-limit", type=int, default=2, help="Max PDFs per language for --pdf-fixtures")
+    parser.add_argument("--history", type=str, default=DEF_HISTORY)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--window", type=int, default=5, help="Baseline = median of the last N comparable runs")
+    parser.add_argument("--no-record", action="store_true", help="Do not append this run to the history")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    langs = ["en", "cn"] if args.lang == "both" else [args.lang]
+    config = {
+        "sizes": sizes,
+        "docs": args.docs,
+        "keyword_density": args.keyword_density,
+        "negation_density": args.negation_density,
+        "seed": args.seed,
+        "langs": langs,
+        "pdf_fixtures": args.pdf_fixtures,
+    }
+
+    results: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        for lang in langs:
+            for size in sizes:
+                corpus = work / f"{lang}_{size}"
+                paths = write_corpus(
+                    corpus,
+                    lang,
+                    args.docs,
+                    size,
+                    keyword_density=args.keyword_density,
+                    negation_density=args.negation_density,
+                    seed=args.seed,
+                )
+                bench = bench_en if lang == "en" else bench_cn
+                for stage, seconds in bench(paths, work, args.repeat).items():
+                    results[f"{lang}/{size}/{stage}"] = seconds
+        if args.pdf_fixtures:
+            results.update(bench_pdf_fixtures(Path(DEF_RAW_DIR), args.pdf_limit))
+
+    history_path = Path(args.history)
+    history = load_history(history_path)
+    base = baseline(history, config, args.window)
+
+    regressions = []
+    print(f"{'stage':<32}{'ms':>10}{'baseline':>12}{'change':>9}")
+    for key, seconds in results.items():
+        ref = base.get(key)
+        line = f"{key:<32}{seconds * 1000:10.1f}"
+        if ref:
+            change = seconds / ref - 1
+            line += f"{ref * 1000:12.1f}{change:+9.1%}"
+            if change > args.threshold and (seconds - ref) * 1000 > args.min_delta_ms:
+                regressions.append(key)
+                line += "  REGRESSION"
+        print(line)
+
+    if not args.no_record:
+        history.append(
+            {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "config": config,
+                "results": results,
+            }
+        )
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(history_path, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2, ensure_ascii=False)
+        print(f"[INFO] Results appended to: {history_path}")
+
+    if regressions:
+        print(
+            f"[ERROR] {len(regressions)} stage(s) slower than baseline by more than "
+            f"{args.threshold:.0%}: {', '.join(regressions)}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""扫一遍语料，找出在多家公司里几乎一字不差的句子（治理、法律声明、会计政策等样板文字），
+把它们的摘要存成一个文件，供流水线的 --boilerplate-corpus 在识别前剔除。
+
+每篇文档先跳过数字页、删掉重复的页眉页脚（与运行时 --strip-boilerplate 的设置一致），再按句切分；
+句子去掉空白、数字记为 # 后取摘要，出现在至少 --min-firms 家公司里的句子算作样板（同一家公司的多个年份只算一次）。
+输入目录递归扫描，英文（COMPANY_YEAR.ext）和中文年报（CODE_YEAR_....ext）都认；抽取文本走与流水线相同的缓存。
+
+用法（项目根目录）：
+    PYTHONPATH=src python scripts/build_boilerplate.py --input-dir data/raw --output data/cache/boilerplate.json
+    PYTHONPATH=src python -m servitization_cn.pipeline_cn --boilerplate-corpus data/cache/boilerplate.json
+"""
+import argparse
+import sys
+from functools import partial
+from pathlib import Path
+
+from servitization.boilerplate import (
+    DEFAULT_CORPUS_PATH,
+    DEFAULT_MIN_FIRMS,
+    BoilerplateOptions,
+    build_corpus,
+    document_passages,
+    save_corpus,
+)
+from servitization.io_markitdown import convert_file_to_text
+from servitization.parallel import run_tasks
+from servitization.pipeline import add_cache_arguments, add_extract_arguments, extract_options_from_args
+from servitization.pipeline_mixed import discover_mixed_files
+from servitization.text_cache import TextCache
+
+
+def file_passages(company, year, path, cache=None, refresh_cache=False, extract=None, options=BoilerplateOptions()):
+    """进程池里的一个任务：抽取一个文件并返回其句子摘要"""
+    text = convert_file_to_text(path, cache=cache, refresh_cache=refresh_cache, extract=extract)
+    return document_passages(text, options)
+
+
+def main():
+    defaults = BoilerplateOptions()
+    parser = argparse.ArgumentParser(
+        description="Find sentences shared by many firms (corpus boilerplate) for --boilerplate-corpus.",
+    )
+    parser.add_argument("--input-dir", type=str, default="data/raw", help="Directory searched recursively for reports")
+    parser.add_argument(
+        "--output", type=str, default=DEFAULT_CORPUS_PATH, help=f"Boilerplate file (default: {DEFAULT_CORPUS_PATH})"
+    )
+    parser.add_argument(
+        "--min-firms",
+        type=int,
+        default=DEFAULT_MIN_FIRMS,
+        help=f"A sentence is boilerplate when it occurs in at least this many firms (default: {DEFAULT_MIN_FIRMS})",
+    )
+    parser.add_argument(
+        "--min-line-repeats",
+        type=int,
+        default=defaults.min_line_repeats,
+        help="Same as the pipeline's --min-line-repeats; applied before splitting sentences",
+    )
+    parser.add_argument(
+        "--max-numeric-ratio",
+        type=float,
+        default=defaults.max_numeric_ratio,
+        help="Same as the pipeline's --max-numeric-ratio; applied before splitting sentences",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes, one task per file")
+    add_cache_arguments(parser)
+    add_extract_arguments(parser)
+    args = parser.parse_args()
+
+    if args.min_firms < 2:
+        sys.exit("[ERROR] --min-firms must be >= 2")
+    input_path = Path(args.input_dir)
+    if not input_path.exists():
+        sys.exit(f"[ERROR] Input dir not found: {args.input_dir}")
+    options = BoilerplateOptions(None, args.min_line_repeats, args.max_numeric_ratio)
+    cache = None if args.no_cache else TextCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+    func = partial(file_passages, extract=extract_options_from_args(args), options=options)
+    files = discover_mixed_files(input_path)
+    tasks = [(c, y, f, cache, args.refresh_cache) for c, y, f in files]
+
+    def docs():
+        for task, hashes, error in run_tasks(func, tasks, workers=args.workers):
+            if error is not None:
+                print(f"[ERROR] Failed to process {task[2]}: {error}", file=sys.stderr)
+                continue
+            yield task[0], hashes
+
+    hashes, info = build_corpus(docs(), min_firms=args.min_firms)
+    path = save_corpus(args.output, hashes, info, options)
+    print(
+        f"[INFO] {info['documents']} documents from {info['firms']} firms, {info['passages']:,} distinct sentences; "
+        f"{len(hashes):,} occur in >= {args.min_firms} firms"
+    )
+    print(f"[INFO] Boilerplate corpus saved to: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""候选词表的 what-if 评估：不重新转换、扫描年报，直接从短语命中索引算出新的 flags / 计数 / 分数。
+
+先用 --phrase-index 跑一遍流水线建立索引（被扫描文本存入 --doc-store），之后每次改词表：
+
+    PYTHONPATH=src python scripts/eval_keywords.py --index data/outputs/phrases_cn.npz \\
+        --add maintenance_and_repair=检修服务 --remove 维护 --move 运维服务=technical_support
+
+索引里已有的短语即时算出；只有真正的新短语（如上面的 检修服务）才会从文档库取回文本做定向扫描。
+也可以用 --keywords 传入一份完整的候选词表（JSON：{category: [phrase, ...]}）。
+"""
+import argparse
+import csv
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from servitization.evidence import DEFAULT_DOC_STORE_DIR, DocumentStore
+from servitization.phrase_index import PhraseHitIndex, compare_panels
+from servitization.scoring import Scorer
+
+
+def current_dictionary(lang: str):
+    """当前词表和计分器（只导入对应语言的检测器）"""
+    if lang == "en":
+        from servitization.config_keywords import KEYWORDS
+        from servitization.detector import SCORER
+
+        return KEYWORDS, SCORER
+    from servitization_cn.config_keywords_cn import KEYWORDS_CN
+    from servitization_cn.detector_cn import SCORER_CN
+
+    return KEYWORDS_CN, SCORER_CN
+
+
+def _split(item: str, flag: str):
+    left, sep, right = item.partition("=")
+    if not sep or not left or not right:
+        raise SystemExit(f"[ERROR] {flag} expects X=Y, got {item!r}")
+    return left, right
+
+
+def edit_dictionary(keywords: Dict[str, List[str]], add=(), remove=(), move=()) -> Dict[str, List[str]]:
+    """在词表副本上执行 --add CAT=PHRASE、--remove PHRASE、--move PHRASE=CAT"""
+    out = {cat: list(phrases) for cat, phrases in keywords.items()}
+    for item in remove:
+        for phrases in out.values():
+            if item in phrases:
+                phrases.remove(item)
+    for item in move:
+        phrase, cat = _split(item, "--move")
+        for phrases in out.values():
+            if phrase in phrases:
+                phrases.remove(phrase)
+        out.setdefault(cat, []).append(phrase)
+    for item in add:
+        cat, phrase = _split(item, "--add")
+        if phrase not in out.setdefault(cat, []):
+            out[cat].append(phrase)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a candidate keyword dictionary against a phrase hit index.")
+    parser.add_argument("--index", type=str, required=True, help="Phrase index written by --phrase-index")
+    parser.add_argument("--doc-store", type=str, default=DEFAULT_DOC_STORE_DIR, help="Document store for scanning new phrases")
+    parser.add_argument("--keywords", type=str, default=None, help="Candidate dictionary JSON (default: the current one)")
+    parser.add_argument("--add", action="append", default=[], help="CATEGORY=PHRASE (repeatable)")
+    parser.add_argument("--remove", action="append", default=[], help="PHRASE (repeatable)")
+    parser.add_argument("--move", action="append", default=[], help="PHRASE=CATEGORY (repeatable)")
+    parser.add_argument("--save-index", action="store_true", help="Write newly scanned phrases back into the index")
+    parser.add_argument("--output-csv", type=str, default=None, help="Optional: per firm-year flags and scores")
+    args = parser.parse_args()
+
+    index = PhraseHitIndex.load(args.index)
+    base_keywords, base_scorer = current_dictionary(index.lang)
+    candidate = base_keywords
+    if args.keywords:
+        with open(args.keywords, "r", encoding="utf-8") as f:
+            candidate = json.load(f)
+    candidate = edit_dictionary(candidate, args.add, args.remove, args.move)
+
+    new = index.new_phrases(candidate)
+    if new:
+        n_docs = index.scan_new_phrases(new, DocumentStore(args.doc_store))
+        print(f"[INFO] Scanned {len(new)} new phrase(s) in {n_docs} cached document(s): {', '.join(new)}")
+        if args.save_index:
+            index.save(args.index)
+            print(f"[INFO] Phrase index updated: {args.index}")
+
+    before = index.evaluate(base_keywords)
+    after = index.evaluate(candidate)
+    scorer = Scorer(list(candidate), base_scorer.category_type, base_scorer.weights, base_scorer.default_type)
+    scores = after.rescore(scorer)
+    old_scores = before.rescore(base_scorer)
+
+    print(f"{'category':<36}{'before':>8}{'after':>8}{'gained':>8}{'lost':>8}")
+    for cat, diff in compare_panels(before, after).items():
+        print(f"{cat:<36}{diff['before']:>8}{diff['after']:>8}{diff['gained']:>8}{diff['lost']:>8}")
+    print(
+        f"mean service_num {old_scores['service_num'].mean():.3f} -> {scores['service_num'].mean():.3f}, "
+        f"mean risk_score {old_scores['risk_score'].mean():.3f} -> {scores['risk_score'].mean():.3f} "
+        f"({len(index)} firm-years)"
+    )
+
+    if args.output_csv:
+        out = Path(args.output_csv)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["company", "year"] + list(scores) + after.categories)
+            for i in range(len(after.years)):
+                writer.writerow(
+                    [after.companies[i], int(after.years[i])]
+                    + [scores[c][i].item() for c in scores]
+                    + after.flags[i].tolist()
+                )
+        print(f"[INFO] Candidate results written to: {out}")
+
+
+if __name__ == "__main__":
+    main()
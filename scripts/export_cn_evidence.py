@@ -1,6 +1,16 @@
-import json
-from pathlib import Path
+import argparse
 import csv
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+from servitization.evidence import (
+    DEFAULT_DOC_STORE_DIR,
+    DocumentStore,
+    load_row_text,
+    materialize_evidence,
+)
+from servitization.output import iter_rows
+from servitization_cn.detector_cn import evidence_snippet_cn
 
 
 DEF_INPUT_JSON = "data/outputs/servitization_results_cn.json"
@@ -8,70 +18,109 @@ DEF_OUTPUT_CSV = "data/outputs/cn_evidence_flat.csv"
 DEF_OUTPUT_DIR = "data/outputs/cn_evidence"
 
 
-def load_results(path: str):
-    p = Path(path)
-    if not p.exists():
-        raise FileNotFoundError(f"Input JSON not found: {path}")
-    with p.open("r", encoding="utf-8") as f:
-        return json.load(f)
+def iter_evidence(
+    rows: Iterable[Dict],
+    companies: Optional[Sequence[str]] = None,
+    categories: Optional[Sequence[str]] = None,
+    years: Optional[Sequence[int]] = None,
+    store: Optional[DocumentStore] = None,
+) -> Iterator[tuple]:
+    """逐条产出 (company, year, category, idx, snippet)，按公司 / 类别 / 年份过滤。
 
+    偏移量证据（行里带 doc_id）从 store 取回被扫描文本再还原片段，一次只载入一份文档；
+    被过滤掉的行不会触发文档读取。
+    """
 
-def export_flat_csv(rows, csv_path: str):
-    """将 evidence 展平成一张 CSV: company, year, category, idx, snippet"""
-
-    out_path = Path(csv_path)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
+    companies = set(companies) if companies else None
+    categories = set(categories) if categories else None
+    years = set(years) if years else None
 
-    with out_path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["company", "year", "category", "idx", "snippet"])
-
-        for row in rows:
-            company = row.get("company")
-            year = row.get("year")
-            evidence = row.get("evidence") or {}
-            # evidence: {category: [snippets...]}
-            for cat, snippets in evidence.items():
-                for i, snip in enumerate(snippets):
-                    # 去掉换行，避免 CSV 过乱
-                    cleaned = str(snip).replace("\n", " ").strip()
-                    writer.writerow([company, year, cat, i, cleaned])
-
-
-def export_per_category_txt(rows, out_dir: str):
-    """按类别输出 txt，每个文件一行一个 snippet（前面带 company/year）。"""
-
-    base = Path(out_dir)
-    base.mkdir(parents=True, exist_ok=True)
-
-    # 先收集 {category: ["[company-year] snippet", ...]}
-    buckets = {}
     for row in rows:
         company = row.get("company")
         year = row.get("year")
+        if companies is not None and str(company) not in companies:
+            continue
+        if years is not None and year not in years:
+            continue
+        # evidence: {category: [snippets...]} 或 {category: [[start, end, phrase], ...]}
         evidence = row.get("evidence") or {}
+        if categories is not None:
+            evidence = {cat: v for cat, v in evidence.items() if cat in categories}
+        if not evidence:
+            continue
+        text = load_row_text(row, store)
+        if text is not None:
+            evidence = materialize_evidence(evidence, text, evidence_snippet_cn)
         for cat, snippets in evidence.items():
-            key = str(cat)
-            lst = buckets.setdefault(key, [])
-            for snip in snippets:
+            for i, snip in enumerate(snippets):
+                # 去掉换行，避免 CSV 过乱
                 cleaned = str(snip).replace("\n", " ").strip()
-                lst.append(f"[{company}-{year}] {cleaned}")
+                yield company, year, str(cat), i, cleaned
+
+
+def export_evidence(records: Iterable[tuple], csv_path: str, out_dir: str) -> int:
+    """一次遍历同时写出：
+
+    - 展平 CSV: company, year, category, idx, snippet
+    - 按类别的 txt，每个文件一行一个 snippet（前面带 company/year）
+    每个类别的 txt 在第一次遇到时打开、边读边写，不在内存里攒 bucket。返回写出的条数。
+    """
+
+    out_path = Path(csv_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    base = Path(out_dir)
+    base.mkdir(parents=True, exist_ok=True)
 
-    for cat, snippets in buckets.items():
-        # 简单处理一下文件名中的特殊字符
-        safe_cat = cat.replace("/", "_")
-        out_path = base / f"{safe_cat}.txt"
-        with out_path.open("w", encoding="utf-8") as f:
-            for line in snippets:
-                f.write(line + "\n")
+    handles = {}
+    count = 0
+    try:
+        with out_path.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["company", "year", "category", "idx", "snippet"])
+            for company, year, cat, i, snippet in records:
+                writer.writerow([company, year, cat, i, snippet])
+                txt = handles.get(cat)
+                if txt is None:
+                    # 简单处理一下文件名中的特殊字符
+                    safe_cat = cat.replace("/", "_")
+                    txt = handles[cat] = (base / f"{safe_cat}.txt").open("w", encoding="utf-8")
+                txt.write(f"[{company}-{year}] {snippet}\n")
+                count += 1
+    finally:
+        for txt in handles.values():
+            txt.close()
+    return count
 
 
 def main():
-    rows = load_results(DEF_INPUT_JSON)
-    export_flat_csv(rows, DEF_OUTPUT_CSV)
-    export_per_category_txt(rows, DEF_OUTPUT_DIR)
-    print(f"[INFO] Flat CSV written to: {DEF_OUTPUT_CSV}")
-    print(f"[INFO] Per-category TXT written under: {DEF_OUTPUT_DIR}")
+    parser = argparse.ArgumentParser(
+        description="Export CN evidence snippets to a flat CSV and per-category TXT files.",
+    )
+    parser.add_argument("--input", type=str, default=DEF_INPUT_JSON, help="Results .json or .jsonl")
+    parser.add_argument("--output-csv", type=str, default=DEF_OUTPUT_CSV)
+    parser.add_argument("--output-dir", type=str, default=DEF_OUTPUT_DIR)
+    parser.add_argument("--company", action="append", help="Only these companies (repeatable)")
+    parser.add_argument("--category", action="append", help="Only these categories (repeatable)")
+    parser.add_argument("--year", type=int, action="append", help="Only these years (repeatable)")
+    parser.add_argument(
+        "--doc-store",
+        type=str,
+        default=DEFAULT_DOC_STORE_DIR,
+        help="Document store used to materialize offset evidence (--evidence-offsets runs)",
+    )
+    args = parser.parse_args()
+
+    records = iter_evidence(
+        iter_rows(args.input),
+        companies=args.company,
+        categories=args.category,
+        years=args.year,
+        store=DocumentStore(args.doc_store),
+    )
+    count = export_evidence(records, args.output_csv, args.output_dir)
+    print(f"[INFO] {count} snippets exported")
+    print(f"[INFO] Flat CSV written to: {args.output_csv}")
+    print(f"[INFO] Per-category TXT written under: {args.output_dir}")
 
 
 if __name__ == "__main__":
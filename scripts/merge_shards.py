@@ -0,0 +1,58 @@
+"""把 --shard i/N 分片运行的结果合成一张面板，先核对没有缺失、没有重复的 firm-year。
+
+每个分片在输出 CSV 旁写有 <output>.shard.json（分片号、分到的 firm-year、配置指纹、输出路径）；
+合并前核对：1..N 个分片都在且只出现一次，各分片的流水线、识别配置和输入一致，
+每个分片的 CSV 恰好包含分到它的 firm-year，firm-year 在分片间不重复。核对不通过时不写任何输出。
+
+用法（项目根目录）：
+    PYTHONPATH=src python -m servitization.pipeline --input-dir data/raw --shard 1/4 \\
+        --output-csv data/outputs/shards/results.1.csv --output-json data/outputs/shards/results.1.json
+    ...（另外 3 个分片可以在别的机器上跑，输出拷到一起）
+    PYTHONPATH=src python scripts/merge_shards.py data/outputs/shards/results.*.csv \\
+        --output-csv data/outputs/servitization_results.csv --output-json data/outputs/servitization_results.json
+"""
+import argparse
+import sys
+
+from servitization.sharding import merge_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and merge the outputs of sharded (--shard i/N) runs.")
+    parser.add_argument("shards", nargs="+", help="Output CSV (or its .shard.json) of every shard")
+    parser.add_argument("--output-csv", type=str, required=True)
+    parser.add_argument("--output-json", type=str, default=None, help="Optional: merged JSON / JSONL results")
+    parser.add_argument(
+        "--output-parquet", type=str, default=None, help="Optional: merged Parquet / Arrow tables (requires pyarrow)"
+    )
+    parser.add_argument("--output-matrix", type=str, default=None, help="Optional: merged flag matrix .npz (requires numpy)")
+    parser.add_argument(
+        "--allow-failed",
+        action="store_true",
+        help="Accept firm-years whose files failed in their shard (they are left out, as in a single run)",
+    )
+    args = parser.parse_args()
+
+    try:
+        n = merge_shards(
+            args.shards,
+            args.output_csv,
+            output_json=args.output_json,
+            output_parquet=args.output_parquet,
+            output_matrix=args.output_matrix,
+            allow_failed=args.allow_failed,
+        )
+    except (FileNotFoundError, ValueError) as exc:
+        sys.exit(f"[ERROR] {exc}")
+    print(f"[INFO] Merged {len(args.shards)} shards, {n} firm-years")
+    print(f"[INFO] CSV results saved to: {args.output_csv}")
+    if args.output_json:
+        print(f"[INFO] JSON results saved to: {args.output_json}")
+    if args.output_parquet:
+        print(f"[INFO] Columnar results saved to: {args.output_parquet}")
+    if args.output_matrix:
+        print(f"[INFO] Flag matrix saved to: {args.output_matrix}")
+
+
+if __name__ == "__main__":
+    main()
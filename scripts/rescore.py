@@ -0,0 +1,81 @@
+"""不重新扫描文本，按另一套类别类型映射 / 权重重算 comp_count、sub_count 和 risk_score。
+
+输入可以是 --output-matrix 写出的 .npz，也可以是结果 JSON / JSONL（从中取 flags 组装矩阵）。
+
+用法（项目根目录）：
+    PYTHONPATH=src python scripts/rescore.py --input data/outputs/flags.npz \\
+        --weight substituting=3 --weight complementing=1 --output-csv data/outputs/rescored.csv
+    PYTHONPATH=src python scripts/rescore.py --lang cn --input data/outputs/servitization_results_cn.json \\
+        --type-map my_types.json
+"""
+import argparse
+import csv
+import json
+from pathlib import Path
+
+from servitization.output import iter_rows
+from servitization.scoring import FlagPanel
+
+
+DEF_OUTPUT_CSV = "data/outputs/rescored.csv"
+
+
+def default_scorer(lang: str):
+    # 只导入对应语言的检测器（取其 SCORER 的类别顺序和默认映射）
+    if lang == "en":
+        from servitization.detector import SCORER
+
+        return SCORER
+    from servitization_cn.detector_cn import SCORER_CN
+
+    return SCORER_CN
+
+
+def parse_weights(items):
+    weights = {}
+    for item in items or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"--weight expects TYPE=WEIGHT, got {item!r}")
+        weights[name] = float(value)
+    return weights or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score a results panel with other category types or weights.")
+    parser.add_argument("--input", type=str, required=True, help="Flag matrix .npz, or results .json / .jsonl")
+    parser.add_argument("--lang", choices=["en", "cn"], default="en", help="Default category types and weights")
+    parser.add_argument("--type-map", type=str, default=None, help="JSON file {category: type} overriding CATEGORY_TYPE")
+    parser.add_argument("--weight", action="append", help="TYPE=WEIGHT, e.g. substituting=2.0 (repeatable)")
+    parser.add_argument("--output-csv", type=str, default=DEF_OUTPUT_CSV)
+    args = parser.parse_args()
+
+    scorer = default_scorer(args.lang)
+    type_map = None
+    if args.type_map:
+        with open(args.type_map, "r", encoding="utf-8") as f:
+            type_map = {**scorer.category_type, **json.load(f)}
+    scorer = scorer.with_config(category_type=type_map, weights=parse_weights(args.weight))
+
+    if Path(args.input).suffix.lower() == ".npz":
+        panel = FlagPanel.load(args.input)
+    else:
+        panel = FlagPanel.from_rows(iter_rows(args.input), scorer.categories)
+    scores = panel.rescore(scorer)
+
+    out = Path(args.output_csv)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    columns = list(scores)
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["company", "year"] + columns)
+        for i in range(len(panel.years)):
+            writer.writerow(
+                [panel.companies[i], int(panel.years[i])] + [scores[c][i].item() for c in columns]
+            )
+    print(f"[INFO] {len(panel.years)} firm-years re-scored with weights {scorer.weights}")
+    print(f"[INFO] Re-scored CSV written to: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,20 @@
-from .detector import classify_services, process_company_item1s, compute_supply_chain_risk
-from .config_keywords import KEYWORDS, CATEGORY_TYPE
+# 包级别的便捷入口按需导入：import servitization（或其中的轻量子模块）时不构建词表匹配器
+_EXPORTS = {
+    "classify_services": ".detector",
+    "process_company_item1s": ".detector",
+    "compute_supply_chain_risk": ".detector",
+    "KEYWORDS": ".config_keywords",
+    "CATEGORY_TYPE": ".config_keywords",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from .io_markitdown import PAGE_BREAK
+from .normalize import fold_chars
+from .profiling import stage
+
+
+# 识别前的样板文字剔除（在章节截取之后、匹配之前）：
+# - 数字为主的页：财务报表、附注明细表等，数字占（数字 + 字母 + 汉字）的比例超过 max_numeric_ratio 的页整页跳过。
+#   文本里有换页符 \f 时按页，没有时（markitdown 整份转换）按空行分隔的块；
+# - 文档内重复的行：每页都有的页眉页脚（“某某股份有限公司 2024 年年度报告全文”、“Apple Inc. | 2024 Form 10-K | 12”）、
+#   页码，在同一篇里出现 min_line_repeats 次以上的整行删掉。比较时去掉空白、数字记为 #，因此页码不同的页眉算同一行；
+#   表格行（| 开头）和太短的行不删；
+# - 语料级样板段落：治理、法律声明、会计政策等在多家公司里几乎一字不差的句子，由 scripts/build_boilerplate.py
+#   事先扫一遍语料，把出现在至少 min_firms 家公司里的句子摘要存成一个文件，运行时命中摘要的句子删掉。
+# 删掉的行连同换行一起去掉（页眉打断的句子因此接回去），删掉的页和句子换成一个换行。
+
+DEFAULT_MIN_LINE_REPEATS = 5
+DEFAULT_MAX_NUMERIC_RATIO = 0.5
+DEFAULT_MIN_FIRMS = 3
+DEFAULT_CORPUS_PATH = "data/cache/boilerplate.json"
+CORPUS_VERSION = 1
+
+MIN_LINE_CHARS = 6  # 去掉空白后短于此的行（“单位：元”、“公司”）不当作页眉
+MIN_PAGE_CHARS = 100  # 数字 + 字母 + 汉字少于此的页 / 块不做数字占比判断
+MIN_PASSAGE_CHARS = 20  # 去掉空白后短于此的句子不计入语料级样板
+
+_SPACES_RE = re.compile(r"\s+")
+_LINE_SPACES_RE = re.compile(r"[^\S\n]+")
+_DIGITS_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"[A-Za-z\u3400-\u4dbf\u4e00-\u9fff]+")
+_BLOCK_SPLIT_RE = re.compile(r"(\n[^\S\n]*\n)")
+_PAGE_SPLIT_RE = re.compile("(" + PAGE_BREAK + ")")
+# 页码行：12、- 12 -、第 12 页、第 12 页 共 80 页、12/80、Page 12 of 80
+_PAGE_NUMBER_RE = re.compile(r"^(?:-?#-?|第#页(?:共#页)?|#/#|page#(?:of#)?)$")
+# 句子的结尾：中文句末标点、英文句末标点后接空白、空行或换页
+_PASSAGE_END_RE = re.compile(r"[。！？；!?;]|\.(?=\s)|\n[^\S\n]*\n|\f")
+
+
+class BoilerplateOptions(NamedTuple):
+    """样板剔除的设置：corpus 为语料级样板摘要文件（None 表示不用）；min_line_repeats 为 0 时不删重复行，
+    max_numeric_ratio >= 1 时不跳过数字页"""
+
+    corpus: Optional[str] = None
+    min_line_repeats: int = DEFAULT_MIN_LINE_REPEATS
+    max_numeric_ratio: float = DEFAULT_MAX_NUMERIC_RATIO
+
+
+def numeric_ratio(text: str) -> Optional[float]:
+    """数字占（数字 + 字母 + 汉字）的比例；这些字符太少时返回 None"""
+    digits = sum(map(text.count, "0123456789"))
+    total = digits + sum(map(len, _WORD_RE.findall(text)))
+    if total < MIN_PAGE_CHARS:
+        return None
+    return digits / total
+
+
+def drop_numeric_pages(text: str, max_ratio: float) -> Tuple[str, int]:
+    """跳过数字为主的页（没有换页符时按空行分隔的块），返回 (剩下的文本, 删掉的字符数)"""
+    pieces = (_PAGE_SPLIT_RE if PAGE_BREAK in text else _BLOCK_SPLIT_RE).split(text)
+    removed = 0
+    for i in range(0, len(pieces), 2):
+        ratio = numeric_ratio(pieces[i])
+        if ratio is not None and ratio > max_ratio:
+            removed += len(pieces[i])
+            pieces[i] = "\n"
+    return ("".join(pieces), removed) if removed else (text, 0)
+
+
+def line_keys(text: str) -> List[str]:
+    """各行的比较口径：去掉空白、数字记为 #、字符折叠（整篇一次替换，不逐行调用正则）；
+    表格行和太短的行（页码除外）为空串，不参与删除"""
+    # 普通空格占空白的绝大多数，先用 str.replace 去掉，正则只处理剩下的少数
+    keys = fold_chars(_DIGITS_RE.sub("#", _LINE_SPACES_RE.sub("", text.replace(" ", "")))).split("\n")
+    for i, key in enumerate(keys):
+        if key and (key[0] == "|" or (len(key) < MIN_LINE_CHARS and not _PAGE_NUMBER_RE.match(key))):
+            keys[i] = ""
+    return keys
+
+
+def drop_repeated_lines(text: str, min_repeats: int, document: Optional[str] = None) -> Tuple[str, int]:
+    """删掉同一篇里出现 min_repeats 次以上的行（页眉页脚、页码），返回 (剩下的文本, 删掉的字符数)。
+    text 是截取的章节时传入 document（全文），次数按全文数：章节只有几页时页眉也认得出来"""
+    lines = text.split("\n")
+    keys = line_keys(text)
+    counts = Counter(k for k in (keys if document is None else line_keys(document)) if k)
+    repeated = {k for k, n in counts.items() if n >= min_repeats}
+    if not repeated:
+        return text, 0
+    kept = "\n".join(line for line, k in zip(lines, keys) if k not in repeated)
+    return kept, len(text) - len(kept)
+
+
+def iter_passages(text: str) -> Iterator[Tuple[int, int]]:
+    """把文本切成句子，逐个产出 (start, end)，首尾相接覆盖全文"""
+    start = 0
+    for m in _PASSAGE_END_RE.finditer(text):
+        yield start, m.end()
+        start = m.end()
+    if start < len(text):
+        yield start, len(text)
+
+
+def passage_hash(passage: str) -> Optional[str]:
+    """句子的摘要（去掉空白、数字记为 #、字符折叠后取 blake2b 的 8 字节）；太短的句子返回 None"""
+    key = fold_chars(_DIGITS_RE.sub("#", _SPACES_RE.sub("", passage)))
+    if len(key) < MIN_PASSAGE_CHARS:
+        return None
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def drop_passages(text: str, hashes: FrozenSet[str]) -> Tuple[str, int]:
+    """删掉摘要在 hashes 里的句子，返回 (剩下的文本, 删掉的字符数)"""
+    pieces, removed, pos = [], 0, 0
+    for start, end in iter_passages(text):
+        if passage_hash(text[start:end]) in hashes:
+            pieces.append(text[pos:start])
+            pieces.append("\n")
+            removed += end - start
+            pos = end
+    if not removed:
+        return text, 0
+    pieces.append(text[pos:])
+    return "".join(pieces), removed
+
+
+def strip_repeats(
+    text: str, options: BoilerplateOptions, document: Optional[str] = None
+) -> Tuple[str, Dict[str, int]]:
+    """只做篇内的两步：跳过数字页、删重复行（document 含义同 drop_repeated_lines）"""
+    stats = {"numeric_pages": 0, "repeated_lines": 0}
+    if options.max_numeric_ratio < 1:
+        text, stats["numeric_pages"] = drop_numeric_pages(text, options.max_numeric_ratio)
+    if options.min_line_repeats > 0:
+        text, stats["repeated_lines"] = drop_repeated_lines(text, options.min_line_repeats, document)
+    return text, stats
+
+
+def strip_boilerplate(
+    text: str, options: BoilerplateOptions, document: Optional[str] = None
+) -> Tuple[str, Dict[str, int]]:
+    """依次跳过数字页、删重复行、删语料级样板句子，返回 (剩下的文本, 统计)。
+    text 是截取的章节时传入 document（全文），重复行的次数按全文数。
+    统计为被扫描文本的字符数 chars、删掉的总字符数 removed 和各步删掉的字符数"""
+    with stage("boilerplate") as info:
+        chars = len(text)
+        text, stats = strip_repeats(text, options, document)
+        stats["corpus_passages"] = 0
+        if options.corpus is not None:
+            text, stats["corpus_passages"] = drop_passages(text, load_corpus(options.corpus).hashes)
+        stats = {"chars": chars, "removed": sum(stats.values()), **stats}
+        info.update(chars=chars, removed=stats["removed"])
+    return text, stats
+
+
+class BoilerplateCorpus(NamedTuple):
+    hashes: FrozenSet[str]
+    digest: str  # 摘要集合的指纹，写入识别配置指纹：样板文件重建后增量运行会完整重跑
+
+
+@lru_cache(maxsize=4)
+def _load_corpus(path: str, mtime_ns: int) -> BoilerplateCorpus:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != CORPUS_VERSION:
+        raise ValueError(f"Unsupported boilerplate corpus version in {path}: {data.get('version')!r}")
+    return BoilerplateCorpus(frozenset(data["hashes"]), data["digest"])
+
+
+def load_corpus(path: str) -> BoilerplateCorpus:
+    """读语料级样板文件；同一进程里按 (路径, 修改时间) 只读一次（每个 worker 的每个文件都会用到）"""
+    return _load_corpus(str(path), Path(path).stat().st_mtime_ns)
+
+
+def document_passages(text: str, options: BoilerplateOptions = BoilerplateOptions()) -> Set[str]:
+    """一篇文档里的句子摘要：先做篇内的两步，句子的切分才与运行时一致"""
+    text, _ = strip_repeats(text, options)
+    hashes = (passage_hash(text[start:end]) for start, end in iter_passages(text))
+    return {h for h in hashes if h is not None}
+
+
+def build_corpus(docs: Iterable[Tuple[str, Set[str]]], min_firms: int = DEFAULT_MIN_FIRMS) -> Tuple[List[str], Dict]:
+    """由各文档的 (company, 句子摘要) 统计语料级样板：数每个句子出现在几家公司（同一家公司的多个年份只算一次），
+    返回 (出现在至少 min_firms 家公司里的句子摘要, 统计)"""
+    firms: Dict[str, Set[str]] = {}
+    n_docs = 0
+    for company, hashes in docs:
+        firms.setdefault(company, set()).update(hashes)
+        n_docs += 1
+    counts = Counter(h for seen in firms.values() for h in seen)
+    hashes = sorted(h for h, n in counts.items() if n >= min_firms)
+    info = {"documents": n_docs, "firms": len(firms), "passages": len(counts), "min_firms": min_firms}
+    return hashes, info
+
+
+def save_corpus(path: str, hashes: List[str], info: Dict, options: BoilerplateOptions) -> Path:
+    digest = hashlib.sha256("\n".join(hashes).encode("ascii")).hexdigest()[:16]
+    data = {
+        "version": CORPUS_VERSION,
+        **info,
+        "min_line_repeats": options.min_line_repeats,
+        "max_numeric_ratio": options.max_numeric_ratio,
+        "digest": digest,
+        "hashes": hashes,
+    }
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    with open(p, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    return p
+
+
+def boilerplate_state(options: BoilerplateOptions) -> List:
+    """写入识别配置指纹的样板设置；语料级样板文件按内容指纹而不是路径计"""
+    corpus = load_corpus(options.corpus).digest if options.corpus is not None else None
+    return [corpus, options.min_line_repeats, options.max_numeric_ratio]
+
+
+def report_boilerplate(rows: Iterable[Dict]) -> None:
+    """汇总各行的样板剔除统计并打印（删掉的字符数及各步的份额）"""
+    total = Counter()
+    for row in rows:
+        total.update(row.get("boilerplate") or {})
+    if not total["chars"]:
+        return
+    print(
+        f"[INFO] Boilerplate: removed {total['removed']:,} of {total['chars']:,} chars "
+        f"({total['removed'] / total['chars']:.1%}): numeric pages {total['numeric_pages']:,}, "
+        f"repeated lines {total['repeated_lines']:,}, corpus passages {total['corpus_passages']:,}"
+    )
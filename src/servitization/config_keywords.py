@@ -112,3 +112,14 @@ CATEGORY_TYPE: Dict[str, str] = {
     "performance_based_contracts": "substituting",
     "recycling_and_process_management": "substituting",
 }
+
+# 否定提示词：命中前后 NEGATION_WINDOW 个字符内完整出现任一提示词，则该命中不计
+NEGATION_CUES: List[str] = [
+    "do not provide", "does not provide", "did not provide",
+    "do not offer", "does not offer", "did not offer",
+    "no longer provide", "no longer offered",
+    "we do not", "we don't", "does not include",
+    "not available", "without providing",
+]
+
+NEGATION_WINDOW: int = 80
@@ -1,15 +1,18 @@
 import re
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from .config_keywords import KEYWORDS, CATEGORY_TYPE
-
-# 可选：如果想用 lemma 回退，把 USE_SPACY 改 True 并安装 spaCy
-USE_SPACY = False
-nlp = None
-if USE_SPACY:
-    import spacy
-    nlp = spacy.load("en_core_web_sm", disable=["ner", "parser"])
+from .config_keywords import KEYWORDS, CATEGORY_TYPE, NEGATION_CUES, NEGATION_WINDOW
+from .evidence import EvidenceBudget, HitGroup, HitGrouper, RankedEvidence
+from .lemma import LemmaFallback, apply_lemmas, candidate_text, fallback_targets
+from .match_cache import MatchCache, category_scanner
+from .negation import NegationMatcher, PositionIndex
+from .normalize import normalize_text
+from .phrase_matcher import CategoryPhraseMatcher
+from .profiling import stage
+from .scoring import Scorer
+from .streaming import NormalizedPageBuffer
 
 
 def build_patterns(keywords_dict: Dict[str, List[str]]) -> Dict[str, re.Pattern]:
@@ -23,121 +26,359 @@ def build_patterns(keywords_dict: Dict[str, List[str]]) -> Dict[str, re.Pattern]
 
 PATTERNS = build_patterns(KEYWORDS)
 
-NEGATION_CUES = [
-    "do not provide", "does not provide", "did not provide",
-    "do not offer", "does not offer", "did not offer",
-    "no longer provide", "no longer offered",
-    "we do not", "we don't", "does not include",
-    "not available", "without providing",
-]
+# 13 类词表合成一个匹配器，一次扫描得到与逐类 PATTERNS.finditer 相同的命中
+MATCHER = CategoryPhraseMatcher(KEYWORDS)
+
+# 识别逻辑本身（不含词表）发生会影响结果的改动时递增，增量运行据此判断旧结果是否可用
+DETECTOR_VERSION = "2"
+
+
+@lru_cache(maxsize=None)
+def _matcher_for(categories: Tuple[str, ...]) -> CategoryPhraseMatcher:
+    return CategoryPhraseMatcher({c: KEYWORDS[c] for c in categories})
+
+
+NEGATION = NegationMatcher(NEGATION_CUES, before=NEGATION_WINDOW, after=NEGATION_WINDOW)
+
+
+@lru_cache(maxsize=None)
+def _phrase_matcher(phrases: Tuple[str, ...]) -> CategoryPhraseMatcher:
+    # 每个短语单独当作一个“类别”：各短语的命中互不影响（不会被同类里更长的短语吃掉）
+    return CategoryPhraseMatcher({p: [p] for p in phrases})
+
+
+def _all_phrases() -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(p for phrases in KEYWORDS.values() for p in phrases))
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
 
 
 def preprocess_text(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _phrase_hits(
+    lower_text: str,
+    neg_index,
+    negation: NegationMatcher,
+    phrases: Tuple[str, ...],
+) -> Dict[str, List]:
+    counts = {}
+    for phrase, spans in _phrase_matcher(phrases).occurrences(lower_text).items():
+        if spans:
+            marks = [[s, int(negation.is_negated(neg_index, s, e))] for s, e in spans]
+            counts[phrase] = [len(marks), sum(n for _, n in marks), marks]
+    return counts
 
 
-def has_negation_around(text: str, start: int, end: int, window: int = 80) -> bool:
-    s = max(0, start - window)
-    e = min(len(text), end + window)
-    ctx = text[s:e].lower()
-    return any(cue in ctx for cue in NEGATION_CUES)
+def count_phrase_hits(
+    text: str,
+    phrases: Optional[Sequence[str]] = None,
+    negation: Optional[NegationMatcher] = None,
+) -> Dict[str, List]:
+    """逐短语统计命中：{phrase: [hits, negated, [[start, negated], ...]]}，没有命中的短语不出现。
+
+    每个短语单独按 \\b 边界找出全部出现位置（与其他短语重叠的也算），记下每处是否被否定。
+    检测器在每个类别内部只取每个位置最长、互不重叠的短语，否定也按这个长短语判断，
+    因此短语索引要靠这些位置按候选词表重新取舍，才能与 classify_services 的结果一致。
+    phrases 默认为整个词表（用于对新短语做定向扫描）。
+    """
+    if negation is None:
+        negation = NEGATION
+    lower_text = normalize_text(text).text
+    phrases = _all_phrases() if phrases is None else tuple(dict.fromkeys(phrases))
+    return _phrase_hits(lower_text, negation.index(lower_text), negation, phrases)
+
+
+def evidence_snippet(text: str, start: int, end: int, window: int = 200) -> str:
+    """命中 [start, end) 左右各取 window 个字符作为证据片段（text 为 preprocess_text 之后的文本）"""
+    return text[max(0, start - window):min(len(text), end + window)].strip()
+
+
+def _collect_group(
+    collected: RankedEvidence,
+    category: str,
+    group: Optional[HitGroup],
+    text: str,
+    offset: int,
+    window: int,
+) -> bool:
+    """把结束的组交给 collected，按组的窗口文本（text 为归一化文本，offset 为 text[0] 的位置）去重"""
+    if group is None:
+        return False
+    return collected.add(category, group, text[max(0, group.start - window) - offset:group.end + window - offset])
+
+
+def _window_snippet(source, start: int, end: int, window: int, length: int) -> str:
+    """归一化文本中命中 [start, end) 左右各 window 个字符，取对应的原文并折叠空白作为证据片段；
+    原文已经 preprocess_text 过时与 evidence_snippet 的结果相同。source 为 NormalizedText 或 NormalizedPageBuffer"""
+    raw = source.raw_window(max(0, start - window), min(length, end + window))
+    return preprocess_text(raw)
+
+
+# lemma 回退默认用的实例；spaCy 模型在第一次真正需要词形还原时才加载
+_LEMMA_FALLBACK: Optional[LemmaFallback] = None
+
+
+def default_lemma_fallback() -> LemmaFallback:
+    global _LEMMA_FALLBACK
+    if _LEMMA_FALLBACK is None:
+        _LEMMA_FALLBACK = LemmaFallback()
+    return _LEMMA_FALLBACK
 
 
 def build_lemma_set(text: str) -> set:
-    if not USE_SPACY or nlp is None:
-        return set()
-    doc = nlp(text)
-    return {tok.lemma_.lower() for tok in doc if not tok.is_stop and tok.is_alpha}
+    return default_lemma_fallback().lemma_sets([text])[0]
+
+
+def lemma_candidates(
+    raw_text: str,
+    flags: Dict[str, int],
+) -> Tuple[Dict[str, List[str]], str]:
+    """lemma 回退要看的类别（未命中的单词短语）和要送进模型的候选句；都命中时候选句为空"""
+    targets = fallback_targets(flags, KEYWORDS)
+    return targets, candidate_text(raw_text, targets)
+
+
+def apply_lemma_fallback(
+    results: Sequence[Tuple[Dict[str, int], Dict[str, List]]],
+    candidates: Sequence[Tuple[Dict[str, List[str]], str]],
+    fallback: Optional[LemmaFallback] = None,
+) -> None:
+    """对一批文档的 (flags, evidence) 做 lemma 回退（原地修改）：所有候选句一次送进 nlp.pipe"""
+    if fallback is None:
+        fallback = default_lemma_fallback()
+    with stage("lemma") as info:
+        lemma_sets = fallback.lemma_sets([text for _, text in candidates])
+        info["docs"] = len(candidates)
+        info["chars"] = sum(len(text) for _, text in candidates)
+        info["added"] = sum(
+            apply_lemmas(flags, evidence, lemmas, targets)
+            for (flags, evidence), (targets, _), lemmas in zip(results, candidates, lemma_sets)
+        )
 
 
 def classify_services(
     item1_text: str,
     use_lemma_fallback: bool = False,
     evidence_window: int = 200,
-) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
-    """对一段文本（如年报业务描述）识别 13 类服务"""
-    raw_text = preprocess_text(item1_text)
-    lower_text = raw_text.lower()
+    negation: Optional[NegationMatcher] = None,
+    categories: Optional[Sequence[str]] = None,
+    offsets: bool = False,
+    phrase_counts: Optional[Dict[str, List[int]]] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+    match_cache: Optional[MatchCache] = None,
+) -> Tuple[Dict[str, int], Dict[str, List]]:
+    """对一段文本（如年报业务描述）识别 13 类服务
 
-    flags = {c: 0 for c in PATTERNS.keys()}
+    negation 默认使用 config_keywords 中的英文否定词表和窗口；
+    categories 只识别指定类别（增量运行时只重扫词表有变化的类别）；
+    匹配前先做归一化（见 normalize.normalize_text：空白、大小写、全角半角折叠，修复中文断行），
+    命中位置映射回 item1_text，证据片段取原文；
+    offsets=True 时证据记为 [start, end, phrase]（item1_text 中的位置，调用方应先 preprocess_text），
+    不复制片段，需要时用 evidence_snippet 按位置取出；
+    传入 phrase_counts（dict）时另外填入所识别类别各短语的 [hits, negated, 命中位置]（见 count_phrase_hits）；
+    evidence_budget 控制证据条数：窗口重叠的命中合并成一条片段（偏移量证据的 phrase 为 “a | b”），
+    重复片段只留一条，每类 / 每篇按排名（覆盖的不同短语数、命中次数）保留，默认每类 20 条；
+    传入 match_cache 时按段落归一化和扫描，没变过的段落（上一年的同一段、多家公司共有的样板）直接取缓存的
+    结果（见 match_cache.MatchCache），与不用缓存时的结果相同。
+    """
+    if negation is None:
+        negation = NEGATION
+    if evidence_budget is None:
+        evidence_budget = EvidenceBudget()
+    matcher = MATCHER if categories is None else _matcher_for(tuple(categories))
+    scan = None
+    with stage("normalize") as info:
+        if match_cache is None:
+            norm = normalize_text(item1_text)
+        else:
+            scan = match_cache.scan(item1_text, category_scanner(matcher, negation))
+            norm = scan.norm
+            info.update(paragraphs=scan.paragraphs, cached=scan.cached)
+        lower_text = norm.text
+        info["chars"] = len(lower_text)
+        info["breakpoints"] = len(norm.offsets)
+
+    flags = {c: 0 for c in matcher.categories}
     evidence = defaultdict(list)
 
-    # 1) 短语/正则匹配
-    for cat, pat in PATTERNS.items():
-        for m in pat.finditer(lower_text):
-            start, end = m.start(), m.end()
-            if has_negation_around(lower_text, start, end):
-                continue
-            flags[cat] = 1
-            ctx_start = max(0, start - evidence_window)
-            ctx_end = min(len(raw_text), end + evidence_window)
-            snippet = raw_text[ctx_start:ctx_end].strip()
-            evidence[cat].append(snippet)
-
-    # 2) 可选：lemma 回退
+    # 1) 短语/正则匹配（所有类别一次扫描）
+    with stage("match") as info:
+        spans_by_cat = matcher.find_spans(lower_text) if scan is None else matcher.select_spans(scan.matches)
+        info["matches"] = n_matches = sum(len(spans) for spans in spans_by_cat.values())
+
+    with stage("negation") as info:
+        neg_index = negation.index(lower_text) if scan is None else PositionIndex(scan.cues)
+        kept = {
+            cat: [(s, e) for s, e in spans if not negation.is_negated(neg_index, s, e)]
+            for cat, spans in spans_by_cat.items()
+        }
+        info["negated"] = n_matches - sum(len(spans) for spans in kept.values())
+
+    if phrase_counts is not None:
+        with stage("phrase_counts"):
+            phrases = tuple(dict.fromkeys(p for cat in matcher.categories for p in KEYWORDS[cat]))
+            phrase_counts.update(_phrase_hits(lower_text, neg_index, negation, phrases))
+
+    with stage("evidence") as info:
+        w = evidence_window
+        collected = RankedEvidence(evidence_budget)
+        for cat, spans in kept.items():
+            grouper = HitGrouper(w, evidence_budget.merge)
+            for start, end in spans:
+                flags[cat] = 1
+                _collect_group(collected, cat, grouper.add(start, end, lower_text[start:end]), lower_text, 0, w)
+            _collect_group(collected, cat, grouper.close(), lower_text, 0, w)
+        for cat, groups in collected.select(matcher.categories).items():
+            for g in groups:
+                if offsets:
+                    evidence[cat].append([*norm.raw_span(g.start, g.end), g.label()])
+                else:
+                    evidence[cat].append(_window_snippet(norm, g.start, g.end, w, len(lower_text)))
+        info["groups"] = collected.groups_total
+        info["snippets"] = sum(len(items) for items in evidence.values())
+
+    # 2) 可选：lemma 回退（只对未命中类别、只对候选句做词形还原）
     if use_lemma_fallback:
-        lemmas = build_lemma_set(raw_text)
-        for cat in PATTERNS.keys():
-            if flags[cat] == 0:
-                for phrase in KEYWORDS[cat]:
-                    if " " not in phrase and phrase.lower() in lemmas:
-                        flags[cat] = 1
-                        evidence[cat].append(f"lemma_match::{phrase}")
-                        break
+        apply_lemma_fallback([(flags, evidence)], [lemma_candidates(preprocess_text(item1_text), flags)])
 
     return flags, evidence
 
 
+# 英文版计分：映射里没有的类别按 complementing 计
+SCORER = Scorer(list(KEYWORDS), CATEGORY_TYPE, default_type="complementing")
+
+
 def compute_supply_chain_risk(flags: Dict[str, int]) -> float:
-    """简单供应链风险分数，可按需要调整公式"""
-    comp_count = 0
-    sub_count = 0
-    for cat, v in flags.items():
-        if v == 1:
-            t = CATEGORY_TYPE.get(cat, "complementing")
-            if t == "substituting":
-                sub_count += 1
-            else:
-                comp_count += 1
-    risk_score = sub_count * 2.0 + comp_count * 0.5
-    return risk_score
+    """简单供应链风险分数；权重和类别类型见 SCORER（换权重用 SCORER.with_config）"""
+    return SCORER.score(flags)["risk_score"]
+
+
+def build_row(company_id: str, year: int, flags: Dict[str, int], evidence) -> Dict:
+    """由 flags/evidence 组装一行输出（含 service_num、comp/sub 计数和风险分数）"""
+    return {
+        "company": company_id,
+        "year": year,
+        **SCORER.score(flags),
+        "flags": flags,
+        "evidence": dict(evidence),
+    }
 
 
 def process_company_item1s(
     company_id: str,
     item1_texts_by_year: Dict[int, str],
     use_lemma_fallback: bool = False,
+    categories: Optional[Sequence[str]] = None,
+    match_cache: Optional[MatchCache] = None,
 ):
-    """把某个公司的多个年份文本打包处理"""
-    rows = []
-    for year, txt in sorted(item1_texts_by_year.items()):
-        flags, evidence = classify_services(
-            txt,
-            use_lemma_fallback=use_lemma_fallback,
-        )
-        service_num = sum(flags.values())
-        comp_count = sum(
-            1
-            for k, v in flags.items()
-            if v == 1 and CATEGORY_TYPE.get(k, "complementing") == "complementing"
-        )
-        sub_count = sum(
-            1
-            for k, v in flags.items()
-            if v == 1 and CATEGORY_TYPE.get(k, "complementing") == "substituting"
-        )
-        risk_score = compute_supply_chain_risk(flags)
-
-        rows.append(
-            {
-                "company": company_id,
-                "year": year,
-                "service_num": service_num,
-                "comp_count": comp_count,
-                "sub_count": sub_count,
-                "risk_score": risk_score,
-                "flags": flags,
-                "evidence": dict(evidence),
-            }
+    """把某个公司的多个年份文本打包处理；lemma 回退对所有年份成批做一次。
+    各年份按段落扫描，与前几年相同的段落不再重扫：match_cache 默认是只在这一批年份之间共享的内存缓存，
+    传入持久的 MatchCache 时跨公司、跨运行复用"""
+    if match_cache is None:
+        match_cache = MatchCache(None)
+    years = sorted(item1_texts_by_year)
+    results = [
+        classify_services(item1_texts_by_year[y], categories=categories, match_cache=match_cache) for y in years
+    ]
+    if use_lemma_fallback:
+        candidates = [
+            lemma_candidates(preprocess_text(item1_texts_by_year[y]), flags)
+            for y, (flags, _) in zip(years, results)
+        ]
+        apply_lemma_fallback(results, candidates)
+    return [build_row(company_id, y, flags, evidence) for y, (flags, evidence) in zip(years, results)]
+
+
+class ServiceStreamClassifier:
+    """classify_services 的流式版本：逐页 feed，close() 时返回 (flags, evidence, evidence_pages)。
+
+    页与页之间按换行拼接后逐页归一化（与整篇 normalize_text 的结果相同），缓冲区只保留未结算的
+    文本和左右两侧的窗口，跨页短语照常命中；内存只和单页大小有关，与文档长度无关。
+    evidence_pages 与 evidence 一一对应，记录每条片段（组内第一个命中）所在的页码。不支持 lemma 回退。
+    证据的合并、去重和取舍与 classify_services 相同；合并中的组最多向左延伸约 5 个窗口，
+    缓冲区左侧相应多留一些。
+    """
+
+    def __init__(
+        self,
+        evidence_window: int = 200,
+        negation: Optional[NegationMatcher] = None,
+        evidence_budget: Optional[EvidenceBudget] = None,
+    ):
+        self.negation = NEGATION if negation is None else negation
+        self.evidence_window = evidence_window
+        self.evidence_budget = EvidenceBudget() if evidence_budget is None else evidence_budget
+        self._buf = NormalizedPageBuffer(
+            left_margin=max(5 * evidence_window + MATCHER.max_phrase_len, self.negation.before),
+            right_margin=MATCHER.max_phrase_len + max(evidence_window, self.negation.after),
         )
-    return rows
+        self._next_free = [0] * len(MATCHER.categories)
+        self.flags = {c: 0 for c in MATCHER.categories}
+        self._groupers = {c: HitGrouper(evidence_window, self.evidence_budget.merge) for c in MATCHER.categories}
+        self._collected = RankedEvidence(self.evidence_budget)
+
+    def feed(self, page_text: str) -> None:
+        self._buf.append(page_text + "\n")
+        self._scan(final=False)
+
+    def close(self) -> Tuple[Dict[str, int], Dict[str, List[str]], Dict[str, List[int]]]:
+        self._scan(final=True)
+        for cat, grouper in self._groupers.items():
+            self._collect(cat, grouper.close())
+        evidence: Dict[str, List[str]] = {}
+        evidence_pages: Dict[str, List[int]] = {}
+        for cat, groups in self._collected.select(MATCHER.categories).items():
+            evidence[cat] = [g.snippet for g in groups]
+            evidence_pages[cat] = [g.page for g in groups]
+        return self.flags, evidence, evidence_pages
+
+    def _collect(self, category: str, group: Optional[HitGroup]) -> None:
+        buf = self._buf
+        if _collect_group(self._collected, category, group, buf.buf, buf.offset, self.evidence_window):
+            group.snippet = _window_snippet(buf, group.start, group.end, self.evidence_window, buf.end)
+
+    def _scan(self, final: bool) -> None:
+        buf = self._buf
+        lo, hi = buf.pending_range(final)
+        if hi <= lo:
+            return
+        off = buf.offset
+        lower = buf.buf
+        neg_index = self.negation.index(lower)
+        next_free = [max(0, g - off) for g in self._next_free]
+        spans_by_cat = MATCHER.find_spans(lower, lo - off, hi - off, next_free)
+        self._next_free = [n + off for n in next_free]
+
+        for cat, spans in spans_by_cat.items():
+            grouper = self._groupers[cat]
+            for start, end in spans:
+                if self.negation.is_negated(neg_index, start, end):
+                    continue
+                self.flags[cat] = 1
+                closed = grouper.add(start + off, end + off, lower[start:end], buf.page_of(start + off))
+                self._collect(cat, closed)
+        if final:
+            # 最后一轮不前移缓冲区：close() 还要结算仍未结束的组，它们的窗口可能早于 hi - left_margin
+            return
+        # 之后的命中起点都不小于 hi，窗口够不到的组现在就结算（此时组的文本还在缓冲区里）
+        for cat, grouper in self._groupers.items():
+            self._collect(cat, grouper.close(before=hi))
+        buf.advance(hi)
+
+
+def classify_pages(
+    pages: Iterable[str],
+    evidence_window: int = 200,
+    negation: Optional[NegationMatcher] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+):
+    """对逐页文本流做识别，返回 (flags, evidence, evidence_pages)"""
+    stream = ServiceStreamClassifier(
+        evidence_window=evidence_window, negation=negation, evidence_budget=evidence_budget
+    )
+    for page in pages:
+        stream.feed(page)
+    return stream.close()
@@ -0,0 +1,186 @@
+import hashlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Union
+
+from .text_cache import TextCache
+
+
+# 偏移量证据的每一条是 [start, end, phrase]，位置是被扫描文本（章节截取、预处理之后）中的下标，
+# 结果行另带 doc_id 指向 DocumentStore 里的这份文本
+DEFAULT_DOC_STORE_DIR = "data/cache/docs"
+
+
+def document_id(text: str) -> str:
+    """被扫描文本的内容摘要，作为证据偏移量所属文档的 id"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentStore(TextCache):
+    """按 document_id 存放被扫描的文本，供偏移量证据按需还原片段。
+
+    存储格式与 TextCache 相同（zlib 压缩、按 id 前两位分目录），但不做 LRU 淘汰：
+    结果文件里的每个 doc_id 都要能找回原文。内容相同的文档只存一份。
+    """
+
+    def __init__(self, store_dir: Union[str, Path] = DEFAULT_DOC_STORE_DIR):
+        super().__init__(store_dir, max_bytes=0)
+
+    def add(self, text: str) -> str:
+        doc_id = document_id(text)
+        if not self._entry_path(doc_id).exists():
+            self.put(doc_id, text)
+        return doc_id
+
+    def evict(self) -> int:
+        return 0
+
+
+def is_offset_evidence(item) -> bool:
+    return isinstance(item, (list, tuple))
+
+
+def materialize_evidence(
+    evidence: Dict[str, List],
+    text: str,
+    snippet_func: Callable[[str, int, int], str],
+) -> Dict[str, List[str]]:
+    """把一行的偏移量证据还原成片段；已经是字符串的条目（如 lemma_match::）原样保留"""
+    return {
+        cat: [snippet_func(text, item[0], item[1]) if is_offset_evidence(item) else item for item in items]
+        for cat, items in evidence.items()
+    }
+
+
+def load_row_text(row: Dict, store: Optional[DocumentStore]) -> Optional[str]:
+    """取出结果行对应的被扫描文本；行里没有 doc_id（片段模式的结果）时返回 None"""
+    doc_id = row.get("doc_id")
+    if doc_id is None:
+        return None
+    if store is None:
+        raise ValueError(
+            f"Row {row.get('company')}-{row.get('year')} has offset evidence; "
+            "a document store is required to materialize snippets"
+        )
+    text = store.get(doc_id)
+    if text is None:
+        raise FileNotFoundError(f"Document {doc_id} not found in {store.cache_dir}")
+    return text
+
+
+class EvidenceBudget(NamedTuple):
+    """英文证据的预算：每类、每篇文档最多保留几条片段（0 表示不限），以及是否把窗口重叠的命中合并成一条"""
+
+    per_category: int = 20
+    per_document: int = 0
+    merge: bool = True
+
+
+class HitGroup:
+    """窗口相互重叠的一组命中（同一类别），输出为一条证据片段。
+
+    start/end 为组内第一个命中的起点和最后一个命中的终点，phrases 为覆盖的不同短语（按出现顺序）。
+    """
+
+    __slots__ = ("start", "end", "phrases", "hits", "page", "snippet")
+
+    def __init__(self, start: int, end: int, phrase: str, page: Optional[int] = None):
+        self.start = start
+        self.end = end
+        self.phrases = {phrase: None}
+        self.hits = 1
+        self.page = page
+        self.snippet: Optional[str] = None
+
+    def rank_key(self):
+        """排名：覆盖的不同短语多者优先，其次命中次数多者，再按位置先后"""
+        return -len(self.phrases), -self.hits, self.start
+
+    def label(self) -> str:
+        return " | ".join(self.phrases)
+
+
+class HitGrouper:
+    """按位置顺序接收同一类别的命中，窗口（命中左右各 window 个字符）重叠的并入当前组。
+
+    合并后的命中范围不超过 2 * window 个字符（片段不超过单条的两倍左右），超过时另起一组。
+    """
+
+    def __init__(self, window: int, merge: bool = True):
+        self.window = window
+        self.merge = merge
+        self.current: Optional[HitGroup] = None
+
+    def add(self, start: int, end: int, phrase: str, page: Optional[int] = None) -> Optional[HitGroup]:
+        """加入一个命中；当前组因此结束时返回该组"""
+        cur = self.current
+        if (
+            cur is not None
+            and self.merge
+            and start - self.window < cur.end + self.window
+            and max(end, cur.end) - cur.start <= 2 * self.window
+        ):
+            cur.end = max(end, cur.end)
+            cur.phrases[phrase] = None
+            cur.hits += 1
+            return None
+        self.current = HitGroup(start, end, phrase, page)
+        return cur
+
+    def close(self, before: Optional[int] = None) -> Optional[HitGroup]:
+        """结束并返回当前组；给定 before 时只在之后起点 >= before 的命中不可能再并入时才结束"""
+        cur = self.current
+        if cur is None or (before is not None and before - self.window < cur.end + self.window):
+            return None
+        self.current = None
+        return cur
+
+
+class RankedEvidence:
+    """逐组收集证据，同一类别中窗口文本完全相同的组只留第一次出现的；
+    每类只保留排名前 per_category 的组（定期截断，内存有上界），select 时再按文档预算取舍。"""
+
+    def __init__(self, budget: EvidenceBudget):
+        self.budget = budget
+        self.groups: Dict[str, List[HitGroup]] = defaultdict(list)
+        self._seen: Dict[str, set] = defaultdict(set)
+        self.groups_total = 0
+
+    def add(self, category: str, group: HitGroup, window_text: str) -> bool:
+        """加入一组，返回是否收下（窗口文本与同类已有的组相同时不收）；收下的组之后仍可能因排名被截掉"""
+        self.groups_total += 1
+        # 稳定的摘要而不是 hash()：不会因碰撞误删证据，各次运行的取舍也相同
+        key = hashlib.blake2b(window_text.encode("utf-8"), digest_size=16).digest()
+        seen = self._seen[category]
+        if key in seen:
+            return False
+        seen.add(key)
+        kept = self.groups[category]
+        kept.append(group)
+        k = self.budget.per_category
+        if k and len(kept) >= 2 * k:
+            kept.sort(key=HitGroup.rank_key)
+            del kept[k:]
+        return True
+
+    def select(self, categories: Iterable[str]) -> Dict[str, List[HitGroup]]:
+        """每类按排名取前 per_category 组；有文档预算时各类别按排名轮流取，直到用完预算"""
+        k = self.budget.per_category
+        ranked = {}
+        for cat in categories:
+            groups = sorted(self.groups.get(cat, ()), key=HitGroup.rank_key)
+            if groups:
+                ranked[cat] = groups[:k] if k else groups
+        limit = self.budget.per_document
+        if not limit or sum(len(g) for g in ranked.values()) <= limit:
+            return ranked
+        counts = dict.fromkeys(ranked, 0)
+        taken = 0
+        level = 0
+        while taken < limit:
+            for cat, groups in ranked.items():
+                if level < len(groups) and taken < limit:
+                    counts[cat] += 1
+                    taken += 1
+            level += 1
+        return {cat: groups[:counts[cat]] for cat, groups in ranked.items() if counts[cat]}
@@ -1,21 +1,294 @@
+import re
+import sys
 from pathlib import Path
-from typing import Union
+from typing import Callable, Dict, Iterator, NamedTuple, Optional, Tuple, Union
 
-from markitdown import MarkItDown
+from .profiling import stage
+from .text_cache import TextCache, file_digest, make_cache_key, package_version
 
 
-_md = MarkItDown()
+EXTRACTOR_NAME = "markitdown"
+PLAIN_TEXT_SUFFIXES = [".txt", ".md", ".markdown"]
+PAGE_EXTRACTOR_NAME = "pdfminer-pages"
 
+# markitdown 连同各格式转换器的依赖（pdfminer、magika、requests 等）导入要接近一秒，
+# 第一次转换非纯文本文件时才创建；全是 .txt 的短任务完全不加载
+_md = None
 
-def convert_file_to_text(path: Union[str, Path]) -> str:
-    """统一把 pdf / docx / pptx / txt 等文件转换成纯文本"""
-    p = Path(path)
+
+def _markitdown():
+    global _md
+    if _md is None:
+        from markitdown import MarkItDown
+
+        _md = MarkItDown()
+    return _md
+
+
+def __getattr__(name: str) -> str:
+    # 抽取器版本号同样按需查询，旧代码里的模块常量仍可访问
+    if name == "EXTRACTOR_VERSION":
+        return package_version("markitdown")
+    if name == "PAGE_EXTRACTOR_VERSION":
+        return package_version("pdfminer.six")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+PAGE_BREAK = "\f"
+
+
+class PdfBackend(NamedTuple):
+    """PDF 文本层抽取后端：iter_pages(path, first, last) 逐页产出文本（页码从 1 起的闭区间，None 表示不限）；
+    name 和 dist（版本号所在的发行包）写进缓存键"""
+
+    name: str
+    dist: str
+    iter_pages: Callable[[Path, Optional[int], Optional[int]], Iterator[str]]
+
+
+class ExtractOptions(NamedTuple):
+    """PDF 的抽取设置，随任务传给 worker。backend="markitdown"（默认）时整份交给 markitdown；
+    其他后端直接逐页读文本层，可用 first_page / last_page 限定页码范围，结果为空或乱码时退回 markitdown"""
+
+    backend: str = EXTRACTOR_NAME
+    first_page: Optional[int] = None
+    last_page: Optional[int] = None
+
+    @property
+    def page_range(self) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        if self.first_page is None and self.last_page is None:
+            return None
+        return self.first_page, self.last_page
+
+
+PDF_BACKENDS: Dict[str, PdfBackend] = {}
+
+
+def register_pdf_backend(name: str, dist: str, iter_pages: Callable) -> None:
+    """注册一个 PDF 文本后端（--pdf-backend 的可选值随之增加）"""
+    PDF_BACKENDS[name] = PdfBackend(name, dist, iter_pages)
+
+
+def pdf_backend_names():
+    return [EXTRACTOR_NAME] + list(PDF_BACKENDS)
+
+
+def extract_options(backend: str = EXTRACTOR_NAME, pages: Optional[str] = None) -> ExtractOptions:
+    """由 --pdf-backend / --pdf-pages（如 "1-120"、"-80"、"5-"）组装 ExtractOptions"""
+    if backend != EXTRACTOR_NAME and backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend {backend!r}; expected one of {pdf_backend_names()}")
+    if pages is None:
+        return ExtractOptions(backend)
+    if backend == EXTRACTOR_NAME:
+        raise ValueError("Page ranges need a page-level PDF backend, e.g. --pdf-backend pdfium")
+    first, sep, last = pages.partition("-")
+    try:
+        first_page = int(first) if first else None
+        last_page = int(last) if last else None
+        if not sep and first_page is not None:
+            last_page = first_page
+    except ValueError:
+        raise ValueError(f"Invalid page range {pages!r}; expected e.g. 1-120, -80 or 5-") from None
+    if (first_page is not None and first_page < 1) or (
+        first_page is not None and last_page is not None and last_page < first_page
+    ):
+        raise ValueError(f"Invalid page range {pages!r}")
+    return ExtractOptions(backend, first_page, last_page)
+
+
+# 文本层是否可用：非空白字符平均每页不少于 MIN_CHARS_PER_PAGE，且替换符、私用区字符、
+# 控制字符和 pdfminer 的 (cid:N) 占比不超过 MAX_GARBLED_RATIO（字体缺 ToUnicode 映射时的典型乱码）
+MIN_CHARS_PER_PAGE = 20
+MAX_GARBLED_RATIO = 0.02
+_GARBLED_RE = re.compile(r"[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0e-\x1f]|\(cid:\d+\)")
+_SPACE_RE = re.compile(r"\s")
+
+
+def text_layer_ok(text: str, n_pages: int) -> bool:
+    chars = len(text) - len(_SPACE_RE.findall(text))
+    if chars < MIN_CHARS_PER_PAGE * max(n_pages, 1):
+        return False
+    return len(_GARBLED_RE.findall(text)) <= MAX_GARBLED_RATIO * chars
+
+
+def convert_file_to_text(
+    path: Union[str, Path],
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    extract: Optional[ExtractOptions] = None,
+) -> str:
+    """统一把 pdf / docx / pptx / txt 等文件转换成纯文本
+
+    传入 ``cache`` 时，非纯文本文件的抽取结果按内容摘要缓存到磁盘；
+    ``refresh_cache=True`` 会忽略已有条目、重新抽取并覆盖。
+    ``extract`` 选择 PDF 的抽取后端和页码范围（默认 markitdown 整份转换），其他格式始终用 markitdown。
+    """
+    with stage("convert") as info:
+        text = _convert(Path(path), cache, refresh_cache, info, extract or ExtractOptions())
+        info["chars"] = len(text)
+    return text
+
+
+def _cache_id(p: Path, extract: ExtractOptions) -> Tuple[str, str]:
+    """缓存键里的 (抽取器名称, 版本)；markitdown 与原先的键相同，已有缓存继续有效"""
+    if p.suffix.lower() != ".pdf" or extract.backend == EXTRACTOR_NAME:
+        return EXTRACTOR_NAME, package_version("markitdown")
+    backend = PDF_BACKENDS[extract.backend]
+    name = backend.name
+    if extract.page_range is not None:
+        first, last = extract.page_range
+        name += f":pages={first or ''}-{last or ''}"
+    # 结果可能来自 markitdown 回退，两者的版本都要算进去
+    return name, f"{package_version(backend.dist)}+markitdown-{package_version('markitdown')}"
+
+
+def _convert(p: Path, cache: Optional[TextCache], refresh_cache: bool, info: dict, extract: ExtractOptions) -> str:
     suffix = p.suffix.lower()
 
-    if suffix in [".txt", ".md", ".markdown"]:
+    if suffix in PLAIN_TEXT_SUFFIXES:
         return p.read_text(encoding="utf-8", errors="ignore")
 
-    # 其他格式用 markitdown
-    result = _md.convert(str(p))
-    text = getattr(result, "text_content", "") or ""
+    key = None
+    if cache is not None:
+        key = make_cache_key(file_digest(p), *_cache_id(p, extract))
+        if not refresh_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                info["cache_hits"] = 1
+                return cached
+
+    if suffix == ".pdf" and extract.backend != EXTRACTOR_NAME:
+        text = _convert_pdf_fast(p, extract, info)
+    else:
+        # 其他格式用 markitdown
+        result = _markitdown().convert(str(p))
+        text = getattr(result, "text_content", "") or ""
+
+    if cache is not None:
+        cache.put(key, text)
     return text
+
+
+def _convert_pdf_fast(p: Path, extract: ExtractOptions, info: dict) -> str:
+    """直接读文本层；为空或乱码（扫描件、字体缺编码映射）时退回 markitdown。
+    限定了页码范围时退回 pdfminer 逐页抽取同一范围（markitdown 不能只转换部分页）"""
+    backend = PDF_BACKENDS[extract.backend]
+    pages = list(backend.iter_pages(p, extract.first_page, extract.last_page))
+    text = PAGE_BREAK.join(pages)
+    if text_layer_ok(text, len(pages)):
+        return text
+    info["fallbacks"] = 1
+    if extract.page_range is None:
+        print(f"[WARN] {backend.name} text layer of {p} is empty or garbled; falling back to markitdown", file=sys.stderr)
+        result = _markitdown().convert(str(p))
+        return getattr(result, "text_content", "") or ""
+    print(f"[WARN] {backend.name} text layer of {p} is empty or garbled; falling back to pdfminer", file=sys.stderr)
+    return PAGE_BREAK.join(_iter_pdf_pages(p, extract.first_page, extract.last_page))
+
+
+def _iter_pdf_pages(path: Path, first: Optional[int] = None, last: Optional[int] = None) -> Iterator[str]:
+    """用 pdfminer 逐页抽取文本层，一次只在内存里保留一页的版面对象"""
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    page_numbers = None
+    if first is not None or last is not None:
+        if last is None:
+            from pdfminer.pdfpage import PDFPage
+
+            with open(path, "rb") as f:
+                last = sum(1 for _ in PDFPage.get_pages(f))
+        page_numbers = range((first or 1) - 1, last)
+    for layout in extract_pages(str(path), page_numbers=page_numbers):
+        yield "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+
+
+def _iter_pdfium_pages(path: Path, first: Optional[int] = None, last: Optional[int] = None) -> Iterator[str]:
+    """用 pypdfium2（PDFium）直接读取每页的文本层，不做版面分析，比 pdfminer / markitdown 快一个数量级"""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError as exc:
+        raise ImportError("The pdfium PDF backend requires pypdfium2: pip install pypdfium2") from exc
+
+    doc = pdfium.PdfDocument(str(path))
+    try:
+        start = (first or 1) - 1
+        stop = len(doc) if last is None else min(last, len(doc))
+        for i in range(start, stop):
+            page = doc[i]
+            textpage = page.get_textpage()
+            try:
+                yield textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n")
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        doc.close()
+
+
+register_pdf_backend("pdfminer", "pdfminer.six", _iter_pdf_pages)
+register_pdf_backend("pdfium", "pypdfium2", _iter_pdfium_pages)
+
+
+def _iter_text_pages(path: Path, chunk_size: int = 1 << 20) -> Iterator[str]:
+    """纯文本文件按换页符 \\f 分页，分块读取，不一次性读入整个文件"""
+    pending = ""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            pending += chunk
+            *pages, pending = pending.split(PAGE_BREAK)
+            yield from pages
+    yield pending
+
+
+def iter_file_pages(
+    path: Union[str, Path],
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    extract: Optional[ExtractOptions] = None,
+) -> Iterator[str]:
+    """逐页产出文件文本（第 1 页起），供流式识别使用。
+
+    - txt/md：按 \\f 分页，没有换页符时整份文件算 1 页；
+    - pdf：逐页抽取（默认 pdfminer；extract 指定 pdfium 等后端时用该后端，并只取 first_page..last_page）；
+      传入 cache 时以 \\f 拼接后整体缓存，下次直接按页切分。逐页产出无法事先判断乱码，不做 markitdown 回退；
+    - 其他格式：markitdown 不保留页信息，整份文本作为 1 页。
+    """
+    p = Path(path)
+    suffix = p.suffix.lower()
+    extract = extract or ExtractOptions()
+
+    if suffix in PLAIN_TEXT_SUFFIXES:
+        yield from _iter_text_pages(p)
+        return
+
+    if suffix != ".pdf":
+        yield convert_file_to_text(p, cache=cache, refresh_cache=refresh_cache)
+        return
+
+    if extract.backend == EXTRACTOR_NAME:
+        iter_pages = _iter_pdf_pages
+        name, version = PAGE_EXTRACTOR_NAME, package_version("pdfminer.six")
+    else:
+        backend = PDF_BACKENDS[extract.backend]
+        iter_pages = backend.iter_pages
+        name, version = f"{backend.name}-pages", package_version(backend.dist)
+        if extract.page_range is not None:
+            name += f":pages={extract.first_page or ''}-{extract.last_page or ''}"
+    pages_iter = iter_pages(p, extract.first_page, extract.last_page)
+
+    if cache is None:
+        yield from pages_iter
+        return
+
+    key = make_cache_key(file_digest(p), name, version)
+    cached = None if refresh_cache else cache.get(key)
+    if cached is not None:
+        yield from cached.split(PAGE_BREAK)
+        return
+
+    pages = []
+    for page in pages_iter:
+        pages.append(page)
+        yield page
+    cache.put(key, PAGE_BREAK.join(pages))
@@ -0,0 +1,43 @@
+import re
+from pathlib import Path
+from typing import Optional
+
+
+# 混合语料的语言判别：中文年报正文以汉字为主（夹杂少量英文名称、表头），10-K 几乎没有汉字。
+# 取正文开头一段，汉字数占 (汉字 + 拉丁字母) 的比例达到阈值即判为中文。
+LANGUAGES = ("en", "cn")
+DEFAULT_SAMPLE_CHARS = 50_000
+CN_CHAR_RATIO = 0.3
+
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]")
+_LATIN_RE = re.compile(r"[A-Za-z]")
+# 中文年报的文件命名：<6 位证券代码>_<年份>_...
+_CN_STEM_RE = re.compile(r"^[0-9]{6}_[0-9]{4}_")
+
+
+def language_from_text(text: str, sample_chars: int = DEFAULT_SAMPLE_CHARS) -> Optional[str]:
+    """按汉字比例判别语言；样本里没有文字（如扫描件抽不出文本）时返回 None"""
+    sample = text[:sample_chars]
+    cjk = len(_CJK_RE.findall(sample))
+    latin = len(_LATIN_RE.findall(sample))
+    if cjk + latin == 0:
+        return None
+    return "cn" if cjk >= CN_CHAR_RATIO * (cjk + latin) else "en"
+
+
+def language_from_path(path: Path) -> Optional[str]:
+    """文件名规则：文件名含汉字、位于名为 CN 的目录下，或符合 <证券代码>_<年份>_ 命名的判为中文；
+    其余无法判定，返回 None"""
+    if _CJK_RE.search(path.name) or _CN_STEM_RE.match(path.stem):
+        return "cn"
+    if any(part.upper() == "CN" for part in path.parent.parts):
+        return "cn"
+    return None
+
+
+def detect_language(path: Path, text: Optional[str] = None, rule: str = "text") -> str:
+    """rule="text" 时按抽取文本判别、判不出再看文件名；rule="filename" 时只看文件名。都判不出时归为英文"""
+    if rule not in ("text", "filename"):
+        raise ValueError(f"Unknown language rule {rule!r}; expected 'text' or 'filename'")
+    lang = language_from_text(text) if rule == "text" and text is not None else None
+    return lang or language_from_path(path) or "en"
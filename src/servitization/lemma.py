@@ -0,0 +1,134 @@
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from .evidence import document_id
+from .text_cache import TextCache, make_cache_key, package_version
+
+
+DEFAULT_MODEL = "en_core_web_sm"
+LEMMA_MARKER = "lemma_match::"
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+_MEMORY_ENTRIES = 1024
+
+# 已加载的 spaCy 模型，按名称缓存；第一次真正需要词形还原时才 import spacy 并加载
+_MODELS: Dict[str, object] = {}
+
+
+def load_model(name: str = DEFAULT_MODEL):
+    nlp = _MODELS.get(name)
+    if nlp is None:
+        try:
+            import spacy
+        except ImportError as exc:
+            raise ImportError(
+                f"The lemma fallback requires spaCy: pip install spacy && python -m spacy download {name}"
+            ) from exc
+        nlp = spacy.load(name, disable=["ner", "parser"])
+        _MODELS[name] = nlp
+    return nlp
+
+
+def fallback_targets(flags: Dict[str, int], keywords: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """尚未命中的类别里的单词短语；lemma 回退只对单词短语有意义，已命中的类别不再回退"""
+    targets = {}
+    for cat, flag in flags.items():
+        if flag or cat not in keywords:
+            continue
+        phrases = [p for p in keywords[cat] if " " not in p]
+        if phrases:
+            targets[cat] = phrases
+    return targets
+
+
+def _prefix(phrase: str) -> str:
+    # 规则变形（-s / -es / -ed / -ing / -ies、去掉词尾 e）都保留了词的前 len-2 个字母
+    return phrase.lower()[: max(3, len(phrase) - 2)]
+
+
+def candidate_text(text: str, targets: Dict[str, List[str]]) -> str:
+    """只保留可能还原出目标短语的句子（含有某个目标短语的词干前缀），其余句子不送进模型"""
+    prefixes = sorted({_prefix(p) for phrases in targets.values() for p in phrases})
+    if not prefixes:
+        return ""
+    pattern = re.compile("|".join(re.escape(p) for p in prefixes), re.IGNORECASE)
+    return "\n".join(s for s in _SENTENCE_RE.split(text) if pattern.search(s))
+
+
+class LemmaFallback:
+    """批量词形还原：文本经 nlp.pipe 成批处理（n_process > 1 时由 spaCy 多进程并行），
+    每份文本的 lemma 集合按内容摘要缓存在内存里；传入 cache 时还会写到磁盘缓存，下次运行直接复用。
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        n_process: int = 1,
+        batch_size: int = 32,
+        cache: Optional[TextCache] = None,
+    ):
+        self.model = model
+        self.n_process = n_process
+        self.batch_size = batch_size
+        self.cache = cache
+        self._memory: "OrderedDict[str, Set[str]]" = OrderedDict()
+
+    def _key(self, text: str) -> str:
+        return make_cache_key(document_id(text), f"spacy-lemma:{self.model}", package_version("spacy"))
+
+    def _remember(self, key: str, lemmas: Set[str]) -> None:
+        self._memory[key] = lemmas
+        self._memory.move_to_end(key)
+        while len(self._memory) > _MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def lemma_sets(self, texts: Sequence[str]) -> List[Set[str]]:
+        results: List[Optional[Set[str]]] = [None] * len(texts)
+        todo: List[Tuple[int, str]] = []
+        for i, text in enumerate(texts):
+            if not text:
+                results[i] = set()
+                continue
+            key = self._key(text)
+            lemmas = self._memory.get(key)
+            if lemmas is None and self.cache is not None:
+                stored = self.cache.get(key)
+                if stored is not None:
+                    lemmas = set(stored.split("\n")) if stored else set()
+            if lemmas is None:
+                todo.append((i, key))
+            else:
+                results[i] = lemmas
+                self._remember(key, lemmas)
+
+        if todo:
+            nlp = load_model(self.model)
+            docs = nlp.pipe(
+                (texts[i] for i, _ in todo), batch_size=self.batch_size, n_process=self.n_process
+            )
+            for (i, key), doc in zip(todo, docs):
+                lemmas = {tok.lemma_.lower() for tok in doc if not tok.is_stop and tok.is_alpha}
+                results[i] = lemmas
+                self._remember(key, lemmas)
+                if self.cache is not None:
+                    self.cache.put(key, "\n".join(sorted(lemmas)))
+        return results
+
+
+def apply_lemmas(
+    flags: Dict[str, int],
+    evidence: Dict[str, List],
+    lemmas: Set[str],
+    targets: Dict[str, List[str]],
+) -> int:
+    """按 lemma 集合补标未命中的类别，证据记为 lemma_match::<phrase>；返回补标的类别数"""
+    added = 0
+    for cat, phrases in targets.items():
+        for phrase in phrases:
+            if phrase.lower() in lemmas:
+                flags[cat] = 1
+                evidence.setdefault(cat, []).append(f"{LEMMA_MARKER}{phrase}")
+                added += 1
+                break
+    return added
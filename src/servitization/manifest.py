@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .text_cache import file_digest
+
+
+def _hash_json(obj) -> str:
+    raw = json.dumps(obj, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def config_state(version: str, keywords: Dict[str, List[str]], shared: Dict) -> Dict:
+    """当前识别配置的指纹：检测器版本 + 各类别词表哈希 + 影响所有类别的共享配置哈希
+
+    shared 里放否定词表、窗口大小等对全部类别都有影响的设置。
+    """
+    return {
+        "detector_version": version,
+        "shared": _hash_json(shared),
+        "categories": {cat: _hash_json(phrases) for cat, phrases in keywords.items()},
+    }
+
+
+class RunManifest:
+    """增量运行清单：记录每个输入文件的内容哈希、运行时的配置指纹和对应的输出行。
+
+    下次运行时：
+    - 文件内容、检测器版本、共享配置、所有类别词表都没变 -> 直接复用旧行；
+    - 只有部分类别的词表变了 -> 只重扫这些类别，其余类别沿用旧结果；
+    - 其他情况（新文件、文件内容变化、版本或共享配置变化）-> 完整处理。
+    文件内容哈希按 (size, mtime) 复用，没改动的文件不必重新读一遍。
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.state: Optional[Dict] = None
+        self.entries: Dict[str, Dict] = {}
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "RunManifest":
+        manifest = cls(path)
+        if manifest.path.exists():
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            manifest.state = data.get("state")
+            manifest.entries = data.get("files", {})
+        return manifest
+
+    def digest(self, path: Path) -> str:
+        st = path.stat()
+        entry = self.entries.get(str(path))
+        if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            return entry["sha256"]
+        return file_digest(path)
+
+    def plan(self, path: Path, digest: str, state: Dict) -> Tuple[Optional[Dict], List[str]]:
+        """返回 (旧行, 需要重扫的类别)。旧行为 None 表示要完整处理；类别列表为空表示直接复用"""
+        entry = self.entries.get(str(path))
+        old = self.state
+        if (
+            entry is None
+            or old is None
+            or entry.get("sha256") != digest
+            or old.get("detector_version") != state["detector_version"]
+            or old.get("shared") != state["shared"]
+        ):
+            return None, []
+        old_cats = old.get("categories", {})
+        stale = [
+            cat for cat, h in state["categories"].items() if old_cats.get(cat) != h
+        ]
+        return entry["row"], stale
+
+    def record(self, path: Path, digest: str, row: Dict) -> None:
+        st = path.stat()
+        self.entries[str(path)] = {
+            "sha256": digest,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "row": row,
+        }
+
+    def save(self, state: Dict, keep: Sequence[Path]) -> None:
+        """写出清单（原子替换），只保留本次输入中仍然存在的文件"""
+        keep_keys = {str(p) for p in keep}
+        files = {k: v for k, v in self.entries.items() if k in keep_keys}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"state": state, "files": files}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.state = state
+        self.entries = files
+
+
+_ROW_CORE_KEYS = {
+    "company", "year", "service_num", "comp_count", "sub_count", "risk_score", "flags", "evidence",
+}
+
+
+def merge_partial_row(
+    company: str,
+    year: int,
+    old_row: Dict,
+    partial_row: Optional[Dict],
+    categories: Sequence[str],
+    rescanned: Sequence[str],
+    build_row_func,
+) -> Dict:
+    """把只重扫了部分类别的结果合并回旧行，并按当前类别顺序重算计数和分数。
+
+    rescanned 为空时就是直接复用旧行；计数和分数总是重算，
+    因此只改 CATEGORY_TYPE（不改词表）也不需要重扫。flags/evidence 以外的附加列
+    （如偏移量证据的 doc_id）沿用新结果，没有新结果时沿用旧行。
+    """
+    rescanned = set(rescanned)
+    old_flags = old_row.get("flags", {})
+    old_evidence = old_row.get("evidence", {})
+    new_flags = (partial_row or {}).get("flags", {})
+    new_evidence = (partial_row or {}).get("evidence", {})
+
+    flags, evidence = {}, {}
+    for cat in categories:
+        src_flags, src_evidence = (new_flags, new_evidence) if cat in rescanned else (old_flags, old_evidence)
+        flags[cat] = src_flags.get(cat, 0)
+        if cat in src_evidence:
+            evidence[cat] = src_evidence[cat]
+    row = build_row_func(company, year, flags, evidence)
+    for source in (old_row, partial_row or {}):
+        row.update((k, v) for k, v in source.items() if k not in _ROW_CORE_KEYS)
+    return row
@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import zlib
+from bisect import bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple, Union
+
+from .negation import NegationMatcher
+from .normalize import NormalizedText, SplicedOffsetMap, TextNormalizer
+from .phrase_matcher import CategoryPhraseMatcher, PhraseAutomaton
+
+
+# 段落级匹配缓存：同一家公司相邻年份的年报大部分文字不变，治理、会计政策等样板文字在公司之间也大段相同。
+# 原文切成段落，每段单独归一化、扫描，结果（归一化后的段落、位置映射的断点、短语命中、否定提示词的位置，
+# 均为段内坐标）按 (段落原文, 词表指纹) 的摘要存进缓存；再次遇到同一段落只需一次查找，不再归一化和扫描。
+# 各段的结果平移回全文坐标，与段落交界处单独补扫的那一小段合在一起，和整篇一次归一化、扫描的结果完全相同；
+# 否定、上下文约束、证据合并都在拼好的全文结果上照常判断（窗口可以跨段落），因此缓存与否不影响任何输出。
+# - 段落：PDF 抽取出来的文本没有可靠的空行（pdfium 整份只有换页符），段落按内容切分：在句末标点之后切，
+#   句末前 16 个字符的 crc32 能被 PARAGRAPH_SENTENCES 整除时算段落结束（平均每段这么多句）。
+#   切分点只取决于附近的文字，前文增删几句不会让后面的段落全部错位；
+#   段落从句末标点（非空白字符）之后开始，单独归一化的结果只取决于段落本身、这个标点以及是否全文最后一段；
+# - 缓存：SQLite 单文件（WAL，多个 worker 进程可以同时读写），路径为 None 时只在内存里（同一批年份之间复用）；
+#   词表、否定词或切分规则变化后摘要随之改变，旧条目不再命中，整个文件随时可以删掉重建。
+
+DEFAULT_MATCH_CACHE = "data/cache/matches.sqlite"
+MATCH_CACHE_VERSION = 1  # 段落切分、归一化或缓存内容的格式变化时递增
+PARAGRAPH_SENTENCES = 4
+_BOUNDARY_CONTEXT = 16  # 决定句末是否为段落结束时看的字符数
+_BATCH = 500  # 每条 SQL 查询的摘要数（SQLite 的参数个数有上限）
+
+# 原文里的句末：中文句末标点，以及后接空白的英文句末标点（不含小数点、网址）
+_SENTENCE_END_RE = re.compile(r"[.!?;。！？；](?:(?<=[.!?;])(?=\s)|(?<![.!?;]))")
+
+
+def paragraph_bounds(raw: str) -> List[int]:
+    """原文的段落切分点（升序，不含 0 和 len(raw)），每个切分点紧跟在一个句末标点之后"""
+    bounds = []
+    n = len(raw)
+    crc32 = zlib.crc32
+    for m in _SENTENCE_END_RE.finditer(raw):
+        end = m.end()
+        if end < n and not crc32(raw[max(0, end - _BOUNDARY_CONTEXT):end].encode("utf-8")) % PARAGRAPH_SENTENCES:
+            bounds.append(end)
+    return bounds
+
+
+def _merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[List[int]] = []
+    for lo, hi in sorted(ranges):
+        if hi <= lo:
+            continue
+        if merged and lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return [(lo, hi) for lo, hi in merged]
+
+
+class _Windows:
+    """把全文中的若干窗口用换行拼成一个串，一次扫描代替逐个窗口扫描；归一化文本里没有换行，
+    短语和提示词里也没有，命中不会跨过两个窗口的接缝。locate 把拼接串里的位置换回 (窗口序号, 全文坐标)"""
+
+    def __init__(self, text: str, windows: Iterable[Tuple[int, int]]):
+        self.starts: List[int] = []  # 各窗口在拼接串里的起点
+        self.offsets: List[int] = []  # 各窗口的 全文坐标 - 拼接串坐标
+        pieces = []
+        pos = 0
+        for lo, hi in windows:
+            self.starts.append(pos)
+            self.offsets.append(lo - pos)
+            pieces.append(text[lo:hi])
+            pos += hi - lo + 1
+        self.text = "\n".join(pieces)
+
+    def locate(self, pos: int) -> Tuple[int, int]:
+        k = bisect_right(self.starts, pos) - 1
+        return k, pos + self.offsets[k]
+
+
+class ParagraphScan(NamedTuple):
+    """一篇文档拼好的归一化和扫描结果（全文坐标）；paragraphs / cached 为段落数和其中命中缓存的段落数"""
+
+    norm: NormalizedText
+    matches: List
+    cues: List[Tuple[int, int]]
+    paragraphs: int
+    cached: int
+
+
+class CategoryScanner:
+    """英文多类别词表（CategoryPhraseMatcher）+ 否定提示词的段落扫描。
+
+    段内结果为 (位置, 最长命中) 和提示词的 (start, end)。某个位置的最长命中要看前一个字符和之后
+    max_phrase_len + 1 个字符，段内只保留这些字符都在段内的位置，其余位置（段首、段尾、全文首尾）
+    由 seams 在全文上补扫；提示词段内只保留完整落在段内的，跨段的由 seams 补上。
+    """
+
+    def __init__(self, matcher: CategoryPhraseMatcher, negation: NegationMatcher):
+        self.matcher = matcher
+        self.negation = negation
+        self.reach = matcher.max_phrase_len
+        self.cue_len = max((len(c) for c in negation.cues), default=0)
+        state = ["category", MATCH_CACHE_VERSION, PARAGRAPH_SENTENCES, matcher.phrases, negation.cues]
+        self.fingerprint = hashlib.sha256(json.dumps(state, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def scan(self, paragraph: str) -> List:
+        matches = self.matcher.candidates(paragraph, 1, len(paragraph) - self.reach) if len(paragraph) > 1 else []
+        return [matches, self.negation.find(paragraph)]
+
+    def seams(self, text: str, bounds: Sequence[int]) -> Tuple[List, List[Tuple[int, int]]]:
+        n = len(text)
+        ranges = [(0, 1), (n - self.reach, n), *((b - self.reach, b + 1) for b in bounds)]
+        ranges = _merge_ranges((max(0, lo), min(n, hi)) for lo, hi in ranges)
+        # 每个补扫区间连同判断所需的前 1 个、后 max_phrase_len 个字符一起拼接，只保留起点落在区间内的命中
+        windows = _Windows(text, ((max(0, lo - 1), min(n, hi + self.reach)) for lo, hi in ranges))
+        matches = []
+        for pos, longest in self.matcher.candidates(windows.text):
+            k, start = windows.locate(pos)
+            if ranges[k][0] <= start < ranges[k][1]:
+                matches.append((start, longest))
+        return matches, _seam_cues(self.negation, self.cue_len, text, bounds)
+
+    def assemble(self, matches: List) -> List[Tuple[int, str]]:
+        """拼好的 (位置, 最长命中) 按位置排序，交给 matcher.select_spans"""
+        matches.sort(key=lambda m: m[0])
+        return matches
+
+
+class AutomatonScanner:
+    """中文词表（PhraseAutomaton，短语连同上下文约束词）+ 否定提示词的段落扫描。
+
+    子串匹配没有边界条件：段内结果为完整落在段内的 (起点, 短语下标)，跨段的由 seams 补上。
+    """
+
+    def __init__(self, automaton: PhraseAutomaton, negation: NegationMatcher):
+        self.automaton = automaton
+        self.negation = negation
+        self.reach = max((len(p) for p in automaton.phrases), default=0)
+        self.cue_len = max((len(c) for c in negation.cues), default=0)
+        state = ["automaton", MATCH_CACHE_VERSION, PARAGRAPH_SENTENCES, automaton.phrases, negation.cues]
+        self.fingerprint = hashlib.sha256(json.dumps(state, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def scan(self, paragraph: str) -> List:
+        matches = [(s, pid) for s, _, pid in self.automaton.iter_matches(paragraph)]
+        return [matches, self.negation.find(paragraph)]
+
+    def seams(self, text: str, bounds: Sequence[int]) -> Tuple[List, List[Tuple[int, int]]]:
+        found = set()
+        windows = _Windows(text, _merge_ranges((max(0, b - self.reach + 1), b + self.reach - 1) for b in bounds))
+        for s, e, pid in self.automaton.iter_matches(windows.text):
+            _, start = windows.locate(s)
+            if _crosses(bounds, start, start + e - s):
+                found.add((start, pid))
+        return list(found), _seam_cues(self.negation, self.cue_len, text, bounds)
+
+    def assemble(self, matches: List) -> Dict[str, List[int]]:
+        """拼好的 (起点, 短语下标) -> {短语: [起点, ...]}，与 PhraseAutomaton.positions_by_phrase 相同"""
+        phrases = self.automaton.phrases
+        positions: Dict[str, List[int]] = defaultdict(list)
+        for start, pid in matches:
+            positions[phrases[pid]].append(start)
+        for starts in positions.values():
+            starts.sort()
+        return positions
+
+
+def _crosses(bounds: Sequence[int], start: int, end: int) -> bool:
+    """[start, end) 是否跨过某个段落切分点"""
+    k = bisect_right(bounds, start)
+    return k < len(bounds) and bounds[k] < end
+
+
+def _seam_cues(negation: NegationMatcher, cue_len: int, text: str, bounds: Sequence[int]) -> List[Tuple[int, int]]:
+    """跨过段落切分点的否定提示词"""
+    windows = _Windows(text, _merge_ranges((max(0, b - cue_len + 1), b + cue_len - 1) for b in bounds))
+    found = set()
+    for s, e in negation.find(windows.text):
+        _, start = windows.locate(s)
+        if _crosses(bounds, start, start + e - s):
+            found.add((start, start + e - s))
+    return list(found)
+
+
+@lru_cache(maxsize=None)
+def category_scanner(matcher: CategoryPhraseMatcher, negation: NegationMatcher) -> CategoryScanner:
+    return CategoryScanner(matcher, negation)
+
+
+@lru_cache(maxsize=None)
+def automaton_scanner(automaton: PhraseAutomaton, negation: NegationMatcher) -> AutomatonScanner:
+    return AutomatonScanner(automaton, negation)
+
+
+@lru_cache(maxsize=None)
+def _connect(path: str, pid: int) -> sqlite3.Connection:
+    """每个进程每个缓存文件只开一个连接（pid 也是键：fork 出来的 worker 不沿用父进程的连接）"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS paragraphs (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+    conn.commit()
+    return conn
+
+
+class MatchCache:
+    """段落归一化和扫描结果的缓存：path 为 SQLite 文件（持久，多进程共享），None 时只在内存里。
+
+    对象本身只记路径，可以随任务一起传给 worker 进程，连接由各进程第一次用到时各自打开。
+    """
+
+    def __init__(self, path: Union[str, Path, None] = DEFAULT_MATCH_CACHE):
+        self.path = str(path) if path is not None else None
+        self._memory: Dict[str, List] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        return _connect(self.path, os.getpid())
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List]:
+        keys = list(dict.fromkeys(keys))
+        if self.path is None:
+            return {k: self._memory[k] for k in keys if k in self._memory}
+        conn = self._connect()
+        found = {}
+        for i in range(0, len(keys), _BATCH):
+            batch = keys[i:i + _BATCH]
+            query = f"SELECT key, value FROM paragraphs WHERE key IN ({','.join('?' * len(batch))})"
+            for key, value in conn.execute(query, batch):
+                found[key] = json.loads(value)
+        return found
+
+    def put_many(self, items: Dict[str, List]) -> None:
+        if not items:
+            return
+        if self.path is None:
+            self._memory.update(items)
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO paragraphs (key, value) VALUES (?, ?)",
+                ((k, json.dumps(v, ensure_ascii=False, separators=(",", ":"))) for k, v in items.items()),
+            )
+
+    def scan(self, raw: str, scanner: Union[CategoryScanner, AutomatonScanner]) -> ParagraphScan:
+        """对原文 raw 做段落级归一化和扫描：命中缓存的段落直接取结果，其余段落处理后写回缓存。
+        norm 与 normalize_text(raw) 相同，matches / cues 与整篇扫描相同（格式见各扫描器的 assemble）"""
+        bounds = paragraph_bounds(raw)
+        edges = [0, *bounds, len(raw)]
+        last = len(edges) - 2
+        salt = scanner.fingerprint.encode("ascii")[:64]
+        keys = []
+        for k in range(last + 1):
+            a, b = edges[k], edges[k + 1]
+            # 段落连同前面的句末标点（全文第一段记为 \x00）和是否最后一段一起取摘要
+            h = hashlib.blake2b(b"L" if k == last else b"P", digest_size=16, key=salt)
+            h.update(raw[a - 1:b].encode("utf-8") if a else b"\x00" + raw[:b].encode("utf-8"))
+            keys.append(h.hexdigest())
+        found = self.get_many(keys)
+        cached = 0
+        new: Dict[str, List] = {}
+        pieces: List[str] = []
+        offsets = SplicedOffsetMap()
+        matches: List = []
+        cues: List[Tuple[int, int]] = []
+        norm_bounds: List[int] = []
+        pos = 0  # 已拼好的归一化文本长度
+        for k, key in enumerate(keys):
+            a, b = edges[k], edges[k + 1]
+            value = found.get(key)
+            if value is None:
+                value = new.get(key)
+            if value is None:
+                value = new[key] = _process_paragraph(raw, a, b, k == last, scanner)
+            else:
+                cached += 1
+            piece, anchors, shifts, local_matches, local_cues = value
+            if k:
+                norm_bounds.append(pos)
+            offsets.append(pos, a, anchors, shifts)
+            matches.extend((p + pos, x) for p, x in local_matches)
+            cues.extend((s + pos, e + pos) for s, e in local_cues)
+            pieces.append(piece)
+            pos += len(piece)
+        text = "".join(pieces)
+        seam_matches, seam_cues = scanner.seams(text, norm_bounds)
+        matches.extend(seam_matches)
+        cues.extend(seam_cues)
+        self.put_many(new)
+        return ParagraphScan(NormalizedText(raw, text, offsets), scanner.assemble(matches), cues, len(keys), cached)
+
+
+def _process_paragraph(raw: str, a: int, b: int, final: bool, scanner) -> List:
+    """单独归一化、扫描原文 raw[a:b]（a 处之前是句末标点），返回 [归一化文本, 断点位置, 断点偏移, 命中, 提示词]"""
+    normalizer = TextNormalizer(raw[a - 1] if a else "")
+    piece = normalizer.feed(raw[a:b], final=final)
+    matches, cues = scanner.scan(piece)
+    return [piece, list(normalizer.offsets.anchors), list(normalizer.offsets.shifts), matches, cues]
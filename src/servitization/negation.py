@@ -0,0 +1,69 @@
+from bisect import bisect_left
+from typing import Iterable, List, Tuple
+
+from .normalize import fold_phrase
+
+
+class PositionIndex:
+    """一篇文档内一组词（否定提示词、上下文约束词等）的位置索引（按起点排序）。
+
+    每个命中只需一次 bisect 加少量比较即可判断窗口内是否有其中某个词，
+    不再对每个命中切片、转小写、逐个词做子串搜索。
+    """
+
+    def __init__(self, spans: List[Tuple[int, int]]):
+        spans.sort()
+        self.starts = [s for s, _ in spans]
+        self.ends = [e for _, e in spans]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def contains(self, start: int, end: int, before: int, after: int) -> bool:
+        """[start, end) 的命中前 before、后 after 个字符内是否完整包含某个被索引的词（可以与命中重叠）"""
+        lo = start - before
+        hi = end + after
+        starts, ends = self.starts, self.ends
+        i = bisect_left(starts, lo)
+        n = len(starts)
+        while i < n and starts[i] < hi:
+            if ends[i] <= hi:
+                return True
+            i += 1
+        return False
+
+    is_negated = contains
+
+
+# 旧名称保留
+NegationIndex = PositionIndex
+
+
+class NegationMatcher:
+    """按语言配置的否定规则：提示词列表 + 命中前后的窗口大小。
+
+    提示词按 normalize 的口径折叠（大小写、全角半角），在归一化之后的文本上查找。
+    """
+
+    def __init__(self, cues: Iterable[str], before: int, after: int):
+        self.cues = [c for c in dict.fromkeys(fold_phrase(c) for c in cues) if c]
+        self.before = before
+        self.after = after
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """text 中所有提示词的出现 [(start, end), ...]（含重叠，未排序）"""
+        spans = []
+        for cue in self.cues:
+            n = len(cue)
+            i = text.find(cue)
+            while i != -1:
+                spans.append((i, i + n))
+                i = text.find(cue, i + 1)
+        return spans
+
+    def index(self, text: str) -> PositionIndex:
+        """一次性定位 text 中所有提示词的出现（含重叠），建立位置索引"""
+        return PositionIndex(self.find(text))
+
+    def is_negated(self, idx: PositionIndex, start: int, end: int) -> bool:
+        return idx.contains(start, end, self.before, self.after)
@@ -0,0 +1,204 @@
+import re
+from array import array
+from bisect import bisect_right
+from typing import List, Sequence, Tuple
+
+
+# 匹配前的文本归一化：一次扫描原文，直接写出一份归一化文本，同时记一张紧凑的位置映射
+# （只记偏移量发生变化的断点），命中位置可以映射回原文，证据片段仍取原文的写法。
+# - 空白折叠：连续空白（含换行、全角空格、不间断空格）合成一个空格，首尾空白去掉；
+# - 中文断行修复：两个汉字（或中文标点、全角字符）之间含换行的空白整段删除，如 “维修\n服务” -> “维修服务”；
+# - 字符折叠：全角 ASCII（Ｓａａｓ、（）、，）转半角，再转小写。字符折叠逐字符一一对应，不改变长度。
+# 只有改变长度的空白段需要逐个处理；字符折叠在拼好的缓冲区上整体做（纯 ASCII 文本没有全角字符时只有一次 lower）。
+
+# 全角 ASCII -> 半角；U+0130（İ）小写后是两个字符，先折叠成 I 以保持长度不变
+_WIDE = {chr(c): chr(c - 0xFEE0) for c in range(0xFF01, 0xFF5F)}
+_WIDE["\u0130"] = "I"
+_WIDE_RE = re.compile("[\uff01-\uff5e\u0130]")
+
+# 需要改写的空白：两个以上的连续空白，或单个非空格的空白字符；单个空格原样保留，不进入逐个处理
+_WS_RE = re.compile(r"\s(?:(?<=[^ ])|\s)\s*")
+_BREAK_RE = re.compile(r"[\n\r\f\v\u2028\u2029]")
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def _unwiden(m: re.Match) -> str:
+    return _WIDE[m.group()]
+
+
+def fold_chars(text: str) -> str:
+    """字符折叠（全角转半角、转小写），长度不变"""
+    if _WIDE_RE.search(text):
+        text = _WIDE_RE.sub(_unwiden, text)
+    return text.lower()
+
+
+def fold_phrase(phrase: str) -> str:
+    """词表短语、否定词按与正文相同的口径折叠，才能在归一化文本里命中"""
+    return _SPACES_RE.sub(" ", fold_chars(phrase))
+
+
+class OffsetMap:
+    """归一化文本位置 -> 原文位置。
+
+    只在偏移量变化处记一个断点 (anchor, shift)：anchor 及其之后（到下一个断点为止）
+    的归一化位置 p 对应原文位置 p + shift。断点数与被改写的空白段数同阶，远小于文本长度。
+    """
+
+    def __init__(self):
+        self.anchors = array("q", [0])
+        self.shifts = array("q", [0])
+
+    def __len__(self) -> int:
+        return len(self.anchors)
+
+    def add(self, pos: int, shift: int) -> None:
+        if shift == self.shifts[-1]:
+            return
+        if pos == self.anchors[-1]:
+            self.shifts[-1] = shift
+        else:
+            self.anchors.append(pos)
+            self.shifts.append(shift)
+
+    def to_raw(self, pos: int) -> int:
+        return pos + self.shifts[bisect_right(self.anchors, pos) - 1]
+
+    def span(self, start: int, end: int) -> Tuple[int, int]:
+        """归一化文本中的 [start, end) 在原文中对应的范围（含被删掉的中间空白）"""
+        if end <= start:
+            raw = self.to_raw(start)
+            return raw, raw
+        return self.to_raw(start), self.to_raw(end - 1) + 1
+
+    def trim(self, pos: int) -> None:
+        """丢掉 pos 之前用不到的断点（流式识别时随缓冲区一起前移）"""
+        k = bisect_right(self.anchors, pos) - 1
+        if k > 0:
+            del self.anchors[:k]
+            del self.shifts[:k]
+
+
+class SplicedOffsetMap:
+    """由各段单独归一化的位置映射拼成的全文映射（段落缓存用，见 match_cache）。
+
+    每段记下它在归一化文本和原文中的起点以及段内的断点（段内坐标），映射时先按起点找到段落、
+    再在段内查断点；拼接时不必逐个平移断点。to_raw / span 的结果与整篇归一化的 OffsetMap 相同。
+    """
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.raw_starts: List[int] = []
+        self.pieces: List[Tuple[Sequence[int], Sequence[int]]] = []
+
+    def __len__(self) -> int:
+        return sum(len(anchors) for anchors, _ in self.pieces)
+
+    def append(self, start: int, raw_start: int, anchors: Sequence[int], shifts: Sequence[int]) -> None:
+        self.starts.append(start)
+        self.raw_starts.append(raw_start)
+        self.pieces.append((anchors, shifts))
+
+    def to_raw(self, pos: int) -> int:
+        k = bisect_right(self.starts, pos) - 1
+        anchors, shifts = self.pieces[k]
+        local = pos - self.starts[k]
+        return self.raw_starts[k] + local + shifts[bisect_right(anchors, local) - 1]
+
+    def span(self, start: int, end: int) -> Tuple[int, int]:
+        if end <= start:
+            raw = self.to_raw(start)
+            return raw, raw
+        return self.to_raw(start), self.to_raw(end - 1) + 1
+
+
+class TextNormalizer:
+    """可以分段喂入的归一化器：逐段 feed 的结果拼起来与整篇一次归一化完全相同。
+
+    段尾的空白要看下一段开头才能决定删除还是折叠成空格，因此先扣下，和下一段一起处理；
+    offsets 中的位置都是全文坐标。
+    从一篇文本中间的某个非空白字符之后开始归一化时传入 prev（该字符）：输出和 offsets 的位置从 0 算起，
+    内容与整篇归一化中这一段的结果相同（段落缓存据此单独归一化各段，见 match_cache）。
+    """
+
+    def __init__(self, prev: str = ""):
+        self.offsets = OffsetMap()
+        self.raw_end = 0  # 已处理的原文长度（不含扣下的段尾空白）
+        self.end = 0  # 已输出的归一化文本长度
+        self._prev = prev  # 已处理原文的最后一个字符
+        self._pending = ""
+
+    def feed(self, raw: str, final: bool = False) -> str:
+        chunk = self._pending + raw
+        base = self.raw_end
+        if final:
+            self._pending = ""
+        else:
+            cut = len(chunk.rstrip())
+            self._pending = chunk[cut:]
+            chunk = chunk[:cut]
+        if not chunk:
+            return ""
+
+        # removed：本段已删掉的字符数，即本段内原文位置与输出位置之差
+        pieces = []
+        offsets = self.offsets
+        start = self.end
+        removed = 0
+        pos = 0
+        n = len(chunk)
+        is_cjk = _CJK_RE.match
+        for m in _WS_RE.finditer(chunk):
+            a, b = m.span()
+            pieces.append(chunk[pos:a])
+            q = start + a - removed  # 这段空白在归一化文本中的位置
+            if (q == 0 and not self._prev) or b == n:
+                # 全文开头 / 结尾的空白（只有 final 时段尾才会有空白）
+                pass
+            elif is_cjk(chunk[a - 1] if a else self._prev) and is_cjk(chunk[b]) and _BREAK_RE.search(chunk, a, b):
+                pass
+            else:
+                pieces.append(" ")
+                q += 1
+            if b - (q - start) != removed:
+                removed = b - (q - start)
+                offsets.add(q, base + b - q)
+            pos = b
+        pieces.append(chunk[pos:])
+
+        self._prev = chunk[-1]
+        self.raw_end = base + n
+        self.end = start + n - removed
+        return fold_chars("".join(pieces))
+
+
+class NormalizedText:
+    """一篇文本的归一化结果：text 用于匹配，raw 为原文，位置经 offsets 映射回原文"""
+
+    __slots__ = ("raw", "text", "offsets")
+
+    def __init__(self, raw: str, text: str, offsets: OffsetMap):
+        self.raw = raw
+        self.text = text
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def to_raw(self, pos: int) -> int:
+        return self.offsets.to_raw(pos)
+
+    def raw_span(self, start: int, end: int) -> Tuple[int, int]:
+        return self.offsets.span(start, end)
+
+    def raw_window(self, start: int, end: int) -> str:
+        """归一化文本 [start, end) 对应的原文"""
+        s, e = self.offsets.span(start, end)
+        return self.raw[s:e]
+
+
+def normalize_text(raw: str) -> NormalizedText:
+    normalizer = TextNormalizer()
+    text = normalizer.feed(raw, final=True)
+    return NormalizedText(raw, text, normalizer.offsets)
@@ -0,0 +1,414 @@
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+# CSV 用标准库 csv 写出，与 ``pd.DataFrame(rows).to_csv(index=False)`` 逐字节一致
+# （QUOTE_MINIMAL、\n 换行、None 写成空串、dict 列写成 str(dict)），写结果不必导入 pandas
+
+
+def _csv_writer(f):
+    return csv.writer(f, lineterminator="\n")
+
+
+def _csv_cells(row: Dict, columns: Sequence[str]) -> List:
+    return ["" if row.get(col) is None else row[col] for col in columns]
+
+
+def _jsonl(path: Path) -> bool:
+    return path.suffix.lower() == ".jsonl"
+
+
+def write_rows_csv(rows: Sequence[Dict], output_csv: str) -> Path:
+    """整张结果表写成 CSV；列为各行键的并集（按首次出现的顺序），缺失的列留空"""
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    path = Path(output_csv)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = _csv_writer(f)
+        writer.writerow(columns)
+        writer.writerows(_csv_cells(row, columns) for row in rows)
+    return path
+
+
+def write_rows_json(rows: Iterable[Dict], output_json: str) -> Path:
+    """结果行写成 JSON 数组（indent=2）；路径以 .jsonl 结尾时每行一个对象"""
+    path = Path(output_json)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        if _jsonl(path):
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        else:
+            json.dump(list(rows), f, indent=2, ensure_ascii=False)
+    return path
+
+
+class RowWriter:
+    """逐行写出结果：每完成一个 firm-year 就追加到 CSV / JSON，不在内存里攒整张表。
+
+    CSV 与 ``pd.DataFrame(rows).to_csv(index=False)`` 同格式（表头取第一行的键），
+    JSON 与 ``json.dump(rows, indent=2, ensure_ascii=False)`` 逐字节一致；
+    output_json 以 .jsonl 结尾时每行一个对象。
+    """
+
+    def __init__(self, output_csv: str, output_json: Optional[str] = None):
+        self.csv_path = Path(output_csv)
+        self.csv_path.parent.mkdir(parents=True, exist_ok=True)
+        self._csv = open(self.csv_path, "w", encoding="utf-8", newline="")
+        self._csv_writer = _csv_writer(self._csv)
+        self._columns: List[str] = []
+        self._json = None
+        self.json_path = None
+        if output_json is not None:
+            self.json_path = Path(output_json)
+            self.json_path.parent.mkdir(parents=True, exist_ok=True)
+            self._json = open(self.json_path, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, row: Dict) -> None:
+        if self.count == 0:
+            self._columns = list(row)
+            self._csv_writer.writerow(self._columns)
+        self._csv_writer.writerow(_csv_cells(row, self._columns))
+        self._csv.flush()
+        if self._json is not None:
+            if _jsonl(self.json_path):
+                self._json.write(json.dumps(row, ensure_ascii=False) + "\n")
+            else:
+                body = json.dumps(row, indent=2, ensure_ascii=False)
+                body = "\n".join("  " + line for line in body.split("\n"))
+                self._json.write(("[\n" if self.count == 0 else ",\n") + body)
+            self._json.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self._csv.close()
+        if self._json is not None:
+            if not _jsonl(self.json_path):
+                self._json.write("\n]" if self.count else "[]")
+            self._json.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+JOURNAL_VERSION = 1
+
+
+class JournalError(ValueError):
+    """已有的结果日志不能续跑（不是结果日志，或写它时的配置不同）；CLI 报告成 [ERROR]，不打印 traceback"""
+
+
+def default_journal_path(output_csv: str) -> str:
+    return str(Path(output_csv).with_suffix(".rows.jsonl"))
+
+
+class RowJournal:
+    """追加写的结果日志（JSONL）：每完成一个 firm-year 就追加一行并 fsync，进程崩溃、OOM 时已完成的行不会丢。
+
+    第一行是表头（日志格式版本 + 识别配置指纹），其后每行一个结果行（finalize_rows 之前的原始行，
+    完成顺序）。resume=True 时读入已有日志：表头与当前配置不一致时拒绝续跑；最后一行写到一半的
+    （没有换行或解析失败）连同之后的内容截掉。内存里只记每个 (company, year) 所在的偏移量，
+    行本身用 read 按需读回。resume=False 时新建（覆盖旧日志）。
+    """
+
+    def __init__(self, path: str, state: Dict, resume: bool = False):
+        self.path = Path(path)
+        self.offsets: Dict[Tuple[str, int], int] = {}
+        header = json.loads(json.dumps({"journal": JOURNAL_VERSION, "state": state}, ensure_ascii=False))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists() and self._load(header):
+            self.resumed = len(self.offsets)
+        else:
+            self.resumed = 0
+            with open(self.path, "wb") as f:
+                f.write((json.dumps(header, ensure_ascii=False) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        self._f = open(self.path, "ab")
+        self._reader = None
+
+    def _load(self, header: Dict) -> bool:
+        """读入已有日志，返回 False 表示连表头都不完整（当作没有日志，重新开始）"""
+        with open(self.path, "rb") as f:
+            first = f.readline()
+            if not first.endswith(b"\n"):
+                return False
+            try:
+                found = json.loads(first)
+            except ValueError:
+                raise JournalError(f"{self.path} is not a row journal") from None
+            if found != header:
+                raise JournalError(
+                    f"{self.path} was written with a different configuration; run without --resume to start over"
+                )
+            pos = f.tell()
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    break
+                self.offsets[(str(row["company"]), int(row["year"]))] = pos
+                pos += len(line)
+        os.truncate(self.path, pos)
+        return True
+
+    def __contains__(self, key: Tuple[str, int]) -> bool:
+        return key in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def read(self, key: Tuple[str, int]) -> Dict:
+        if self._reader is None:
+            self._reader = open(self.path, "rb")
+        self._reader.seek(self.offsets[key])
+        return json.loads(self._reader.readline())
+
+    def write(self, row: Dict) -> None:
+        data = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+        pos = self._f.tell()
+        # 一整行一次写出再 fsync：崩溃时最多留下最后一行的一部分，续跑时截掉
+        self._f.write(data)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.offsets[(str(row["company"]), int(row["year"]))] = pos
+
+    def close(self) -> None:
+        self._f.close()
+        if self._reader is not None:
+            self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_rows(path: str, chunk_size: int = 1 << 20) -> Iterator[Dict]:
+    """逐行读取结果文件，不把整个结果集读进内存。
+
+    支持 RowWriter / json.dump 写出的 JSON 数组（分块读取、逐个对象解码），
+    以及每行一个对象的 .jsonl。数组元素必须是对象（结果行本来就是）。
+    """
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"Input JSON not found: {path}")
+    decoder = json.JSONDecoder()
+    with open(p, "r", encoding="utf-8") as f:
+        if p.suffix.lower() == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        buf, pos, eof = "", 0, False
+
+        def skip(chars: str) -> None:
+            nonlocal buf, pos, eof
+            while True:
+                while pos < len(buf) and buf[pos] in chars:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+
+        skip(" \t\r\n")
+        if pos >= len(buf) or buf[pos] != "[":
+            raise ValueError(f"{path}: expected a JSON array of result rows")
+        pos += 1
+        while True:
+            skip(" \t\r\n,")
+            if pos >= len(buf):
+                raise ValueError(f"{path}: unexpected end of file")
+            if buf[pos] == "]":
+                return
+            try:
+                row, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # 当前对象跨过了块边界：再读一块接着解码
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield row
+            pos = end
+
+
+COLUMNAR_SUFFIXES = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+DEFAULT_ROW_GROUP_SIZE = 10_000
+
+
+def default_evidence_path(output_path: str) -> Path:
+    """证据长表默认放在主表旁边：results.parquet -> results.evidence.parquet"""
+    p = Path(output_path)
+    return p.with_name(p.stem + ".evidence" + p.suffix)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImportError(
+            "Parquet/Arrow output requires pyarrow: pip install pyarrow"
+        ) from exc
+    return pyarrow
+
+
+class _TableSink:
+    """一张 Arrow 表的增量写出：攒够 row_group_size 行就写出一个 row group（IPC 为一个 record batch）"""
+
+    def __init__(self, pa, path: Path, schema, fmt: str, row_group_size: int):
+        self._pa = pa
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self._columns: Dict[str, list] = {name: [] for name in schema.names}
+        self._pending = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), schema)
+        else:
+            self._writer = pa.ipc.new_file(str(path), schema)
+
+    def append(self, values: Dict) -> None:
+        for name, column in self._columns.items():
+            column.append(values.get(name))
+        self._pending += 1
+        if self._pending >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        arrays = [self._pa.array(self._columns[f.name], type=f.type) for f in self.schema]
+        self._writer.write_batch(self._pa.record_batch(arrays, schema=self.schema))
+        for column in self._columns.values():
+            column.clear()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+
+class ColumnarWriter:
+    """逐行写出 Parquet / Arrow IPC 结果，面板回归可以零解析、按列读取。
+
+    - 主表：company, year, service_num, comp_count, sub_count, risk_score，
+      以及每个类别一列 uint8 的 0/1 标记（列名即类别名）；
+    - 证据长表：(company, year, category, rank, snippet, page, doc_id, start, end, phrase)，
+      每条证据一行，rank 是它在该类别里的序号；page 只有流式模式才有值，
+      偏移量证据（--evidence-offsets）填 doc_id/start/end/phrase，snippet 为空；
+    两张表都按 row_group_size 行分组增量写出。格式按扩展名判断：
+    .parquet 为 Parquet，.arrow / .feather / .ipc 为 Arrow IPC 文件。
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        categories: Sequence[str],
+        evidence_path: Optional[str] = None,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    ):
+        pa = _import_pyarrow()
+        self.path = Path(output_path)
+        fmt = COLUMNAR_SUFFIXES.get(self.path.suffix.lower())
+        if fmt is None:
+            raise ValueError(
+                f"Unknown columnar output suffix {self.path.suffix!r}; "
+                f"expected one of {sorted(COLUMNAR_SUFFIXES)}"
+            )
+        self.categories = list(categories)
+        self.evidence_path = Path(evidence_path or default_evidence_path(output_path))
+
+        row_schema = pa.schema(
+            [
+                ("company", pa.string()),
+                ("year", pa.int32()),
+                ("service_num", pa.int32()),
+                ("comp_count", pa.int32()),
+                ("sub_count", pa.int32()),
+                ("risk_score", pa.float64()),
+            ]
+            + [(cat, pa.uint8()) for cat in self.categories]
+        )
+        evidence_schema = pa.schema(
+            [
+                ("company", pa.string()),
+                ("year", pa.int32()),
+                ("category", pa.dictionary(pa.int8(), pa.string())),
+                ("rank", pa.int32()),
+                ("snippet", pa.string()),
+                ("page", pa.int32()),
+                ("doc_id", pa.string()),
+                ("start", pa.int64()),
+                ("end", pa.int64()),
+                ("phrase", pa.string()),
+            ]
+        )
+        self._rows = _TableSink(pa, self.path, row_schema, fmt, row_group_size)
+        self._evidence = _TableSink(pa, self.evidence_path, evidence_schema, fmt, row_group_size)
+        self.count = 0
+
+    def write(self, row: Dict) -> None:
+        flags = row.get("flags", {})
+        values = {name: row.get(name) for name in self._rows.schema.names[:6]}
+        values.update({cat: int(flags.get(cat, 0)) for cat in self.categories})
+        self._rows.append(values)
+
+        pages = row.get("evidence_pages", {})
+        for cat, items in row.get("evidence", {}).items():
+            cat_pages = pages.get(cat, [])
+            for rank, item in enumerate(items):
+                values = {
+                    "company": row["company"],
+                    "year": row["year"],
+                    "category": cat,
+                    "rank": rank,
+                    "page": cat_pages[rank] if rank < len(cat_pages) else None,
+                }
+                if isinstance(item, str):
+                    values["snippet"] = item
+                else:
+                    values.update(
+                        doc_id=row.get("doc_id"), start=item[0], end=item[1], phrase=item[2]
+                    )
+                self._evidence.append(values)
+        self.count += 1
+
+    def close(self) -> None:
+        self._rows.close()
+        self._evidence.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MultiWriter:
+    """把同一行同时交给多个 writer（如 CSV/JSON + Parquet）"""
+
+    def __init__(self, *writers):
+        self.writers = [w for w in writers if w is not None]
+
+    def write(self, row: Dict) -> None:
+        for writer in self.writers:
+            writer.write(row)
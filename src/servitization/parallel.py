@@ -0,0 +1,131 @@
+import traceback
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from . import profiling
+
+
+def _call_safely(func: Callable, args: Sequence) -> Tuple[Any, Optional[str]]:
+    """在 worker 内部捕获异常，把错误作为字符串带回主进程，避免单个文件拖垮整批"""
+    try:
+        return func(*args), None
+    except Exception as exc:  # noqa: BLE001 - 每个文件的错误都要单独上报
+        detail = traceback.format_exc(limit=3)
+        return None, f"{type(exc).__name__}: {exc}\n{detail}"
+
+
+def _call_profiled(func: Callable, args: Sequence):
+    """worker 内部执行并记录阶段事件，事件随结果带回主进程再交给那里的 collector"""
+    with profiling.collecting(profiling.EventRecorder(), exclusive=True) as recorder:
+        result, error = _call_safely(func, args)
+    return result, error, recorder.events
+
+
+def _unpack(outcome) -> Tuple[Any, Optional[str]]:
+    """去掉 worker 带回的阶段事件（转交给主进程的 collector），只留 (result, error)"""
+    if len(outcome) == 3:
+        profiling.emit(outcome[2])
+        return outcome[:2]
+    return outcome
+
+
+def run_tasks(
+    func: Callable,
+    tasks: Iterable[Sequence],
+    workers: int = 1,
+    ordered: bool = False,
+) -> Iterator[Tuple[Sequence, Any, Optional[str]]]:
+    """对每个任务调用 func(*args)，逐个产出 (args, result, error)。
+
+    - workers <= 1 时在当前进程串行执行；
+    - 否则用进程池并行，默认按完成顺序产出（调用方自行排序）；
+      ordered=True 时按任务顺序产出，先完成的结果暂存到轮到它为止；
+    - 同时在途（已提交未完成 + 暂存待产出）的任务至多 2 * workers 个，产出一个再提交下一个，
+      慢文件挡住 ordered 产出时暂存的结果也有上界；
+    - worker 进程崩溃（OOM、被杀）会让整个进程池失效：当时在途的任务换一个单进程的池逐个重跑，
+      只有真正崩溃的那个记为失败，其余任务在新的进程池里继续；
+    - func 必须是模块级函数，参数需可 pickle；
+    - 主进程挂载了 profiling collector 时，worker 里的阶段事件会转交给它们。
+    """
+    tasks = list(tasks)
+    if workers <= 1:
+        for args in tasks:
+            result, error = _call_safely(func, args)
+            yield args, result, error
+        return
+
+    # 进程池模块导入不算快，单进程运行（短任务的常见情形）用不到，需要时才导入
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    call = _call_profiled if profiling.active() else _call_safely
+    limit = 2 * workers
+
+    def outcome_of(fut) -> Tuple[Any, Optional[str]]:
+        try:
+            return _unpack(fut.result())
+        except BrokenProcessPool:
+            raise
+        except Exception as exc:  # noqa: BLE001 - 结果无法 pickle 等
+            return None, f"{type(exc).__name__}: {exc}"
+
+    def run_alone(i: int) -> Tuple[Any, Optional[str]]:
+        """进程池失效后单独重跑一个任务，它再把进程搞崩就是它自己的问题"""
+        with ProcessPoolExecutor(max_workers=1) as solo:
+            try:
+                return outcome_of(solo.submit(call, func, tasks[i]))
+            except BrokenProcessPool as exc:
+                return None, f"{type(exc).__name__}: {exc}"
+
+    done: Dict[int, Tuple[Any, Optional[str]]] = {}
+    next_index = 0  # ordered=True 时下一个该产出的任务
+
+    def finish(i: int, outcome: Tuple[Any, Optional[str]]):
+        nonlocal next_index
+        if not ordered:
+            yield (tasks[i],) + outcome
+            return
+        done[i] = outcome
+        while next_index in done:
+            yield (tasks[next_index],) + done.pop(next_index)
+            next_index += 1
+
+    pending = iter(range(len(tasks)))
+    running: Dict[Any, int] = {}
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            while len(running) + len(done) < limit:
+                i = next(pending, None)
+                if i is None:
+                    break
+                running[pool.submit(call, func, tasks[i])] = i
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            crashed = []
+            for fut in finished:
+                i = running.pop(fut)
+                try:
+                    outcome = outcome_of(fut)
+                except BrokenProcessPool:
+                    crashed.append(i)
+                    continue
+                yield from finish(i, outcome)
+            if not crashed:
+                continue
+            # 进程池已失效：其余在途的任务也会以 BrokenProcessPool 结束，先收下其中已经算完的
+            wait(running)
+            for fut, i in running.items():
+                try:
+                    outcome = outcome_of(fut)
+                except BrokenProcessPool:
+                    crashed.append(i)
+                    continue
+                yield from finish(i, outcome)
+            running.clear()
+            pool.shutdown()
+            for i in sorted(crashed):
+                yield from finish(i, run_alone(i))
+            pool = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        pool.shutdown(cancel_futures=True)
@@ -0,0 +1,293 @@
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .scoring import FlagPanel, _import_numpy
+
+
+# 文档 × 短语的命中计数索引：每篇文档（company, year, doc_id）记录词表里每个出现过的短语的
+# [hits, negated]。中文某类别是否命中 = 该类别任一短语有未被否定的命中；英文检测器在每个类别内部
+# 只取每个位置最长、互不重叠的短语并按它判断否定，索引因此另存英文各短语的命中位置和是否被否定，
+# 按候选词表重新做同样的取舍。增删短语、把短语改划到别的类别后，新的 flags / 计数 / 分数都能直接
+# 从索引算出，不必重新转换和扫描。索引里没有的新短语，用 doc_id 从 DocumentStore 取回被扫描文本，只扫这些新短语。
+
+
+def _count_func(lang: str) -> Callable:
+    # 按语言取计数函数；中文检测器只在用到时导入
+    if lang == "en":
+        from .detector import count_phrase_hits
+
+        return count_phrase_hits
+    if lang == "cn":
+        from servitization_cn.detector_cn import count_phrase_hits_cn
+
+        return count_phrase_hits_cn
+    raise ValueError(f"Unknown language {lang!r}; expected 'en' or 'cn'")
+
+
+class PhraseHitIndex:
+    """稀疏的文档 × 短语命中计数矩阵（按文档存 {短语下标: (hits, negated, spans)}），可存成 .npz。
+
+    - add(company, year, doc_id, counts)：记录一篇文档（同一 company-year 再次加入时按短语覆盖更新）；
+    - evaluate(keywords)：按候选词表算出各文档的类别标记，返回 FlagPanel（可接 rescore 计分）；
+    - scan_new_phrases(phrases, store)：对索引里没有的短语做定向扫描并补进索引。
+    hits 为命中数，negated 为其中被否定的次数，与检测器的计数口径一致；spans 为英文各处命中的
+    (start, negated)（中文为空），evaluate 据此重做每类最长、不重叠的取舍。
+    """
+
+    def __init__(self, lang: str):
+        self.lang = lang
+        self.docs: List[Tuple[str, int, Optional[str]]] = []
+        self.phrases: List[str] = []
+        self.rows: List[Dict[int, Tuple[int, int, Tuple[Tuple[int, int], ...]]]] = []
+        self._doc_pos: Dict[Tuple[str, int], int] = {}
+        self._phrase_pos: Dict[str, int] = {}
+        # 已对全部文档扫描过的短语（命中为 0 也算），新短语 = 不在这里的短语
+        self.indexed: set = set()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _phrase_id(self, phrase: str) -> int:
+        pid = self._phrase_pos.get(phrase)
+        if pid is None:
+            pid = self._phrase_pos[phrase] = len(self.phrases)
+            self.phrases.append(phrase)
+        return pid
+
+    def add(
+        self,
+        company: str,
+        year: int,
+        doc_id: Optional[str],
+        counts: Mapping[str, Sequence[int]],
+        scanned: Optional[Iterable[str]] = None,
+    ) -> None:
+        """记录一篇文档的计数（counts 的值为 [hits, negated]，英文另带 [[start, negated], ...]）。
+        scanned 为这次扫描过的短语：先清掉它们的旧计数（没出现在 counts 里的即为 0），
+        再写入 counts；scanned 为 None 时只覆盖 counts 里的短语"""
+        key = (str(company), int(year))
+        pos = self._doc_pos.get(key)
+        if pos is None:
+            pos = self._doc_pos[key] = len(self.docs)
+            self.docs.append((key[0], key[1], doc_id))
+            self.rows.append({})
+        elif doc_id is not None:
+            self.docs[pos] = (key[0], key[1], doc_id)
+        row = self.rows[pos]
+        if scanned is not None:
+            for phrase in scanned:
+                row.pop(self._phrase_id(phrase), None)
+        for phrase, (hits, negated, *spans) in counts.items():
+            marks = tuple((int(start), int(neg)) for start, neg in spans[0]) if spans else ()
+            row[self._phrase_id(phrase)] = (int(hits), int(negated), marks)
+
+    def add_rows(self, rows: List[Dict], keywords: Mapping[str, Sequence[str]]) -> None:
+        """流水线的 finalize_rows 钩子：取走行里的 _phrase_hits（doc_id、计数和扫描过的类别）记入索引"""
+        for row in rows:
+            hits = row.pop("_phrase_hits", None)
+            if hits is None:
+                continue
+            categories = hits.get("categories") or list(keywords)
+            scanned = [p for cat in categories for p in keywords[cat]]
+            self.add(row["company"], row["year"], hits["doc_id"], hits["counts"], scanned)
+
+    def retain(self, keys: Iterable[Tuple[str, int]]) -> None:
+        """只保留给定的 (company, year)（输入里已删除的文件不再留在索引里）"""
+        keep = {(str(c), int(y)) for c, y in keys}
+        pairs = [(d, r) for d, r in zip(self.docs, self.rows) if (d[0], d[1]) in keep]
+        self.docs = [d for d, _ in pairs]
+        self.rows = [r for _, r in pairs]
+        self._doc_pos = {(d[0], d[1]): i for i, d in enumerate(self.docs)}
+
+    def mark_indexed(self, phrases: Iterable[str]) -> None:
+        self.indexed.update(phrases)
+        for phrase in phrases:
+            self._phrase_id(phrase)
+
+    def new_phrases(self, keywords: Mapping[str, Sequence[str]]) -> List[str]:
+        return [p for p in dict.fromkeys(p for ps in keywords.values() for p in ps) if p not in self.indexed]
+
+    def scan_new_phrases(self, phrases: Sequence[str], store) -> int:
+        """从 store（DocumentStore）取回每篇文档的被扫描文本，只对 phrases 计数并补进索引；返回扫描的文档数"""
+        phrases = [p for p in dict.fromkeys(phrases) if p not in self.indexed]
+        if not phrases:
+            return 0
+        count = _count_func(self.lang)
+        n = 0
+        for company, year, doc_id in self.docs:
+            if doc_id is None:
+                raise ValueError(f"{company}-{year} has no doc_id; cannot scan new phrases")
+            text = store.get(doc_id)
+            if text is None:
+                raise FileNotFoundError(f"Document {doc_id} not found in {store.cache_dir}")
+            self.add(company, year, doc_id, count(text, phrases=phrases), scanned=phrases)
+            n += 1
+        self.mark_indexed(phrases)
+        return n
+
+    def effective_matrix(self, phrases: Sequence[str]):
+        """(文档数 × len(phrases)) 的 bool 矩阵：该短语在该文档里是否有未被否定的命中"""
+        np = _import_numpy()
+        E = np.zeros((len(self.docs), len(phrases)), dtype=bool)
+        cols = {self._phrase_pos[p]: j for j, p in enumerate(phrases) if p in self._phrase_pos}
+        for i, row in enumerate(self.rows):
+            for pid, (hits, negated, _) in row.items():
+                j = cols.get(pid)
+                if j is not None and hits > negated:
+                    E[i, j] = True
+        return E
+
+    def evaluate(
+        self,
+        keywords: Mapping[str, Sequence[str]],
+        store=None,
+    ) -> FlagPanel:
+        """按候选词表 {category: [phrase, ...]} 计算各文档的类别标记。
+
+        新短语需要传入 store 做定向扫描，否则抛出 KeyError；返回的 FlagPanel 可用
+        rescore(Scorer) 算出计数和风险分数。
+        """
+        missing = self.new_phrases(keywords)
+        if missing:
+            if store is None:
+                raise KeyError(f"{len(missing)} phrase(s) not in the index (pass a document store to scan them): {missing[:5]}")
+            self.scan_new_phrases(missing, store)
+        np = _import_numpy()
+        categories = list(keywords)
+        if self.lang == "en":
+            return FlagPanel(
+                [d[0] for d in self.docs], [d[1] for d in self.docs], categories, self._resolved_flags(keywords)
+            )
+        phrases = list(dict.fromkeys(p for ps in keywords.values() for p in ps))
+        col = {p: j for j, p in enumerate(phrases)}
+        M = np.zeros((len(phrases), len(categories)), dtype=np.int32)
+        for c, cat in enumerate(categories):
+            for p in keywords[cat]:
+                M[col[p], c] = 1
+        flags = (self.effective_matrix(phrases).astype(np.int32) @ M) > 0
+        return FlagPanel([d[0] for d in self.docs], [d[1] for d in self.docs], categories, flags)
+
+    def _resolved_flags(self, keywords: Mapping[str, Sequence[str]]):
+        """英文：每个类别内部按位置取该类最长的短语、跳过与已取命中重叠的（与 CategoryPhraseMatcher 相同），
+        取中的命中有未被否定的即标记。同一类里的长短语被否定时，不会因为其中较晚开始的短短语
+        落在否定窗口外而误标"""
+        np = _import_numpy()
+        flags = np.zeros((len(self.docs), len(keywords)), dtype=bool)
+        cat_pids = [
+            [(self._phrase_pos[p], len(p.lower())) for p in dict.fromkeys(ps) if p in self._phrase_pos]
+            for ps in keywords.values()
+        ]
+        for i, row in enumerate(self.rows):
+            for c, pids in enumerate(cat_pids):
+                longest: Dict[int, Tuple[int, int]] = {}
+                for pid, length in pids:
+                    entry = row.get(pid)
+                    if entry is None:
+                        continue
+                    for start, negated in entry[2]:
+                        if longest.get(start, (0, 0))[0] < length:
+                            longest[start] = (length, negated)
+                next_free = 0
+                for start in sorted(longest):
+                    if start < next_free:
+                        continue
+                    length, negated = longest[start]
+                    if not negated:
+                        flags[i, c] = True
+                        break
+                    next_free = start + length
+        return flags
+
+    def save(self, path: Union[str, Path]) -> Path:
+        np = _import_numpy()
+        doc_idx, phrase_idx, hits, negated = [], [], [], []
+        span_doc, span_phrase, span_start, span_negated = [], [], [], []
+        for i, row in enumerate(self.rows):
+            for pid, (h, n, marks) in row.items():
+                doc_idx.append(i)
+                phrase_idx.append(pid)
+                hits.append(h)
+                negated.append(n)
+                for start, neg in marks:
+                    span_doc.append(i)
+                    span_phrase.append(pid)
+                    span_start.append(start)
+                    span_negated.append(neg)
+        out = Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "wb") as f:
+            np.savez_compressed(
+                f,
+                lang=np.asarray(self.lang),
+                companies=np.asarray([d[0] for d in self.docs], dtype=str),
+                years=np.asarray([d[1] for d in self.docs], dtype=np.int32),
+                doc_ids=np.asarray([d[2] or "" for d in self.docs], dtype=str),
+                phrases=np.asarray(self.phrases, dtype=str),
+                indexed=np.asarray(sorted(self.indexed), dtype=str),
+                doc=np.asarray(doc_idx, dtype=np.int32),
+                phrase=np.asarray(phrase_idx, dtype=np.int32),
+                hits=np.asarray(hits, dtype=np.int32),
+                negated=np.asarray(negated, dtype=np.int32),
+                span_doc=np.asarray(span_doc, dtype=np.int32),
+                span_phrase=np.asarray(span_phrase, dtype=np.int32),
+                span_start=np.asarray(span_start, dtype=np.int64),
+                span_negated=np.asarray(span_negated, dtype=np.int8),
+            )
+        return out
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "PhraseHitIndex":
+        np = _import_numpy()
+        with np.load(path) as data:
+            index = cls(str(data["lang"]))
+            if index.lang == "en" and "span_start" not in data.files:
+                raise ValueError(f"{path} has no hit positions (written by an older version); rebuild it with --phrase-index")
+            index.phrases = [str(p) for p in data["phrases"]]
+            index._phrase_pos = {p: i for i, p in enumerate(index.phrases)}
+            index.indexed = {str(p) for p in data["indexed"]}
+            for company, year, doc_id in zip(data["companies"], data["years"], data["doc_ids"]):
+                key = (str(company), int(year))
+                index._doc_pos[key] = len(index.docs)
+                index.docs.append((key[0], key[1], str(doc_id) or None))
+                index.rows.append({})
+            spans: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+            if "span_start" in data.files:
+                for i, pid, start, neg in zip(
+                    data["span_doc"].tolist(),
+                    data["span_phrase"].tolist(),
+                    data["span_start"].tolist(),
+                    data["span_negated"].tolist(),
+                ):
+                    spans.setdefault((i, pid), []).append((start, neg))
+            for i, pid, h, n in zip(data["doc"].tolist(), data["phrase"].tolist(), data["hits"], data["negated"]):
+                index.rows[i][pid] = (int(h), int(n), tuple(spans.get((i, pid), ())))
+        return index
+
+    @classmethod
+    def open(cls, path: Union[str, Path], lang: str) -> "PhraseHitIndex":
+        """已有索引文件就载入（增量运行在其上更新），否则新建"""
+        if Path(path).exists():
+            index = cls.load(path)
+            if index.lang != lang:
+                raise ValueError(f"{path} is a {index.lang!r} phrase index, expected {lang!r}")
+            return index
+        return cls(lang)
+
+
+def compare_panels(old: FlagPanel, new: FlagPanel) -> Dict[str, Dict[str, int]]:
+    """逐类别比较两套词表的结果：{category: {"before": n, "after": n, "gained": n, "lost": n}}（按 firm-year 计）"""
+    out = {}
+    for cat in dict.fromkeys(old.categories + new.categories):
+        before = old.flags[:, old.categories.index(cat)] if cat in old.categories else None
+        after = new.flags[:, new.categories.index(cat)] if cat in new.categories else None
+        if before is None:
+            before = after * 0
+        if after is None:
+            after = before * 0
+        out[cat] = {
+            "before": int(before.sum()),
+            "after": int(after.sum()),
+            "gained": int(((after == 1) & (before == 0)).sum()),
+            "lost": int(((after == 0) & (before == 1)).sum()),
+        }
+    return out
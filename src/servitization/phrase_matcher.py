@@ -0,0 +1,223 @@
+import re
+from collections import defaultdict, deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class PhraseAutomaton:
+    """Aho-Corasick 多模式匹配器：一次扫描找出所有短语的全部出现位置（含重叠）。
+
+    例如同时包含 "维修" 与 "维修服务" 时，文本 "维修服务" 会产出两次命中。
+    自动机只在构造时编译一次，扫描代价与词表大小基本无关；
+    处在根状态时借助首字符正则直接跳到下一个可能的起点，跳过大段无关文本。
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for p in phrases:
+            if p and p not in self._ids:
+                self._ids[p] = len(self.phrases)
+                self.phrases.append(p)
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._build()
+
+        first_chars = sorted(self._goto[0].keys())
+        if first_chars:
+            self._first_re = re.compile("[" + "".join(re.escape(c) for c in first_chars) + "]")
+        else:
+            self._first_re = None
+
+    def _build(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        for pid, phrase in enumerate(self.phrases):
+            s = 0
+            for ch in phrase:
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    out.append(())
+                    goto[s][ch] = nxt
+                s = nxt
+            out[s] = out[s] + (pid,)
+
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, nxt in goto[s].items():
+                queue.append(nxt)
+                f = fail[s]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """逐个产出 (start, end, phrase_id)，按 end 递增（同一 end 时长短语在前）"""
+        if self._first_re is None:
+            return
+        goto, fail, out, phrases = self._goto, self._fail, self._out, self.phrases
+        search = self._first_re.search
+        n = len(text)
+        s = 0
+        i = 0
+        while i < n:
+            if s == 0:
+                m = search(text, i)
+                if m is None:
+                    return
+                i = m.start()
+            ch = text[i]
+            while True:
+                nxt = goto[s].get(ch)
+                if nxt is not None:
+                    s = nxt
+                    break
+                if s == 0:
+                    break
+                s = fail[s]
+            i += 1
+            for pid in out[s]:
+                yield i - len(phrases[pid]), i, pid
+
+    def positions_by_phrase(self, text: str) -> Dict[str, List[int]]:
+        """{phrase: [起始位置, ...]}，位置升序；没有出现的短语不在结果中"""
+        found: Dict[str, List[int]] = defaultdict(list)
+        phrases = self.phrases
+        for start, _, pid in self.iter_matches(text):
+            found[phrases[pid]].append(start)
+        return found
+
+
+def _trie_regex(phrases: Iterable[str]) -> str:
+    """把短语集合压成前缀树形式的正则，分支按首字符分流，最长匹配优先"""
+    root: Dict = {}
+    for phrase in phrases:
+        node = root
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def render(node: Dict) -> str:
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        alt = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # 可以在此处结束的节点：先尝试更长的分支，失败（含后续 \b 不成立）再回退到这里
+        return f"(?:{alt})?" if "" in node else alt
+
+    return render(root)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class CategoryPhraseMatcher:
+    """英文多类别词表的单次扫描匹配器，结果与每类一个 ``\\b(...)\\b`` 正则逐类 finditer 完全一致。
+
+    做法：所有类别的短语合成一个前缀树正则 ``\\b(?=(...)\\b)``，在每个词边界处用零宽
+    前瞻取出最长命中 L。同一位置能命中的其他短语必然是 L 的前缀，且其结尾的 \\b 是否成立
+    只由 L 自身的字符决定，因此可以预先算出“命中 L 时每个类别在该位置的最长短语长度”。
+    扫描时每个类别各自维护不重叠的游标，复现逐类 finditer 的语义；跨类别共享的短语
+    （如 leasing 与 performance contracts 中的 "fee per use"）会同时记到每个类别上。
+    """
+
+    def __init__(self, keywords_dict: Dict[str, List[str]]):
+        self.categories: List[str] = list(keywords_dict.keys())
+        phrase_cats: Dict[str, set] = defaultdict(set)
+        for ci, phrases in enumerate(keywords_dict.values()):
+            for p in phrases:
+                if p:
+                    phrase_cats[p.lower()].add(ci)
+
+        # 每个可能的最长命中 L -> [(类别下标, 该类在此位置的最长短语长度)]
+        self._per_longest: Dict[str, List[Tuple[int, int]]] = {}
+        for longest in phrase_cats:
+            best: Dict[int, int] = {}
+            for k in range(1, len(longest) + 1):
+                prefix = longest[:k]
+                if prefix not in phrase_cats:
+                    continue
+                if k < len(longest) and _is_word_char(longest[k - 1]) == _is_word_char(longest[k]):
+                    continue
+                for ci in phrase_cats[prefix]:
+                    best[ci] = k
+            self._per_longest[longest] = sorted(best.items())
+
+        self.phrases: List[str] = sorted(phrase_cats)
+        self.max_phrase_len = max((len(p) for p in phrase_cats), default=0)
+        self._regex = re.compile(
+            r"\b(?=(" + _trie_regex(phrase_cats) + r")\b)",
+            flags=re.IGNORECASE,
+        )
+
+    def find_spans(
+        self,
+        text: str,
+        pos: int = 0,
+        endpos: Optional[int] = None,
+        next_free: Optional[List[int]] = None,
+    ) -> Dict[str, List[Tuple[int, int]]]:
+        """{category: [(start, end), ...]}，每类内部按位置升序且互不重叠
+
+        只考虑起点在 [pos, endpos) 内的命中（短语本身可以越过 endpos）。
+        流式扫描时传入 next_free（每类一个游标，与 categories 同序），
+        函数会原地更新它，使分段扫描的结果与整篇一次扫描相同。
+        """
+        return self.select_spans(self.candidates(text, pos, endpos), next_free)
+
+    def candidates(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> List[Tuple[int, str]]:
+        """各词边界处的最长命中 [(start, longest), ...]，按位置升序，尚未按类别去重叠。
+
+        某个位置有没有命中、最长命中是什么，只取决于该位置前一个字符和之后 max_phrase_len + 1 个字符，
+        与更早的命中无关（段落缓存据此把各段的结果拼回整篇，见 match_cache）。
+        """
+        found = []
+        # 起点在 endpos 之前的命中最多读到 endpos + max_phrase_len 处，之后的文本不必交给正则
+        limit = len(text) if endpos is None else min(len(text), endpos + self.max_phrase_len + 1)
+        for m in self._regex.finditer(text, pos, limit):
+            start = m.start()
+            if endpos is not None and start >= endpos:
+                break
+            found.append((start, m.group(1)))
+        return found
+
+    def occurrences(self, text: str) -> Dict[str, List[Tuple[int, int]]]:
+        """{category: [(start, end), ...]}：各类在每个命中位置的最长短语，按位置升序，不做类内的去重叠。
+        每个短语单独当作一个类别时即为各短语在词边界处的全部出现位置（短语索引据此按候选词表重新取舍）"""
+        spans: List[List[Tuple[int, int]]] = [[] for _ in self.categories]
+        per_longest = self._per_longest
+        for start, longest in self.candidates(text):
+            entries = per_longest.get(longest)
+            if entries is None:
+                entries = per_longest[longest.lower()]
+            for ci, length in entries:
+                spans[ci].append((start, start + length))
+        return dict(zip(self.categories, spans))
+
+    def select_spans(
+        self, candidates: Iterable[Tuple[int, str]], next_free: Optional[List[int]] = None
+    ) -> Dict[str, List[Tuple[int, int]]]:
+        """由 candidates 的结果按每类不重叠的游标取出各类命中（next_free 含义同 find_spans）"""
+        if next_free is None:
+            next_free = [0] * len(self.categories)
+        spans: List[List[Tuple[int, int]]] = [[] for _ in self.categories]
+        per_longest = self._per_longest
+        for start, longest in candidates:
+            entries = per_longest.get(longest)
+            if entries is None:
+                entries = per_longest[longest.lower()]
+            for ci, length in entries:
+                if start >= next_free[ci]:
+                    end = start + length
+                    spans[ci].append((start, end))
+                    next_free[ci] = end
+        return dict(zip(self.categories, spans))
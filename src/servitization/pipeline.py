@@ -1,14 +1,45 @@
 import argparse
-import json
 import re
+import sys
 from collections import defaultdict
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
-import pandas as pd
-
-from .detector import process_company_item1s
-from .io_markitdown import convert_file_to_text
+from .boilerplate import BoilerplateOptions, boilerplate_state, report_boilerplate, strip_boilerplate
+from .config_keywords import KEYWORDS, NEGATION_CUES, NEGATION_WINDOW
+from .detector import (
+    DETECTOR_VERSION,
+    apply_lemma_fallback,
+    build_row,
+    classify_pages,
+    classify_services,
+    lemma_candidates,
+    preprocess_text,
+)
+from .evidence import DEFAULT_DOC_STORE_DIR, DocumentStore, EvidenceBudget
+from .io_markitdown import ExtractOptions, convert_file_to_text, extract_options, iter_file_pages, pdf_backend_names
+from .lemma import DEFAULT_MODEL as DEFAULT_LEMMA_MODEL, LemmaFallback, fallback_targets
+from .manifest import RunManifest, config_state, merge_partial_row
+from .match_cache import DEFAULT_MATCH_CACHE, MatchCache
+from .phrase_index import PhraseHitIndex
+from .output import (
+    ColumnarWriter,
+    JournalError,
+    MultiWriter,
+    RowJournal,
+    RowWriter,
+    default_journal_path,
+    write_rows_csv,
+    write_rows_json,
+)
+from .parallel import run_tasks
+from .profiling import profile_run, stage
+from .scoring import FlagMatrixWriter
+from .sections import extract_item1
+from .sharding import Shard, parse_shard, select_shard, write_shard_info
+from .text_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, TextCache
 
 
 FILENAME_PATTERN = re.compile(r"^(.+)_([0-9]{4})$")
@@ -24,46 +55,891 @@ def parse_company_year(path: Path):
     return company, year
 
 
-def build_company_year_texts(input_dir: Path) -> Dict[str, Dict[int, str]]:
-    """扫描 input_dir 下所有文件，构建 {company: {year: text}}"""
-    mapping: Dict[str, Dict[int, str]] = defaultdict(dict)
+def discover_company_year_files(input_dir: Path) -> List[Tuple[str, int, Path]]:
+    """扫描 input_dir 下所有文件，返回 [(company, year, path)]，按 (company, year) 排序。
 
+    同一 (company, year) 出现多个文件时保留遍历中最后一个，与原先 dict 覆盖的行为一致。
+    """
+    found: Dict[Tuple[str, int], Path] = {}
     for file in input_dir.glob("*"):
         if not file.is_file():
             continue
         company, year = parse_company_year(file)
         if company is None or year is None:
             continue
-        text = convert_file_to_text(file)
+        found[(company, year)] = file
+    return [(c, y, f) for (c, y), f in sorted(found.items())]
+
+
+def build_company_year_texts(
+    input_dir: Path,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+) -> Dict[str, Dict[int, str]]:
+    """扫描 input_dir 下所有文件，构建 {company: {year: text}}"""
+    mapping: Dict[str, Dict[int, str]] = defaultdict(dict)
+
+    for company, year, file in discover_company_year_files(input_dir):
+        text = convert_file_to_text(file, cache=cache, refresh_cache=refresh_cache)
         mapping[company][year] = text
 
     return mapping
 
 
-def run_pipeline(input_dir: str, output_csv: str, output_json: str | None = None):
-    input_path = Path(input_dir)
-    if not input_path.exists():
-        raise FileNotFoundError(f"Input dir not found: {input_dir}")
+def process_file(
+    company: str,
+    year: int,
+    path: Path,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    categories: Optional[Sequence[str]] = None,
+    section: bool = True,
+    doc_store: Optional[DocumentStore] = None,
+    lemma_fallback: bool = False,
+    phrase_store: Optional[DocumentStore] = None,
+    extract: Optional[ExtractOptions] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+    boilerplate: Optional[BoilerplateOptions] = None,
+    match_cache: Optional[MatchCache] = None,
+) -> Dict:
+    """单个文件的完整处理：转换 + 识别，返回一行结果（进程池里的一个任务）
+
+    categories 不为 None 时只识别这些类别（增量运行的局部重扫）；
+    section=True 时只扫描 Item 1. Business（定位失败时退回全文）；
+    传入 doc_store 时证据记为偏移量，被扫描文本存入 doc_store，行里带 doc_id；
+    lemma_fallback=True 时只在 worker 里挑出候选句（行里的 _lemma_text），
+    词形还原由主进程用 apply_lemma_rows 对所有行成批完成；
+    传入 phrase_store 时另外统计各短语的命中 / 否定次数（行里的 _phrase_hits，由 PhraseHitIndex.add_rows 取走），
+    被扫描文本存入 phrase_store，供以后对新短语做定向扫描；
+    extract 为 PDF 的抽取后端和页码范围（见 io_markitdown.ExtractOptions）；
+    evidence_budget 为证据的合并和条数上限（见 evidence.EvidenceBudget，默认每类 20 条）；
+    传入 boilerplate 时先剔除数字页、重复的页眉页脚和语料级样板句子再识别（见 boilerplate.strip_boilerplate），
+    行里带 boilerplate（删掉的字符数统计）；
+    传入 match_cache 时按段落识别，与缓存里相同的段落不再归一化和扫描（见 match_cache.MatchCache，结果不变）。
+    """
+    with stage("file", file=str(path)):
+        text = convert_file_to_text(path, cache=cache, refresh_cache=refresh_cache, extract=extract)
+        return classify_document(
+            company, year, text, str(path), categories, section, doc_store, lemma_fallback, phrase_store,
+            evidence_budget, boilerplate, match_cache,
+        )
+
+
+def classify_document(
+    company: str,
+    year: int,
+    text: str,
+    label: str = "",
+    categories: Optional[Sequence[str]] = None,
+    section: bool = True,
+    doc_store: Optional[DocumentStore] = None,
+    lemma_fallback: bool = False,
+    phrase_store: Optional[DocumentStore] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+    boilerplate: Optional[BoilerplateOptions] = None,
+    match_cache: Optional[MatchCache] = None,
+) -> Dict:
+    """process_file 转换之后的部分：对已抽取的全文定位章节并识别，返回一行结果（参数含义同 process_file）"""
+    document = text
+    if section:
+        with stage("section") as info:
+            text = extract_item1(text, label=label)
+            info["chars"] = len(text)
+    removed = None
+    if boilerplate is not None:
+        text, removed = strip_boilerplate(text, boilerplate, document)
+    if doc_store is not None or phrase_store is not None:
+        text = preprocess_text(text)
+    counts = {} if phrase_store is not None else None
+    flags, evidence = classify_services(
+        text,
+        categories=categories,
+        offsets=doc_store is not None,
+        phrase_counts=counts,
+        evidence_budget=evidence_budget,
+        match_cache=match_cache,
+    )
+    row = build_row(company, year, flags, evidence)
+    if removed is not None:
+        row["boilerplate"] = removed
+    if doc_store is not None:
+        row["doc_id"] = doc_store.add(text)
+    if phrase_store is not None:
+        row["_phrase_hits"] = {"doc_id": phrase_store.add(text), "counts": counts, "categories": categories}
+    if lemma_fallback:
+        row["_lemma_text"] = lemma_candidates(preprocess_text(text), flags)[1]
+    return row
+
+
+def apply_lemma_rows(rows: List[Dict], fallback: LemmaFallback, build_row_func: Callable = build_row) -> None:
+    """对 process_file(lemma_fallback=True) 的结果行成批做 lemma 回退（一次 nlp.pipe），并重算计数和风险分数"""
+    results = [(row["flags"], row["evidence"]) for row in rows]
+    candidates = [(fallback_targets(row["flags"], KEYWORDS), row.pop("_lemma_text", "")) for row in rows]
+    apply_lemma_fallback(results, candidates, fallback)
+    for row in rows:
+        # 补标的类别排回类别顺序，与增量运行复用旧行时的证据顺序一致
+        evidence = {cat: row["evidence"][cat] for cat in row["flags"] if cat in row["evidence"]}
+        row.update(build_row_func(row["company"], row["year"], row["flags"], evidence))
+
+
+def chain_finalizers(*funcs: Optional[Callable]) -> Optional[Callable[[List[Dict]], None]]:
+    """把多个 finalize_rows 钩子按顺序串起来（None 跳过）；都为 None 时返回 None"""
+    funcs = [f for f in funcs if f is not None]
+    if not funcs:
+        return None
+
+    def finalize(rows: List[Dict]) -> None:
+        for func in funcs:
+            func(rows)
+
+    return finalize
+
+
+def open_phrase_index(path: Optional[str], lang: str, incremental: bool) -> Optional[PhraseHitIndex]:
+    """--phrase-index：增量运行在已有索引上更新（复用的行沿用旧计数），否则新建"""
+    if path is None:
+        return None
+    return PhraseHitIndex.open(path, lang) if incremental else PhraseHitIndex(lang)
+
+
+def save_phrase_index(index: PhraseHitIndex, path: str, rows: List[Dict], keywords: Dict[str, List[str]]) -> None:
+    index.retain((r["company"], r["year"]) for r in rows)
+    index.mark_indexed(p for phrases in keywords.values() for p in phrases)
+    missing = len(rows) - len(index)
+    if missing:
+        print(
+            f"[WARN] {missing} firm-year(s) reused from the manifest are not in the phrase index; "
+            "run once without --incremental to index them",
+            file=sys.stderr,
+        )
+    index.save(path)
+    print(f"[INFO] Phrase index ({len(index)} docs x {len(index.phrases)} phrases) saved to: {path}")
+
+
+def resumed_rows(files: List[Tuple[str, int, Path]], journal: Optional[RowJournal]) -> List[Dict]:
+    """从日志读回本次输入里已经完成的行（日志里有、但已不在输入中的文件不读）"""
+    if journal is None:
+        return []
+    rows = [journal.read((c, y)) for c, y, _ in files if (c, y) in journal]
+    if rows:
+        print(f"[INFO] Resuming: {len(rows)} of {len(files)} files already done in {journal.path}")
+    return rows
+
+
+def process_files(
+    files: List[Tuple[str, int, Path]],
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    workers: int = 1,
+    process_func: Callable = process_file,
+    process_options: Optional[Dict] = None,
+    finalize_rows: Optional[Callable[[List[Dict]], None]] = None,
+    journal: Optional[RowJournal] = None,
+) -> Tuple[List[Dict], List[Tuple[Path, str]]]:
+    """串行或并行处理所有文件，返回 (按 (company, year) 排序的行, [(path, error)])。
+
+    单个文件失败只记录错误，不中断整批。process_options 作为关键字参数传给 process_func；
+    finalize_rows 在主进程里对全部新行统一做一次后处理（如成批的 lemma 回退）；
+    传入 journal 时每完成一个文件就追加进日志，日志里已有的文件（--resume）直接读回、不再处理。
+    """
+    func = partial(process_func, **(process_options or {}))
+    rows, failures = resumed_rows(files, journal), []
+    tasks = [(c, y, f, cache, refresh_cache) for c, y, f in files if journal is None or (c, y) not in journal]
+    for args, row, error in run_tasks(func, tasks, workers=workers):
+        path = args[2]
+        if error is not None:
+            print(f"[ERROR] Failed to process {path}: {error}", file=sys.stderr)
+            failures.append((path, error))
+            continue
+        if journal is not None:
+            journal.write(row)
+        rows.append(row)
+    if finalize_rows is not None:
+        finalize_rows(rows)
+    rows.sort(key=lambda r: (r["company"], r["year"]))
+    return rows, failures
+
+
+def current_config_state(
+    section: bool = True,
+    offsets: bool = False,
+    lemma_fallback: bool = False,
+    extract: Optional[ExtractOptions] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+    boilerplate: Optional[BoilerplateOptions] = None,
+) -> Dict:
+    """英文识别配置的指纹（检测器版本、各类别词表、否定设置、扫描范围、证据形式和预算、lemma 回退、PDF 抽取设置、
+    样板剔除设置），写入增量运行清单"""
+    budget = evidence_budget or EvidenceBudget()
+    shared = {
+        "negation_cues": NEGATION_CUES,
+        "negation_window": NEGATION_WINDOW,
+        "section": section,
+        "evidence_offsets": offsets,
+        "evidence_budget": list(budget),
+        "lemma_fallback": lemma_fallback,
+        "pdf_extract": list(extract or ExtractOptions()),
+    }
+    if boilerplate is not None:
+        # 不剔除样板时不写这一项，原有清单的指纹保持不变
+        shared["boilerplate"] = boilerplate_state(boilerplate)
+    if budget.per_document:
+        # 每篇的证据预算在各类别之间分配，只重扫部分类别时无法与完整运行一致，任一类词表变化都完整重跑
+        shared["keywords"] = KEYWORDS
+    return config_state(DETECTOR_VERSION, KEYWORDS, shared)
+
+
+def process_files_incremental(
+    files: List[Tuple[str, int, Path]],
+    manifest: RunManifest,
+    state: Dict,
+    categories: Sequence[str],
+    build_row_func: Callable = build_row,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    workers: int = 1,
+    process_func: Callable = process_file,
+    process_options: Optional[Dict] = None,
+    finalize_rows: Optional[Callable[[List[Dict]], None]] = None,
+    journal: Optional[RowJournal] = None,
+) -> Tuple[List[Dict], List[Tuple[Path, str]]]:
+    """按运行清单增量处理：未变化的文件直接复用旧行，只有部分类别词表变化的文件只重扫这些类别，
+    其余文件完整处理。处理完更新并保存清单，返回值与 process_files 相同。
+    finalize_rows 只作用于本次新扫描的行（在与旧行合并之前）；
+    传入 journal 时新扫描的行（与旧行合并之前）逐个追加进日志，续跑时日志里已有的直接读回。"""
+    rows, failures, tasks = [], [], []
+    digests: Dict[Path, str] = {}
+    rescans: Dict[Path, Tuple[Dict, List[str]]] = {}
+    n_reused = 0
+
+    for company, year, path in files:
+        digest = manifest.digest(path)
+        digests[path] = digest
+        old_row, stale = manifest.plan(path, digest, state)
+        if old_row is None:
+            tasks.append((company, year, path, cache, refresh_cache, None))
+        elif stale:
+            rescans[path] = (old_row, stale)
+            tasks.append((company, year, path, cache, refresh_cache, stale))
+        else:
+            row = merge_partial_row(company, year, old_row, None, categories, [], build_row_func)
+            manifest.record(path, digest, row)
+            rows.append(row)
+            n_reused += 1
+
+    func = partial(process_func, **(process_options or {}))
+    done, todo = [], tasks
+    if journal is not None:
+        done = [(args, journal.read(args[:2])) for args in tasks if args[:2] in journal]
+        todo = [args for args in tasks if args[:2] not in journal]
+        if done:
+            print(f"[INFO] Resuming: {len(done)} files already done in {journal.path}")
+    for args, row, error in run_tasks(func, todo, workers=workers):
+        path = args[2]
+        if error is not None:
+            print(f"[ERROR] Failed to process {path}: {error}", file=sys.stderr)
+            failures.append((path, error))
+            # 旧条目与新配置不再匹配，删掉以免下次被误当成最新结果
+            manifest.entries.pop(str(path), None)
+            continue
+        if journal is not None:
+            journal.write(row)
+        done.append((args, row))
+    if finalize_rows is not None:
+        finalize_rows([row for _, row in done])
+
+    for (company, year, path, *_), row in done:
+        if path in rescans:
+            old_row, stale = rescans[path]
+            row = merge_partial_row(company, year, old_row, row, categories, stale, build_row_func)
+        manifest.record(path, digests[path], row)
+        rows.append(row)
+
+    manifest.save(state, keep=[f for _, _, f in files])
+    print(
+        f"[INFO] Incremental run: {n_reused} reused, {len(rescans)} re-scanned for changed "
+        f"categories, {len(tasks) - len(rescans)} processed in full"
+    )
+    rows.sort(key=lambda r: (r["company"], r["year"]))
+    return rows, failures
+
+
+def default_manifest_path(output_csv: str) -> str:
+    return str(Path(output_csv).with_suffix(".manifest.json"))
+
+
+def stream_file(
+    company: str,
+    year: int,
+    path: Path,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    extract: Optional[ExtractOptions] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+) -> Dict:
+    """流式处理单个文件：逐页抽取、逐页识别，结果行额外带 evidence_pages（证据所在页码）"""
+    with stage("file", file=str(path)):
+        pages = iter_file_pages(path, cache=cache, refresh_cache=refresh_cache, extract=extract)
+        # 流式模式下抽取和识别逐页交替进行，只能整体计时
+        with stage("convert+classify"):
+            flags, evidence, evidence_pages = classify_pages(pages, evidence_budget=evidence_budget)
+    row = build_row(company, year, flags, evidence)
+    row["evidence_pages"] = evidence_pages
+    return row
+
+
+def stream_files(
+    files: List[Tuple[str, int, Path]],
+    writer,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    workers: int = 1,
+    process_func: Callable = stream_file,
+    process_options: Optional[Dict] = None,
+    journal: Optional[RowJournal] = None,
+) -> List[Tuple[Path, str]]:
+    """逐个文件处理并立即交给 writer.write 写出（按 (company, year) 顺序），返回 [(path, error)]。
+
+    内存里同时只有正在处理的文档（并行时每个 worker 一份），与输入目录大小无关。
+    process_options 作为关键字参数传给 process_func。传入 journal 时新行同时追加进日志；
+    日志里已有的文件（--resume）不再处理，按顺序从日志读回写出。
+    """
+    func = partial(process_func, **(process_options or {}))
+    tasks = [(c, y, f, cache, refresh_cache) for c, y, f in files if journal is None or (c, y) not in journal]
+    if journal is not None and len(tasks) < len(files):
+        print(f"[INFO] Resuming: {len(files) - len(tasks)} of {len(files)} files already done in {journal.path}")
+    results = run_tasks(func, tasks, workers=workers, ordered=True)
+    failures = []
+    for company, year, _ in files:
+        if journal is not None and (company, year) in journal:
+            row = journal.read((company, year))
+        else:
+            args, row, error = next(results)
+            if error is not None:
+                print(f"[ERROR] Failed to process {args[2]}: {error}", file=sys.stderr)
+                failures.append((args[2], error))
+                continue
+            if journal is not None:
+                journal.write(row)
+        with stage("write"):
+            writer.write(row)
+    return failures
+
+
+def run_pipeline(
+    input_dir: str,
+    output_csv: str,
+    output_json: str | None = None,
+    cache_dir: str | None = DEFAULT_CACHE_DIR,
+    refresh_cache: bool = False,
+    cache_max_bytes: int = DEFAULT_MAX_BYTES,
+    workers: int = 1,
+    stream: bool = False,
+    manifest_path: str | None = None,
+    section: bool = True,
+    output_parquet: str | None = None,
+    doc_store_dir: str | None = None,
+    profile: str | None = None,
+    trace: str | None = None,
+    output_matrix: str | None = None,
+    lemma_fallback: bool = False,
+    lemma_processes: int = 1,
+    phrase_index: str | None = None,
+    phrase_store_dir: str = DEFAULT_DOC_STORE_DIR,
+    extract: Optional[ExtractOptions] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+    shard: Optional[Shard] = None,
+    journal_path: str | None = None,
+    resume: bool = False,
+    boilerplate: Optional[BoilerplateOptions] = None,
+    match_cache: str | None = None,
+):
+    """cache_dir=None 表示不使用抽取文本缓存；workers>1 时按文件并行转换和识别；
+    extract 为 PDF 的抽取后端和页码范围（默认 markitdown 整份转换）；
+    evidence_budget 为证据的合并和每类 / 每篇条数上限（默认每类 20 条，见 evidence.EvidenceBudget）；
+    stream=True 时逐页识别、每完成一个文件就写出一行，内存占用不随文件数增长；
+    manifest_path 不为 None 时按运行清单增量处理（不能与 stream 同时使用）；
+    section=True 时只扫描 Item 1. Business（流式模式始终扫描全文）；
+    output_parquet 不为 None 时另外写出 Parquet / Arrow IPC 主表和证据长表；
+    output_matrix 不为 None 时另外写出 (n_firm_years × 类别数) 的 uint8 标记矩阵（.npz，见 scoring.FlagPanel）；
+    doc_store_dir 不为 None 时证据记为 (doc_id, start, end, phrase) 偏移量，被扫描文本存入该目录；
+    profile / trace 不为 None 时记录各文件、各阶段的耗时和计数，写出指标 JSON / Chrome trace 时间线；
+    lemma_fallback=True 时对未命中的类别做 spaCy 词形还原回退（模型按需加载，所有文件的候选句
+    成批送进 nlp.pipe，lemma_processes 个进程；lemma 集合按文本摘要缓存在 cache_dir 里）；
+    phrase_index 不为 None 时另外写出文档 × 短语的命中计数索引（见 phrase_index.PhraseHitIndex），
+    被扫描文本存入 phrase_store_dir，改词表后可以直接评估而不必重跑；
+    shard 不为 None 时只处理按 (company, year) 哈希分到该分片的文件，并在输出 CSV 旁写出分片说明
+    （<output>.shard.json，见 sharding.merge_shards）；
+    journal_path 不为 None 时每完成一个文件就把结果行追加进该 JSONL 日志（见 output.RowJournal），
+    resume=True 时跳过日志里已完成的文件接着跑，最后由日志和新行一起写出 CSV / JSON 等结果；
+    boilerplate 不为 None 时识别前先剔除数字页、重复的页眉页脚和语料级样板句子（见 boilerplate.BoilerplateOptions），
+    并汇总打印删掉了多少文本（不能与 stream 同时使用）；
+    match_cache 不为 None 时按段落识别，各段的归一化和扫描结果存在这个 SQLite 文件里，以后各年、各公司
+    相同的段落直接取用（见 match_cache.MatchCache，结果不变，不能与 stream 同时使用）"""
+    with profile_run(profile, trace):
+        input_path = Path(input_dir)
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input dir not found: {input_dir}")
+        if stream and manifest_path is not None:
+            raise ValueError("Incremental runs are not supported in streaming mode")
+        if stream and doc_store_dir is not None:
+            raise ValueError("Offset evidence is not supported in streaming mode")
+        if stream and lemma_fallback:
+            raise ValueError("The lemma fallback is not supported in streaming mode")
+        if stream and phrase_index is not None:
+            raise ValueError("The phrase index is not supported in streaming mode")
+        if stream and boilerplate is not None:
+            raise ValueError("Boilerplate stripping is not supported in streaming mode")
+        if stream and match_cache is not None:
+            raise ValueError("The paragraph match cache is not supported in streaming mode")
+        if resume and journal_path is None:
+            raise ValueError("Resuming needs the row journal of the interrupted run")
 
-    company_texts = build_company_year_texts(input_path)
+        cache = TextCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+        all_files = discover_company_year_files(input_path)
+        files = select_shard(all_files, shard) if shard is not None else all_files
+        if shard is not None:
+            print(f"[INFO] Shard {shard}: {len(files)} of {len(all_files)} files")
+        config = current_config_state(
+            section=section,
+            offsets=doc_store_dir is not None,
+            lemma_fallback=lemma_fallback,
+            extract=extract,
+            evidence_budget=evidence_budget,
+            boilerplate=boilerplate,
+        )
+        outputs = {"csv": output_csv, "json": output_json, "parquet": output_parquet, "matrix": output_matrix}
+        journal = None
+        if journal_path is not None:
+            journal_state = {**config, "stream": stream, "phrase_index": phrase_index is not None}
+            journal = RowJournal(journal_path, journal_state, resume=resume)
 
-    all_rows = []
-    for company, year_dict in company_texts.items():
-        rows = process_company_item1s(company, year_dict, use_lemma_fallback=False)
-        all_rows.extend(rows)
+        if stream:
+            columnar = ColumnarWriter(output_parquet, list(KEYWORDS.keys())) if output_parquet else None
+            matrix = FlagMatrixWriter(output_matrix, list(KEYWORDS.keys())) if output_matrix else None
+            with RowWriter(output_csv, output_json) as writer, columnar or nullcontext(), matrix or nullcontext():
+                failures = stream_files(
+                    files,
+                    MultiWriter(writer, columnar, matrix),
+                    cache=cache,
+                    refresh_cache=refresh_cache,
+                    workers=workers,
+                    process_options={"extract": extract, "evidence_budget": evidence_budget},
+                    journal=journal,
+                )
+            if journal is not None:
+                journal.close()
+            if failures:
+                print(f"[WARN] {len(failures)} of {len(files)} files failed", file=sys.stderr)
+            print(f"[INFO] CSV results saved to: {writer.csv_path}")
+            if writer.json_path is not None:
+                print(f"[INFO] JSON results saved to: {writer.json_path}")
+            if columnar is not None:
+                print(f"[INFO] Columnar results saved to: {columnar.path} (evidence: {columnar.evidence_path})")
+            if matrix is not None:
+                print(f"[INFO] Flag matrix saved to: {matrix.path}")
+            if shard is not None:
+                info = write_shard_info(
+                    shard, "en", all_files, files, failures, {**config, "stream": True}, KEYWORDS, outputs
+                )
+                print(f"[INFO] Shard info saved to: {info}")
+            return
+
+        process_options = {
+            "section": section,
+            "doc_store": DocumentStore(doc_store_dir) if doc_store_dir is not None else None,
+            "lemma_fallback": lemma_fallback,
+            "phrase_store": None,
+            "extract": extract,
+            "evidence_budget": evidence_budget,
+            "boilerplate": boilerplate,
+            "match_cache": MatchCache(match_cache) if match_cache is not None else None,
+        }
+        lemma_rows = None
+        if lemma_fallback:
+            fallback = LemmaFallback(n_process=lemma_processes, cache=cache)
+            lemma_rows = partial(apply_lemma_rows, fallback=fallback)
+        index = open_phrase_index(phrase_index, "en", manifest_path is not None)
+        index_rows = None
+        if index is not None:
+            process_options["phrase_store"] = DocumentStore(phrase_store_dir)
+            index_rows = partial(index.add_rows, keywords=KEYWORDS)
+        finalize_rows = chain_finalizers(lemma_rows, index_rows)
+        if manifest_path is not None:
+            all_rows, failures = process_files_incremental(
+                files,
+                RunManifest.load(manifest_path),
+                config,
+                list(KEYWORDS.keys()),
+                cache=cache,
+                refresh_cache=refresh_cache,
+                workers=workers,
+                process_options=process_options,
+                finalize_rows=finalize_rows,
+                journal=journal,
+            )
+        else:
+            all_rows, failures = process_files(
+                files,
+                cache=cache,
+                refresh_cache=refresh_cache,
+                workers=workers,
+                process_options=process_options,
+                finalize_rows=finalize_rows,
+                journal=journal,
+            )
+        if journal is not None:
+            journal.close()
+        if failures:
+            print(f"[WARN] {len(failures)} of {len(files)} files failed", file=sys.stderr)
+        if boilerplate is not None:
+            report_boilerplate(all_rows)
+        if index is not None:
+            save_phrase_index(index, phrase_index, all_rows, KEYWORDS)
+
+        with stage("write_csv"):
+            output_path = write_rows_csv(all_rows, output_csv)
+        print(f"[INFO] CSV results saved to: {output_path}")
+
+        if output_json is not None:
+            with stage("write_json"):
+                json_path = write_rows_json(all_rows, output_json)
+            print(f"[INFO] JSON results saved to: {json_path}")
+
+        if output_parquet is not None:
+            with stage("write_columnar"), ColumnarWriter(output_parquet, list(KEYWORDS.keys())) as columnar:
+                for row in all_rows:
+                    columnar.write(row)
+            print(f"[INFO] Columnar results saved to: {columnar.path} (evidence: {columnar.evidence_path})")
+
+        if output_matrix is not None:
+            with stage("write_matrix"), FlagMatrixWriter(output_matrix, list(KEYWORDS.keys())) as matrix:
+                for row in all_rows:
+                    matrix.write(row)
+            print(f"[INFO] Flag matrix saved to: {matrix.path}")
+
+        if shard is not None:
+            info = write_shard_info(
+                shard, "en", all_files, files, failures, {**config, "stream": False}, KEYWORDS, outputs
+            )
+            print(f"[INFO] Shard info saved to: {info}")
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    """抽取文本缓存相关的命令行参数，中英文两个 CLI 共用"""
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory of the extracted-text cache (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="Size cap of the text cache in MB; least recently used entries are evicted",
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the extracted-text cache",
+    )
+    group.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="Re-extract every file and overwrite its cache entry",
+    )
+
+
+def add_workers_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes; each file is converted and classified as one task",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Classify page by page and write each row as soon as its file is done "
+        "(memory stays flat; rows gain an evidence_pages column)",
+    )
+
+
+def add_extract_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--pdf-backend",
+        choices=pdf_backend_names(),
+        default="markitdown",
+        help="PDF text extraction: markitdown (default), or a page-level text-layer backend such as "
+        "pdfium (pypdfium2, several times faster); empty or garbled text falls back to markitdown",
+    )
+    parser.add_argument(
+        "--pdf-pages",
+        type=str,
+        default=None,
+        help="Only extract these PDF pages, e.g. 1-120, -80 or 5- (needs a page-level --pdf-backend)",
+    )
+
+
+def extract_options_from_args(args) -> ExtractOptions:
+    try:
+        return extract_options(args.pdf_backend, args.pdf_pages)
+    except ValueError as exc:
+        raise SystemExit(f"[ERROR] {exc}") from None
+
+
+def add_section_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--full-text",
+        action="store_true",
+        help="Scan the whole converted document instead of only the business section "
+        "(Item 1 for 10-Ks, 管理层讨论与分析/公司业务概要 for CN reports)",
+    )
+
+
+def add_columnar_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--output-parquet",
+        type=str,
+        default=None,
+        help="Optional: also write a typed columnar table (one uint8 column per category) "
+        "plus a long-format evidence table next to it; .parquet for Parquet, "
+        ".arrow/.feather for Arrow IPC (requires pyarrow)",
+    )
+
+
+def add_matrix_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--output-matrix",
+        type=str,
+        default=None,
+        help="Optional: also save the (firm-years x categories) uint8 flag matrix with company/year "
+        "as .npz, for re-scoring with other category types or weights (requires numpy)",
+    )
+
+
+def add_evidence_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--evidence-offsets",
+        action="store_true",
+        help="Record evidence as [start, end, phrase] offsets plus a per-row doc_id instead of "
+        "copying snippets; the scanned text goes to --doc-store for on-demand snippets",
+    )
+    parser.add_argument(
+        "--doc-store",
+        type=str,
+        default=DEFAULT_DOC_STORE_DIR,
+        help=f"Directory of scanned texts for --evidence-offsets and --phrase-index (default: {DEFAULT_DOC_STORE_DIR})",
+    )
+
+
+def doc_store_dir_from_args(args) -> str | None:
+    return args.doc_store if args.evidence_offsets else None
+
+
+def add_evidence_budget_arguments(parser: argparse.ArgumentParser):
+    defaults = EvidenceBudget()
+    parser.add_argument(
+        "--max-evidence-per-category",
+        type=int,
+        default=defaults.per_category,
+        help="Keep at most this many evidence snippets per category, ranked by distinct phrases "
+        f"covered and hit count; 0 keeps all (default: {defaults.per_category})",
+    )
+    parser.add_argument(
+        "--max-evidence-per-doc",
+        type=int,
+        default=defaults.per_document,
+        help="Keep at most this many snippets per document, taken from the categories in turn by rank; "
+        "0 means no document-level cap (default)",
+    )
+    parser.add_argument(
+        "--no-evidence-merge",
+        action="store_true",
+        help="Keep one snippet per match instead of merging matches whose context windows overlap",
+    )
+
+
+def evidence_budget_from_args(args) -> EvidenceBudget:
+    if args.max_evidence_per_category < 0 or args.max_evidence_per_doc < 0:
+        raise SystemExit("[ERROR] Evidence limits must be >= 0")
+    return EvidenceBudget(args.max_evidence_per_category, args.max_evidence_per_doc, not args.no_evidence_merge)
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record wall time, text size and match/negation counts per file and stage; "
+        "print a summary with the slowest files and write a metrics JSON",
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=str,
+        default=None,
+        help="Metrics JSON path for --profile (default: next to the output CSV, *.profile.json)",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        help="Also write a Chrome trace-format timeline (chrome://tracing, Perfetto) to this path",
+    )
+
+
+def profile_paths_from_args(args) -> Tuple[str | None, str | None]:
+    metrics = None
+    if args.profile or args.profile_output:
+        metrics = args.profile_output or str(Path(args.output_csv).with_suffix(".profile.json"))
+    return metrics, args.trace
+
+
+def add_lemma_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--lemma-fallback",
+        action="store_true",
+        help="For categories without a phrase match, also match single-word phrases against "
+        f"spaCy lemmas of candidate sentences (requires spacy and {DEFAULT_LEMMA_MODEL})",
+    )
+    parser.add_argument(
+        "--lemma-processes",
+        type=int,
+        default=1,
+        help="Processes used by spaCy's nlp.pipe for --lemma-fallback",
+    )
+
+
+def add_phrase_index_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--phrase-index",
+        type=str,
+        default=None,
+        help="Optional: also save a document x phrase hit-count index (.npz, with negated counts) "
+        "for what-if keyword evaluation; scanned texts go to --doc-store (requires numpy)",
+    )
+
+
+def add_incremental_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only process new/changed files (and re-scan only categories whose keywords "
+        "changed); unchanged rows are taken from the run manifest",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Run manifest path for --incremental (default: next to the output CSV)",
+    )
+
+
+def add_shard_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        metavar="I/N",
+        help="Only process the I-th of N disjoint slices of the input (1 <= I <= N), partitioned by a stable "
+        "hash of (company, year); writes <output>.shard.json for scripts/merge_shards.py",
+    )
+
+
+def shard_from_args(args) -> Optional[Shard]:
+    if args.shard is None:
+        return None
+    try:
+        return parse_shard(args.shard)
+    except ValueError as exc:
+        raise SystemExit(f"[ERROR] {exc}")
+
+
+def add_resume_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run: files already in the row journal are not processed again, "
+        "and the final outputs are written from the journal plus the new rows",
+    )
+    parser.add_argument(
+        "--journal",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+        help="Keep an append-only JSONL row journal, written (and fsynced) as each file completes, so an "
+        "interrupted run can be continued with --resume (default path: <output>.rows.jsonl next to the "
+        "output CSV). Off unless --journal or --resume is given",
+    )
+
+
+def journal_path_from_args(args) -> str | None:
+    """只有给了 --journal 或 --resume 时才写结果日志；不带路径时放在输出 CSV 旁边"""
+    if args.journal is None and not args.resume:
+        return None
+    return args.journal or default_journal_path(args.output_csv)
+
+
+def add_boilerplate_arguments(parser: argparse.ArgumentParser):
+    defaults = BoilerplateOptions()
+    parser.add_argument(
+        "--strip-boilerplate",
+        action="store_true",
+        help="Before detection, skip numeric-heavy pages (financial tables) and drop lines repeated within a "
+        "document (running headers/footers, page numbers); prints how much text was removed",
+    )
+    parser.add_argument(
+        "--boilerplate-corpus",
+        type=str,
+        default=None,
+        help="Also drop sentences listed in this corpus boilerplate file, built by scripts/build_boilerplate.py "
+        "(implies --strip-boilerplate)",
+    )
+    parser.add_argument(
+        "--min-line-repeats",
+        type=int,
+        default=defaults.min_line_repeats,
+        help="With --strip-boilerplate, drop lines that occur at least this often in one document; "
+        f"0 keeps them (default: {defaults.min_line_repeats})",
+    )
+    parser.add_argument(
+        "--max-numeric-ratio",
+        type=float,
+        default=defaults.max_numeric_ratio,
+        help="With --strip-boilerplate, skip pages (blank-line blocks without page breaks) whose share of digits "
+        f"among digits, letters and CJK characters exceeds this; 1 keeps them (default: {defaults.max_numeric_ratio})",
+    )
+
+
+def boilerplate_from_args(args) -> Optional[BoilerplateOptions]:
+    if not (args.strip_boilerplate or args.boilerplate_corpus):
+        return None
+    if args.min_line_repeats < 0 or args.max_numeric_ratio < 0:
+        raise SystemExit("[ERROR] --min-line-repeats and --max-numeric-ratio must be >= 0")
+    if args.boilerplate_corpus is not None and not Path(args.boilerplate_corpus).is_file():
+        raise SystemExit(f"[ERROR] Boilerplate corpus not found: {args.boilerplate_corpus}")
+    return BoilerplateOptions(args.boilerplate_corpus, args.min_line_repeats, args.max_numeric_ratio)
+
+
+def add_match_cache_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--match-cache",
+        type=str,
+        nargs="?",
+        const=DEFAULT_MATCH_CACHE,
+        default=None,
+        help="Classify paragraph by paragraph and keep each paragraph's normalized text and matches in this SQLite "
+        f"file (default when given without a path: {DEFAULT_MATCH_CACHE}); paragraphs seen before, in earlier "
+        "years or other firms, are looked up instead of rescanned. Results are unchanged",
+    )
 
-    df = pd.DataFrame(all_rows)
-    output_path = Path(output_csv)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(output_path, index=False)
-    print(f"[INFO] CSV results saved to: {output_path}")
 
-    if output_json is not None:
-        json_path = Path(output_json)
-        json_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(all_rows, f, indent=2, ensure_ascii=False)
-        print(f"[INFO] JSON results saved to: {json_path}")
+def manifest_path_from_args(args) -> str | None:
+    if not args.incremental:
+        return None
+    return args.manifest or default_manifest_path(args.output_csv)
 
 
 def main():
@@ -88,9 +964,56 @@ def main():
         default=None,
         help="Optional: path to save JSON results (with evidence)",
     )
+    add_cache_arguments(parser)
+    add_extract_arguments(parser)
+    add_workers_argument(parser)
+    add_incremental_arguments(parser)
+    add_section_argument(parser)
+    add_columnar_argument(parser)
+    add_matrix_argument(parser)
+    add_evidence_arguments(parser)
+    add_evidence_budget_arguments(parser)
+    add_profile_arguments(parser)
+    add_lemma_arguments(parser)
+    add_phrase_index_argument(parser)
+    add_shard_argument(parser)
+    add_resume_arguments(parser)
+    add_boilerplate_arguments(parser)
+    add_match_cache_argument(parser)
 
     args = parser.parse_args()
-    run_pipeline(args.input_dir, args.output_csv, args.output_json)
+    profile, trace = profile_paths_from_args(args)
+    try:
+        run_pipeline(
+            args.input_dir,
+            args.output_csv,
+            args.output_json,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            refresh_cache=args.refresh_cache,
+            cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            workers=args.workers,
+            stream=args.stream,
+            manifest_path=manifest_path_from_args(args),
+            section=not args.full_text,
+            output_parquet=args.output_parquet,
+            doc_store_dir=doc_store_dir_from_args(args),
+            profile=profile,
+            trace=trace,
+            output_matrix=args.output_matrix,
+            lemma_fallback=args.lemma_fallback,
+            lemma_processes=args.lemma_processes,
+            phrase_index=args.phrase_index,
+            phrase_store_dir=args.doc_store,
+            extract=extract_options_from_args(args),
+            evidence_budget=evidence_budget_from_args(args),
+            shard=shard_from_args(args),
+            journal_path=journal_path_from_args(args),
+            resume=args.resume,
+            boilerplate=boilerplate_from_args(args),
+            match_cache=args.match_cache,
+        )
+    except JournalError as exc:
+        raise SystemExit(f"[ERROR] {exc}") from None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,350 @@
+import argparse
+import sys
+from collections import Counter
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from servitization_cn.detector_cn import build_row_cn
+from servitization_cn.pipeline_cn import classify_document_cn, current_config_state_cn, parse_company_year_cn
+from .boilerplate import BoilerplateOptions, report_boilerplate
+from .config_keywords import KEYWORDS
+from .detector import build_row
+from .evidence import DocumentStore, EvidenceBudget
+from .io_markitdown import ExtractOptions, convert_file_to_text
+from .language import LANGUAGES, detect_language
+from .lemma import LemmaFallback
+from .manifest import RunManifest
+from .match_cache import MatchCache
+from .output import JournalError, RowJournal, write_rows_csv, write_rows_json
+from .pipeline import (
+    FILENAME_PATTERN,
+    add_boilerplate_arguments,
+    add_cache_arguments,
+    add_evidence_arguments,
+    add_evidence_budget_arguments,
+    add_extract_arguments,
+    add_incremental_arguments,
+    add_lemma_arguments,
+    add_match_cache_argument,
+    add_profile_arguments,
+    add_resume_arguments,
+    add_section_argument,
+    add_shard_argument,
+    apply_lemma_rows,
+    boilerplate_from_args,
+    classify_document,
+    current_config_state,
+    doc_store_dir_from_args,
+    evidence_budget_from_args,
+    extract_options_from_args,
+    journal_path_from_args,
+    manifest_path_from_args,
+    process_files,
+    process_files_incremental,
+    profile_paths_from_args,
+    shard_from_args,
+)
+from .profiling import profile_run, stage
+from .sharding import Shard, select_shard, write_shard_info
+from .text_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, TextCache
+
+
+# 中英文混合语料的统一入口：一次遍历发现全部文件，每个文件只转换一次（共用一个进程池和抽取文本缓存），
+# 按抽取文本（或文件名规则）判别语言后交给 classify_services / classify_services_cn，
+# 结果合并写成一张表，多一列 language。
+
+BUILD_ROW = {"en": build_row, "cn": build_row_cn}
+
+
+def parse_company_year_any(path: Path):
+    """先按英文约定 COMPANY_YYYY 解析，不符合时按中文年报的 <代码>_<年份>_... 解析"""
+    m = FILENAME_PATTERN.match(path.stem)
+    if m:
+        return m.group(1), int(m.group(2))
+    return parse_company_year_cn(path)
+
+
+def discover_mixed_files(input_dir: Path) -> List[Tuple[str, int, Path]]:
+    """递归扫描 input_dir（含 CN 等子目录），返回 [(company, year, path)]，按 (company, year) 排序"""
+    found: Dict[Tuple[str, int], Path] = {}
+    for file in input_dir.rglob("*"):
+        if not file.is_file():
+            continue
+        company, year = parse_company_year_any(file)
+        if company is None or year is None:
+            continue
+        found[(company, year)] = file
+    return [(c, y, f) for (c, y), f in sorted(found.items())]
+
+
+def finish_row(row: Dict) -> Dict:
+    """按行的语言重算计数和分数（两种语言的 CATEGORY_TYPE 不同），language 列放在 year 之后"""
+    lang = row["language"]
+    scored = BUILD_ROW[lang](row["company"], row["year"], row["flags"], row["evidence"])
+    out = {"company": scored.pop("company"), "year": scored.pop("year"), "language": lang, **scored}
+    out.update((k, v) for k, v in row.items() if k not in out)
+    return out
+
+
+def process_file_mixed(
+    company: str,
+    year: int,
+    path: Path,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    categories: Optional[Sequence[str]] = None,
+    section: bool = True,
+    doc_store: Optional[DocumentStore] = None,
+    lemma_fallback: bool = False,
+    language_rule: str = "text",
+    extract: Optional[ExtractOptions] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+    boilerplate: Optional[BoilerplateOptions] = None,
+    match_cache: Optional[MatchCache] = None,
+) -> Dict:
+    """转换一次，判别语言，再交给对应语言的章节定位和识别（进程池里的一个任务）。
+
+    lemma_fallback 和 evidence_budget 只对英文文档生效（中文证据固定每类至多 MAX_SNIPPETS_PER_CAT 条）；
+    其余参数含义同 process_file。
+    """
+    with stage("file", file=str(path)):
+        text = convert_file_to_text(path, cache=cache, refresh_cache=refresh_cache, extract=extract)
+        lang = detect_language(path, text, language_rule)
+        if lang == "cn":
+            row = classify_document_cn(
+                company, year, text, str(path), categories, section, doc_store,
+                boilerplate=boilerplate, match_cache=match_cache,
+            )
+        else:
+            row = classify_document(
+                company, year, text, str(path), categories, section, doc_store, lemma_fallback,
+                evidence_budget=evidence_budget, boilerplate=boilerplate, match_cache=match_cache,
+            )
+        row["language"] = lang
+        return finish_row(row)
+
+
+def current_config_state_mixed(
+    section: bool = True,
+    offsets: bool = False,
+    lemma_fallback: bool = False,
+    language_rule: str = "text",
+    extract: Optional[ExtractOptions] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+    boilerplate: Optional[BoilerplateOptions] = None,
+) -> Dict:
+    """中英文两份配置指纹合成一份：任一语言的某类别词表变化都会重扫该类别，语言判别规则变化则完整重跑"""
+    en = current_config_state(
+        section=section,
+        offsets=offsets,
+        lemma_fallback=lemma_fallback,
+        extract=extract,
+        evidence_budget=evidence_budget,
+        boilerplate=boilerplate,
+    )
+    cn = current_config_state_cn(section=section, offsets=offsets, extract=extract, boilerplate=boilerplate)
+    categories = dict.fromkeys(list(en["categories"]) + list(cn["categories"]))
+    return {
+        "detector_version": f"{en['detector_version']}+{cn['detector_version']}",
+        "shared": f"{en['shared']}+{cn['shared']}+{language_rule}",
+        "categories": {
+            cat: f"{en['categories'].get(cat)}+{cn['categories'].get(cat)}" for cat in categories
+        },
+    }
+
+
+def apply_lemma_rows_en(rows: List[Dict], fallback: LemmaFallback) -> None:
+    apply_lemma_rows([row for row in rows if row["language"] == "en"], fallback=fallback)
+
+
+def run_pipeline_mixed(
+    input_dir: str,
+    output_csv: str,
+    output_json: str | None = None,
+    cache_dir: str | None = DEFAULT_CACHE_DIR,
+    refresh_cache: bool = False,
+    cache_max_bytes: int = DEFAULT_MAX_BYTES,
+    workers: int = 1,
+    manifest_path: str | None = None,
+    section: bool = True,
+    doc_store_dir: str | None = None,
+    profile: str | None = None,
+    trace: str | None = None,
+    lemma_fallback: bool = False,
+    lemma_processes: int = 1,
+    language_rule: str = "text",
+    extract: Optional[ExtractOptions] = None,
+    evidence_budget: Optional[EvidenceBudget] = None,
+    shard: Optional[Shard] = None,
+    journal_path: str | None = None,
+    resume: bool = False,
+    boilerplate: Optional[BoilerplateOptions] = None,
+    match_cache: str | None = None,
+):
+    """中英文混合目录的一次运行；参数含义同 run_pipeline。
+    language_rule="text" 时按抽取文本的汉字比例判别语言（判不出时看文件名），"filename" 时只看文件名"""
+    with profile_run(profile, trace):
+        input_path = Path(input_dir)
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input dir not found: {input_dir}")
+        if resume and journal_path is None:
+            raise ValueError("Resuming needs the row journal of the interrupted run")
+
+        cache = TextCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+        all_files = discover_mixed_files(input_path)
+        files = select_shard(all_files, shard) if shard is not None else all_files
+        if shard is not None:
+            print(f"[INFO] Shard {shard}: {len(files)} of {len(all_files)} files")
+        config = current_config_state_mixed(
+            section, doc_store_dir is not None, lemma_fallback, language_rule, extract, evidence_budget, boilerplate
+        )
+        journal = RowJournal(journal_path, config, resume=resume) if journal_path is not None else None
+        process_options = {
+            "section": section,
+            "doc_store": DocumentStore(doc_store_dir) if doc_store_dir is not None else None,
+            "lemma_fallback": lemma_fallback,
+            "language_rule": language_rule,
+            "extract": extract,
+            "evidence_budget": evidence_budget,
+            "boilerplate": boilerplate,
+            "match_cache": MatchCache(match_cache) if match_cache is not None else None,
+        }
+        finalize_rows = None
+        if lemma_fallback:
+            fallback = LemmaFallback(n_process=lemma_processes, cache=cache)
+            finalize_rows = partial(apply_lemma_rows_en, fallback=fallback)
+        if manifest_path is not None:
+            all_rows, failures = process_files_incremental(
+                files,
+                RunManifest.load(manifest_path),
+                config,
+                list(KEYWORDS.keys()),
+                cache=cache,
+                refresh_cache=refresh_cache,
+                workers=workers,
+                process_func=process_file_mixed,
+                process_options=process_options,
+                finalize_rows=finalize_rows,
+                journal=journal,
+            )
+            # 复用 / 局部重扫的行按英文口径合并过，这里按各自的语言重算
+            all_rows = [finish_row(row) for row in all_rows]
+        else:
+            all_rows, failures = process_files(
+                files,
+                cache=cache,
+                refresh_cache=refresh_cache,
+                workers=workers,
+                process_func=process_file_mixed,
+                process_options=process_options,
+                finalize_rows=finalize_rows,
+                journal=journal,
+            )
+        if journal is not None:
+            journal.close()
+        if failures:
+            print(f"[WARN] {len(failures)} of {len(files)} files failed", file=sys.stderr)
+        counts = Counter(row["language"] for row in all_rows)
+        print("[INFO] Languages: " + ", ".join(f"{lang} {counts[lang]}" for lang in LANGUAGES))
+        if boilerplate is not None:
+            report_boilerplate(all_rows)
+
+        with stage("write_csv"):
+            output_path = write_rows_csv(all_rows, output_csv)
+        print(f"[INFO] CSV results saved to: {output_path}")
+
+        if output_json is not None:
+            with stage("write_json"):
+                json_path = write_rows_json(all_rows, output_json)
+            print(f"[INFO] JSON results saved to: {json_path}")
+
+        if shard is not None:
+            info = write_shard_info(
+                shard, "mixed", all_files, files, failures, config, KEYWORDS, {"csv": output_csv, "json": output_json}
+            )
+            print(f"[INFO] Shard info saved to: {info}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Detect service types in a mixed English/Chinese corpus, routing each file by language.",
+    )
+    parser.add_argument(
+        "--input-dir",
+        type=str,
+        default="data/raw",
+        help="Directory searched recursively for EN (COMPANY_YEAR.ext) and CN (CODE_YEAR_....ext) reports",
+    )
+    parser.add_argument(
+        "--output-csv",
+        type=str,
+        default="data/outputs/servitization_results_all.csv",
+        help="Path to save the combined CSV results (with a language column)",
+    )
+    parser.add_argument(
+        "--output-json",
+        type=str,
+        default=None,
+        help="Optional: path to save combined JSON results (with evidence)",
+    )
+    parser.add_argument(
+        "--language-rule",
+        choices=["text", "filename"],
+        default="text",
+        help="Detect each file's language from the share of CJK characters in its extracted text "
+        "(falling back to the file name), or from the file name only: a CJK name, a CN directory "
+        "or CODE_YEAR_... means Chinese (default: text)",
+    )
+    add_cache_arguments(parser)
+    add_extract_arguments(parser)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes shared by both languages; each file is one task",
+    )
+    add_incremental_arguments(parser)
+    add_section_argument(parser)
+    add_evidence_arguments(parser)
+    add_evidence_budget_arguments(parser)
+    add_profile_arguments(parser)
+    add_lemma_arguments(parser)
+    add_shard_argument(parser)
+    add_resume_arguments(parser)
+    add_boilerplate_arguments(parser)
+    add_match_cache_argument(parser)
+
+    args = parser.parse_args()
+    profile, trace = profile_paths_from_args(args)
+    try:
+        run_pipeline_mixed(
+            args.input_dir,
+            args.output_csv,
+            args.output_json,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            refresh_cache=args.refresh_cache,
+            cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            workers=args.workers,
+            manifest_path=manifest_path_from_args(args),
+            section=not args.full_text,
+            doc_store_dir=doc_store_dir_from_args(args),
+            profile=profile,
+            trace=trace,
+            lemma_fallback=args.lemma_fallback,
+            lemma_processes=args.lemma_processes,
+            language_rule=args.language_rule,
+            extract=extract_options_from_args(args),
+            evidence_budget=evidence_budget_from_args(args),
+            shard=shard_from_args(args),
+            journal_path=journal_path_from_args(args),
+            resume=args.resume,
+            boilerplate=boilerplate_from_args(args),
+            match_cache=args.match_cache,
+        )
+    except JournalError as exc:
+        raise SystemExit(f"[ERROR] {exc}") from None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+
+class StageEvent(NamedTuple):
+    """一次阶段计时：名称、所属文件、开始时间（perf_counter 秒）、耗时、进程号和附加计数"""
+
+    name: str
+    file: Optional[str]
+    start: float
+    duration: float
+    pid: int
+    fields: Dict
+
+
+# 已挂载的 collector；为空时 stage() 只多一次列表判断，几乎没有开销
+_collectors: List = []
+_current_file: ContextVar[Optional[str]] = ContextVar("current_file", default=None)
+
+
+def active() -> bool:
+    return bool(_collectors)
+
+
+def add_collector(collector) -> None:
+    _collectors.append(collector)
+
+
+def remove_collector(collector) -> None:
+    _collectors.remove(collector)
+
+
+@contextmanager
+def collecting(*collectors, exclusive: bool = False) -> Iterator:
+    """在 with 块内挂载 collector（任何有 on_event(event) 方法的对象），退出时卸下。
+
+    exclusive=True 时暂时只保留这些 collector（worker 进程里用，避免 fork 继承的父进程 collector 也收到事件）。
+    """
+    saved = _collectors[:]
+    if exclusive:
+        _collectors.clear()
+    _collectors.extend(collectors)
+    try:
+        yield collectors[0] if len(collectors) == 1 else collectors
+    finally:
+        _collectors[:] = saved
+
+
+def emit(events: Iterable[StageEvent]) -> None:
+    """把（通常来自 worker 进程的）事件转交给当前挂载的 collector"""
+    for event in events:
+        for collector in _collectors:
+            collector.on_event(event)
+
+
+@contextmanager
+def stage(name: str, file: Optional[str] = None, **fields) -> Iterator[Dict]:
+    """给一段代码计时。with 块内可以往产出的 dict 里写计数（chars / matches / negated 等），
+    一并交给 collector。name="file" 或传入 file 时，块内嵌套的阶段都归到这个文件下。"""
+    if not _collectors:
+        yield fields
+        return
+    token = _current_file.set(file) if file is not None else None
+    t0 = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        duration = time.perf_counter() - t0
+        event = StageEvent(name, file or _current_file.get(), t0, duration, os.getpid(), fields)
+        if token is not None:
+            _current_file.reset(token)
+        for collector in _collectors:
+            collector.on_event(event)
+
+
+class EventRecorder:
+    """原样记录事件；worker 进程里用它收集，再随结果带回主进程"""
+
+    def __init__(self):
+        self.events: List[StageEvent] = []
+
+    def on_event(self, event: StageEvent) -> None:
+        self.events.append(event)
+
+
+def _numeric(fields: Dict) -> Dict:
+    return {k: v for k, v in fields.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+class StageProfiler:
+    """按阶段、按文件汇总耗时和计数。
+
+    - stages：每个阶段的调用次数、总耗时以及各计数字段之和；
+    - files：每个文件的总耗时（"file" 阶段）、各阶段耗时，以及按 "阶段.字段" 汇总的计数；
+    slowest(n) 给出最慢的 n 个文件。
+    """
+
+    FILE_STAGE = "file"
+
+    def __init__(self):
+        self.stages: Dict[str, Dict] = defaultdict(lambda: defaultdict(float))
+        self.files: Dict[str, Dict] = defaultdict(
+            lambda: {"seconds": 0.0, "stages": defaultdict(float), "counts": defaultdict(float)}
+        )
+
+    def on_event(self, event: StageEvent) -> None:
+        agg = self.stages[event.name]
+        agg["calls"] += 1
+        agg["seconds"] += event.duration
+        for k, v in _numeric(event.fields).items():
+            agg[k] += v
+        if event.file is None:
+            return
+        per_file = self.files[event.file]
+        if event.name == self.FILE_STAGE:
+            per_file["seconds"] += event.duration
+            return
+        per_file["stages"][event.name] += event.duration
+        for k, v in _numeric(event.fields).items():
+            per_file["counts"][f"{event.name}.{k}"] += v
+
+    def slowest(self, n: int = 5) -> List[Dict]:
+        ranked = sorted(self.files.items(), key=lambda kv: -kv[1]["seconds"])
+        return [{"file": f, **_plain(v)} for f, v in ranked[:n]]
+
+    def to_dict(self, top: int = 5) -> Dict:
+        return {
+            "stages": {name: _plain(agg) for name, agg in self.stages.items()},
+            "files": {f: _plain(v) for f, v in self.files.items()},
+            "slowest_files": self.slowest(top),
+        }
+
+    def write(self, path: str, top: int = 5) -> None:
+        out = Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(top), f, indent=2, ensure_ascii=False)
+
+    def summary(self, top: int = 5) -> str:
+        lines = [f"{'stage':<16}{'calls':>8}{'seconds':>10}  counts"]
+        for name, agg in sorted(self.stages.items(), key=lambda kv: -kv[1]["seconds"]):
+            counts = ", ".join(
+                f"{k}={int(v)}" for k, v in agg.items() if k not in ("calls", "seconds")
+            )
+            lines.append(f"{name:<16}{int(agg['calls']):>8}{agg['seconds']:>10.3f}  {counts}")
+        slow = self.slowest(top)
+        if slow:
+            lines.append(f"slowest {len(slow)} file(s):")
+            lines.extend(f"  {s['seconds']:8.3f}s  {s['file']}" for s in slow)
+        return "\n".join(lines)
+
+
+def _plain(obj):
+    if isinstance(obj, dict):
+        return {k: _plain(v) for k, v in obj.items()}
+    return obj
+
+
+class ChromeTrace:
+    """把事件写成 Chrome trace 格式（chrome://tracing / Perfetto 可直接打开），每个进程一条时间线"""
+
+    def __init__(self):
+        self.events: List[StageEvent] = []
+
+    def on_event(self, event: StageEvent) -> None:
+        self.events.append(event)
+
+    def write(self, path: str) -> None:
+        t0 = min((e.start for e in self.events), default=0.0)
+        trace = [
+            {
+                "name": e.name,
+                "ph": "X",
+                "ts": round((e.start - t0) * 1e6, 1),
+                "dur": round(e.duration * 1e6, 1),
+                "pid": e.pid,
+                "tid": e.pid,
+                "args": {"file": e.file, **e.fields},
+            }
+            for e in self.events
+        ]
+        out = Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+@contextmanager
+def profile_run(metrics_path: Optional[str] = None, trace_path: Optional[str] = None, top: int = 5):
+    """流水线 --profile 用：两个路径都为 None 时什么也不做；否则挂载 StageProfiler（和 ChromeTrace），
+    结束时打印汇总、写出指标文件和时间线"""
+    if metrics_path is None and trace_path is None:
+        yield None
+        return
+    profiler = StageProfiler()
+    collectors = [profiler] + ([ChromeTrace()] if trace_path is not None else [])
+    with collecting(*collectors):
+        yield profiler
+    print(profiler.summary(top))
+    if metrics_path is not None:
+        profiler.write(metrics_path, top)
+        print(f"[INFO] Profile metrics saved to: {metrics_path}")
+    if trace_path is not None:
+        collectors[1].write(trace_path)
+        print(f"[INFO] Chrome trace saved to: {trace_path}")
@@ -0,0 +1,169 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+
+# 风险分数 = Σ 各类型命中类别数 × 该类型权重；英文、中文流水线共用这一套计算
+DEFAULT_WEIGHTS: Dict[str, float] = {"substituting": 2.0, "complementing": 0.5}
+COUNT_COLUMNS = {"comp_count": "complementing", "sub_count": "substituting"}
+
+
+class Scorer:
+    """按 CATEGORY_TYPE 映射和类型权重计算 service_num / comp_count / sub_count / risk_score。
+
+    score(flags) 对单行用纯 Python 计算（流水线逐行调用，不必为此导入 NumPy）；
+    score_matrix(F) 对 (n × 类别数) 的 0/1 矩阵一次算出整张面板，两者结果一致。
+    default_type 为映射里没有的类别所归的类型；为 None 时这些类别只计入 service_num。
+    """
+
+    def __init__(
+        self,
+        categories: Sequence[str],
+        category_type: Mapping[str, str],
+        weights: Optional[Mapping[str, float]] = None,
+        default_type: Optional[str] = None,
+    ):
+        self.categories = list(categories)
+        self.category_type = dict(category_type)
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.default_type = default_type
+        self.types = list(dict.fromkeys(list(self.weights) + list(COUNT_COLUMNS.values())))
+        self._type_of = {cat: self.category_type.get(cat, default_type) for cat in self.categories}
+
+    def with_config(
+        self,
+        category_type: Optional[Mapping[str, str]] = None,
+        weights: Optional[Mapping[str, float]] = None,
+    ) -> "Scorer":
+        """换一套类别类型映射 / 权重（未给出的沿用当前设置）"""
+        return Scorer(
+            self.categories,
+            self.category_type if category_type is None else category_type,
+            self.weights if weights is None else weights,
+            self.default_type,
+        )
+
+    def _risk(self, counts: Mapping[str, int]) -> float:
+        return sum(counts[t] * w for t, w in self.weights.items())
+
+    def score(self, flags: Mapping[str, int]) -> Dict:
+        counts = dict.fromkeys(self.types, 0)
+        for cat, v in flags.items():
+            if v == 1:
+                t = self._type_of.get(cat, self.category_type.get(cat, self.default_type))
+                if t in counts:
+                    counts[t] += 1
+        out = {"service_num": sum(flags.values())}
+        out.update({col: counts[t] for col, t in COUNT_COLUMNS.items()})
+        out["risk_score"] = self._risk(counts)
+        return out
+
+    def type_matrix(self):
+        """(类别数 × 类型数) 的 0/1 矩阵，第 j 列标出属于 self.types[j] 的类别"""
+        np = _import_numpy()
+        T = np.zeros((len(self.categories), len(self.types)), dtype=np.int32)
+        for i, cat in enumerate(self.categories):
+            t = self._type_of[cat]
+            if t in self.types:
+                T[i, self.types.index(t)] = 1
+        return T
+
+    def score_matrix(self, flags) -> Dict:
+        """对整张面板的标记矩阵（列顺序与 self.categories 一致）一次算出各列，返回列名 -> 数组"""
+        np = _import_numpy()
+        F = np.asarray(flags, dtype=np.int32)
+        counts = F @ self.type_matrix()
+        out = {"service_num": F.sum(axis=1)}
+        out.update({col: counts[:, self.types.index(t)] for col, t in COUNT_COLUMNS.items()})
+        # 按类型逐项累加（与 score 的求和顺序相同），任意权重下两条路径的浮点结果都一致
+        risk = np.zeros(len(F), dtype=np.float64)
+        for t, w in self.weights.items():
+            risk += counts[:, self.types.index(t)] * w
+        out["risk_score"] = risk
+        return out
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError("Flag matrices and re-scoring require NumPy: pip install numpy") from exc
+    return numpy
+
+
+class FlagPanel:
+    """整张面板的 (n_firm_years × 类别数) uint8 标记矩阵，连同 company / year 和类别顺序。
+
+    流水线用 --output-matrix 写成 .npz；之后换 CATEGORY_TYPE 或权重只需 rescore，不必重新扫描文本。
+    """
+
+    def __init__(self, companies: Sequence[str], years: Sequence[int], categories: Sequence[str], flags):
+        np = _import_numpy()
+        self.companies = np.asarray(companies, dtype=str)
+        self.years = np.asarray(years, dtype=np.int32)
+        self.categories = list(categories)
+        self.flags = np.asarray(flags, dtype=np.uint8).reshape(len(self.years), len(self.categories))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict], categories: Sequence[str]) -> "FlagPanel":
+        """由结果行（含 flags 字典）组装；可以直接传 output.iter_rows 读出的行"""
+        companies, years, flat = [], [], bytearray()
+        for row in rows:
+            companies.append(str(row["company"]))
+            years.append(row["year"])
+            flags = row.get("flags", {})
+            flat.extend(int(flags.get(cat, 0)) for cat in categories)
+        np = _import_numpy()
+        matrix = np.frombuffer(bytes(flat), dtype=np.uint8).reshape(len(years), len(categories))
+        return cls(companies, years, categories, matrix)
+
+    def rescore(self, scorer: Scorer) -> Dict:
+        """按 scorer 的类别映射和权重重算计数和风险分数（矩阵列先按 scorer.categories 对齐）"""
+        return scorer.score_matrix(self.flags[:, [self.categories.index(c) for c in scorer.categories]])
+
+    def save(self, path: Union[str, Path]) -> Path:
+        np = _import_numpy()
+        out = Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "wb") as f:
+            np.savez_compressed(
+                f,
+                flags=self.flags,
+                companies=self.companies,
+                years=self.years,
+                categories=np.asarray(self.categories, dtype=str),
+            )
+        return out
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "FlagPanel":
+        np = _import_numpy()
+        with np.load(path) as data:
+            return cls(data["companies"], data["years"], [str(c) for c in data["categories"]], data["flags"])
+
+
+class FlagMatrixWriter:
+    """逐行收集标记（每行只占类别数个字节），close() 时写出 FlagPanel；可与 RowWriter 一起放进 MultiWriter"""
+
+    def __init__(self, output_path: str, categories: Sequence[str]):
+        self.path = Path(output_path)
+        self.categories = list(categories)
+        self._companies: List[str] = []
+        self._years: List[int] = []
+        self._flags = bytearray()
+
+    def write(self, row: Dict) -> None:
+        self._companies.append(str(row["company"]))
+        self._years.append(row["year"])
+        flags = row.get("flags", {})
+        self._flags.extend(int(flags.get(cat, 0)) for cat in self.categories)
+
+    def close(self) -> None:
+        np = _import_numpy()
+        matrix = np.frombuffer(bytes(self._flags), dtype=np.uint8).reshape(len(self._years), len(self.categories))
+        FlagPanel(self._companies, self._years, self.categories, matrix).save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,72 @@
+import logging
+import re
+from typing import List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# 目录（TOC）里也会出现同样的标题，但“标题到下一个标题”的距离很短；
+# 因此对每个候选起点取到下一个结束标题为止，选最长的那一段作为正文。
+MIN_SECTION_CHARS = 500
+
+# 10-K：Item 1. Business 到 Item 1A（没有 1A 时到 1B / Item 2）
+_ITEM1_START = re.compile(r"^[\s|#*]*item\s*1\s*[.:\-–—]?[\s|*]*business\b", re.I | re.M)
+_ITEM1_END = re.compile(r"^[\s|#*]*item\s*(?:1a|1b|2)\b", re.I | re.M)
+
+# 中文年报：第三节 管理层讨论与分析（2021 年起的格式）；
+# 旧格式为 第三节 公司业务概要 + 第四节 经营情况讨论与分析，两节都取
+# 只认行首的节标题，正文里“详见第三节‘……’”之类的引用不算
+_CN_SECTION_HEAD = re.compile(
+    r"^[\s|*#]*第\s*[一二三四五六七八九十]+\s*节[\s|*#]*[\u4e00-\u9fff]", re.M
+)
+_CN_TARGETS = ["管理层讨论与分析", "公司业务概要", "经营情况讨论与分析"]
+_CN_TARGET_HEAD = re.compile(
+    r"^[\s|*#]*第\s*[一二三四五六七八九十]+\s*节[\s|*#]*(" + "|".join(_CN_TARGETS) + ")",
+    re.M,
+)
+
+
+def _longest(spans: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+    spans = [s for s in spans if s[1] - s[0] >= MIN_SECTION_CHARS]
+    if not spans:
+        return None
+    return max(spans, key=lambda s: s[1] - s[0])
+
+
+def find_item1_span(text: str) -> Optional[Tuple[int, int]]:
+    """定位 10-K 的 Item 1. Business 正文，返回 (start, end)；找不到返回 None"""
+    candidates = []
+    for m in _ITEM1_START.finditer(text):
+        end = _ITEM1_END.search(text, m.end())
+        if end is not None:
+            candidates.append((m.start(), end.start()))
+    return _longest(candidates)
+
+
+def find_business_spans_cn(text: str) -> List[Tuple[int, int]]:
+    """定位中文年报的 管理层讨论与分析 / 公司业务概要 / 经营情况讨论与分析 各节，按位置排序"""
+    by_title = {}
+    for m in _CN_TARGET_HEAD.finditer(text):
+        nxt = _CN_SECTION_HEAD.search(text, m.end())
+        end = nxt.start() if nxt is not None else len(text)
+        by_title.setdefault(m.group(1), []).append((m.start(), end))
+    spans = [s for s in (_longest(c) for c in by_title.values()) if s is not None]
+    return sorted(spans)
+
+
+def _join_spans(text: str, spans: List[Tuple[int, int]], label: str, what: str) -> str:
+    if not spans:
+        logger.warning("%s: %s not found, scanning the full text", label or "document", what)
+        return text
+    return "\n".join(text[s:e] for s, e in spans)
+
+
+def extract_item1(text: str, label: str = "") -> str:
+    """取 Item 1. Business 正文；定位失败时记录 warning 并返回全文"""
+    span = find_item1_span(text)
+    return _join_spans(text, [span] if span else [], label, "Item 1. Business")
+
+
+def extract_business_sections_cn(text: str, label: str = "") -> str:
+    """取 管理层讨论与分析 / 公司业务概要 等节正文；定位失败时记录 warning 并返回全文"""
+    return _join_spans(text, find_business_spans_cn(text), label, "管理层讨论与分析/公司业务概要")
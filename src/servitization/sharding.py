@@ -0,0 +1,249 @@
+import csv
+import hashlib
+import heapq
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .output import ColumnarWriter, MultiWriter, RowWriter, _csv_writer, iter_rows
+
+
+# 分片运行：按 (company, year) 的稳定哈希把发现的文件划给 N 个分片，各分片可以在不同进程 / 机器上独立运行，
+# 最后用 merge_shards 合成一张面板。哈希只取决于 company 和 year，与文件路径、发现顺序、机器无关；
+# 每个分片在输出 CSV 旁写一份说明（<output>.shard.json），合并时据此核对没有缺失、没有重复的 firm-year。
+
+SHARD_INFO_VERSION = 1
+
+
+class Shard(NamedTuple):
+    index: int  # 1..count
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard(text: str) -> Shard:
+    """解析 "i/N"（i 从 1 开始）"""
+    index, sep, count = text.partition("/")
+    try:
+        shard = Shard(int(index), int(count))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {text!r}") from None
+    if not sep or shard.count < 1 or not 1 <= shard.index <= shard.count:
+        raise ValueError(f"Shard must look like i/N with 1 <= i <= N, got {text!r}")
+    return shard
+
+
+def shard_of(company: str, year: int, count: int) -> int:
+    """(company, year) 所属的分片号（1..count）；不用内置 hash()，它按进程加盐，跨进程不稳定"""
+    digest = hashlib.sha256(f"{company}\x00{year}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def select_shard(files: Sequence[Tuple[str, int, Path]], shard: Shard) -> List[Tuple[str, int, Path]]:
+    return [f for f in files if shard_of(f[0], f[1], shard.count) == shard.index]
+
+
+def default_shard_info_path(output_csv: str) -> str:
+    return str(Path(output_csv).with_suffix(".shard.json"))
+
+
+def _keys_digest(keys: Iterable[Tuple[str, int]]) -> str:
+    raw = json.dumps(sorted([c, y] for c, y in keys), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def write_shard_info(
+    shard: Shard,
+    pipeline: str,
+    all_files: Sequence[Tuple[str, int, Path]],
+    files: Sequence[Tuple[str, int, Path]],
+    failures: Sequence[Tuple[Path, str]],
+    config: Dict,
+    categories: Sequence[str],
+    outputs: Dict[str, Optional[str]],
+) -> Path:
+    """写出分片说明：分片号、全部输入的 firm-year 数和摘要（各分片据此确认看到的是同一批输入）、
+    本分片分到的和失败的 firm-year、识别配置指纹，以及本分片各输出文件的路径"""
+    failed = {str(path) for path, _ in failures}
+    info = {
+        "version": SHARD_INFO_VERSION,
+        "shard": list(shard),
+        "pipeline": pipeline,
+        "config": config,
+        "universe": {"files": len(all_files), "digest": _keys_digest((c, y) for c, y, _ in all_files)},
+        "assigned": [[c, y] for c, y, _ in files],
+        "failed": [[c, y] for c, y, f in files if str(f) in failed],
+        "categories": list(categories),
+        "outputs": {k: str(Path(v).resolve()) for k, v in outputs.items() if v is not None},
+    }
+    path = Path(default_shard_info_path(outputs["csv"]))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_shard_info(path: str) -> Dict:
+    """读分片说明；传输出 CSV 的路径时取它旁边的 .shard.json"""
+    p = Path(path)
+    if not p.name.endswith(".shard.json"):
+        p = Path(default_shard_info_path(path))
+    if not p.exists():
+        raise FileNotFoundError(f"Shard info not found: {p}")
+    with open(p, "r", encoding="utf-8") as f:
+        info = json.load(f)
+    info["path"] = str(p)
+    return info
+
+
+def _row_key(row: Dict) -> Tuple[str, int]:
+    return str(row["company"]), int(row["year"])
+
+
+def csv_keys(path: str) -> List[Tuple[str, int]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [_row_key(row) for row in csv.DictReader(f)]
+
+
+def verify_shards(infos: Sequence[Dict], allow_failed: bool = False) -> List[str]:
+    """核对各分片能否合成一张完整的面板，返回问题列表（为空表示可以合并）：
+    分片数一致且 1..N 各出现一次、流水线 / 配置 / 输入一致、各 CSV 的行恰好是分到的 firm-year
+    （失败的 firm-year 只有 allow_failed 时才允许缺失），且 firm-year 不重复"""
+    if not infos:
+        return ["no shards given"]
+    problems = []
+    first = infos[0]
+    for key in ("pipeline", "config", "universe"):
+        differ = [info["path"] for info in infos if info[key] != first[key]]
+        if differ:
+            problems.append(f"{key} differs from {first['path']}: {', '.join(differ)}")
+    count = first["shard"][1]
+    seen: Dict[int, str] = {}
+    for info in infos:
+        index, n = info["shard"]
+        if n != count:
+            problems.append(f"{info['path']}: shard {index}/{n}, expected N={count}")
+        elif index in seen:
+            problems.append(f"shard {index}/{count} given twice: {seen[index]}, {info['path']}")
+        seen[index] = info["path"]
+    missing_shards = [i for i in range(1, count + 1) if i not in seen]
+    if missing_shards:
+        problems.append(f"missing shards: {', '.join(f'{i}/{count}' for i in missing_shards)}")
+
+    owner: Dict[Tuple[str, int], str] = {}
+    for info in infos:
+        index, n = info["shard"]
+        assigned = {(c, y) for c, y in info["assigned"]}
+        failed = {(c, y) for c, y in info["failed"]}
+        wrong = [k for k in assigned if shard_of(k[0], k[1], n) != index]
+        if wrong:
+            problems.append(f"{info['path']}: {len(wrong)} firm-years do not hash to shard {index}/{n}")
+        rows = csv_keys(info["outputs"]["csv"])
+        extra = sorted(set(rows) - assigned)
+        if extra:
+            problems.append(f"{info['outputs']['csv']}: rows not assigned to this shard: {extra[:5]}")
+        absent = sorted(assigned - set(rows) - (failed if allow_failed else set()))
+        if absent:
+            note = f" ({len(failed & set(absent))} failed in the shard)" if failed & set(absent) else ""
+            problems.append(f"{info['outputs']['csv']}: {len(absent)} firm-years missing{note}: {absent[:5]}")
+        for k in rows:
+            if k in owner:
+                problems.append(f"duplicate firm-year {k[0]} {k[1]}: {owner[k]}, {info['outputs']['csv']}")
+            owner[k] = info["outputs"]["csv"]
+    total = sum(len(info["assigned"]) for info in infos)
+    if not problems and total != first["universe"]["files"]:
+        problems.append(f"shards cover {total} of {first['universe']['files']} firm-years")
+    return problems
+
+
+def _iter_csv_rows(path: str, columns: List[str]) -> Iterator[Tuple[Tuple[str, int], List[str]]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        pos = {col: i for i, col in enumerate(header)}
+        for cells in reader:
+            row = [cells[pos[col]] if col in pos else "" for col in columns]
+            yield (row[0], int(row[1])), row
+
+
+def merge_csv(paths: Sequence[str], output_csv: str) -> int:
+    """按 (company, year) 归并各分片的 CSV（各自已按该顺序写出），单元格原样保留；列为各表头的并集"""
+    columns: List[str] = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            columns.extend(col for col in next(csv.reader(f), []) if col not in columns)
+    if columns[:2] != ["company", "year"]:
+        raise ValueError(f"Expected CSV columns to start with company, year; got {columns[:2]}")
+    out = Path(output_csv)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    n = 0
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        writer = _csv_writer(f)
+        writer.writerow(columns)
+        for _, row in heapq.merge(*(_iter_csv_rows(p, columns) for p in paths), key=lambda item: item[0]):
+            writer.writerow(row)
+            n += 1
+    return n
+
+
+def merge_rows(
+    paths: Sequence[str],
+    output_csv: str,
+    output_json: Optional[str] = None,
+    output_parquet: Optional[str] = None,
+    output_matrix: Optional[str] = None,
+    categories: Sequence[str] = (),
+) -> int:
+    """按 (company, year) 归并各分片的 JSON / JSONL 结果行，逐行交给与流水线相同的 writer 写出"""
+    from .scoring import FlagMatrixWriter
+
+    columnar = ColumnarWriter(output_parquet, categories) if output_parquet else None
+    matrix = FlagMatrixWriter(output_matrix, categories) if output_matrix else None
+    writers = [w for w in (columnar, matrix) if w is not None]
+    last = None
+    with RowWriter(output_csv, output_json) as writer:
+        multi = MultiWriter(writer, *writers)
+        try:
+            for row in heapq.merge(*(iter_rows(p) for p in paths), key=_row_key):
+                key = _row_key(row)
+                if key == last:
+                    raise ValueError(f"Duplicate firm-year {key[0]} {key[1]} in shard results")
+                last = key
+                multi.write(row)
+        finally:
+            for w in writers:
+                w.close()
+    return writer.count
+
+
+def merge_shards(
+    shards: Sequence[str],
+    output_csv: str,
+    output_json: Optional[str] = None,
+    output_parquet: Optional[str] = None,
+    output_matrix: Optional[str] = None,
+    allow_failed: bool = False,
+) -> int:
+    """核对并合并各分片的结果，返回合并后的行数；核对不通过时抛 ValueError，不写任何输出。
+
+    shards 为各分片的输出 CSV（或其 .shard.json）。各分片都写了 JSON 时从 JSON 逐行归并，
+    可以同时写出 JSON、Parquet / Arrow 和标记矩阵；否则只能归并 CSV。"""
+    infos = [load_shard_info(p) for p in shards]
+    problems = verify_shards(infos, allow_failed=allow_failed)
+    if problems:
+        raise ValueError("Shards cannot be merged:\n  " + "\n  ".join(problems))
+    infos.sort(key=lambda info: info["shard"][0])
+    if all("json" in info["outputs"] for info in infos):
+        return merge_rows(
+            [info["outputs"]["json"] for info in infos],
+            output_csv,
+            output_json,
+            output_parquet,
+            output_matrix,
+            infos[0]["categories"],
+        )
+    if output_json or output_parquet or output_matrix:
+        raise ValueError("JSON, columnar and matrix outputs can only be merged when every shard wrote JSON results")
+    return merge_csv([info["outputs"]["csv"] for info in infos], output_csv)
@@ -0,0 +1,84 @@
+from bisect import bisect_right
+from typing import List, Tuple
+
+from .normalize import TextNormalizer
+
+
+class PageBuffer:
+    """流式识别用的滑动文本缓冲区。
+
+    文档按页追加进来，缓冲区只保留“尚未结算的文本 + 左侧上下文”：
+    - 起点落在 [done, 末尾 - right_margin) 的命中，其右侧上下文已经完整，可以结算；
+    - 结算后只保留 done 之前 left_margin 个字符，供后续命中取左侧窗口；
+    - 跨页的短语因为上一页尾部还在缓冲区里，不会被切断。
+    所有位置都用全文坐标（从第 1 页第 1 个字符算起），page_of 把位置映射回页码。
+    """
+
+    def __init__(self, left_margin: int, right_margin: int):
+        self.left_margin = left_margin
+        self.right_margin = right_margin
+        self.buf = ""
+        self.offset = 0  # buf[0] 在全文中的位置
+        self.done = 0  # 起点小于 done 的命中都已结算
+        self._page_starts: List[int] = []
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.buf)
+
+    def append(self, text: str) -> None:
+        self._page_starts.append(self.end)
+        self.buf += text
+
+    def pending_range(self, final: bool) -> Tuple[int, int]:
+        """本轮可以结算的命中起点范围（全文坐标，左闭右开）"""
+        hi = self.end if final else self.end - self.right_margin
+        return self.done, max(self.done, hi)
+
+    def advance(self, hi: int) -> None:
+        self.done = hi
+        keep_from = max(self.offset, hi - self.left_margin)
+        self.buf = self.buf[keep_from - self.offset:]
+        self.offset = keep_from
+
+    def page_of(self, pos: int) -> int:
+        """全文位置所在的页码（从 1 开始）"""
+        return max(1, bisect_right(self._page_starts, pos))
+
+
+class NormalizedPageBuffer(PageBuffer):
+    """逐页归一化的 PageBuffer：buf 中是归一化文本（位置、页码都按归一化文本计），
+    另外保留对应的原文 raw（从 raw_offset 起），证据片段按 to_raw / raw_span 映射回原文截取。
+
+    原文只保留归一化缓冲区左端之后的部分，随 advance 一起前移，位置映射的断点也随之裁剪。
+    """
+
+    def __init__(self, left_margin: int, right_margin: int):
+        super().__init__(left_margin, right_margin)
+        self.normalizer = TextNormalizer()
+        self.raw = ""
+        self.raw_offset = 0  # raw[0] 在原文中的位置
+
+    def append(self, text: str) -> None:
+        self.raw += text
+        super().append(self.normalizer.feed(text))
+
+    def advance(self, hi: int) -> None:
+        super().advance(hi)
+        offsets = self.normalizer.offsets
+        offsets.trim(self.offset)
+        keep_from = offsets.to_raw(self.offset)
+        self.raw = self.raw[keep_from - self.raw_offset:]
+        self.raw_offset = keep_from
+
+    def to_raw(self, pos: int) -> int:
+        return self.normalizer.offsets.to_raw(pos)
+
+    def raw_span(self, start: int, end: int) -> Tuple[int, int]:
+        return self.normalizer.offsets.span(start, end)
+
+    def raw_window(self, start: int, end: int) -> str:
+        """归一化文本 [start, end)（全文坐标）对应的原文；start 不能早于缓冲区左端（那部分原文已经丢掉）"""
+        assert start >= self.offset, f"window start {start} is before the buffer offset {self.offset}"
+        s, e = self.raw_span(start, end)
+        return self.raw[s - self.raw_offset:e - self.raw_offset]
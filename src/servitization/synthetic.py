@@ -0,0 +1,167 @@
+import random
+from pathlib import Path
+from typing import List, Union
+
+from .config_keywords import KEYWORDS
+
+PAGE_BREAK = "\f"  # 与 io_markitdown.PAGE_BREAK 相同；不从那里导入，避免为生成文本加载 markitdown
+
+
+# 合成年报文本，供基准测试使用：规模、关键词密度、否定密度都可调，同一 seed 生成的文本完全相同。
+# 英文版带目录和 Item 1. Business / Item 1A 标题，中文版带 第三节 管理层讨论与分析 / 第四节 标题，
+# 章节定位、流式分页（按 \f 分页）等路径都能被覆盖到。
+
+_EN_SUBJECTS = ["The Company", "Our business", "Management", "The segment", "Each subsidiary", "The group"]
+_EN_VERBS = ["reported", "maintained", "expanded", "reviewed", "measured", "reorganized", "financed"]
+_EN_OBJECTS = [
+    "net sales across all regions", "its manufacturing footprint", "capital expenditures",
+    "gross margin for the fiscal year", "operating leases for office space", "its product roadmap",
+    "inventory levels at period end", "headcount in research facilities", "foreign exchange exposure",
+]
+_EN_TAILS = ["during the year", "compared with the prior period", "in line with guidance", "as described below"]
+_EN_REGIONS = ["the Americas", "Europe", "Greater China", "Japan", "the Rest of Asia Pacific"]
+_EN_KEYWORD_TEMPLATES = [
+    "The Company offers {phrase} to customers in {region}.",
+    "Revenue from {phrase} grew in {region} during the year.",
+    "Customers can purchase {phrase} through our direct sales force.",
+]
+_EN_NEGATED_TEMPLATES = [
+    "The Company does not offer {phrase} in {region}.",
+    "We do not provide {phrase} to resellers.",
+]
+
+_CN_SUBJECTS = ["公司", "本集团", "报告期内公司", "子公司", "管理层"]
+_CN_VERBS = ["持续推进", "稳步提升", "优化调整", "重点布局", "有序开展"]
+_CN_OBJECTS = [
+    "主营业务收入", "生产基地建设", "研发投入", "原材料采购成本", "产品结构",
+    "应收账款管理", "募集资金使用", "员工队伍建设", "现金流状况",
+]
+_CN_TAILS = ["，整体经营情况良好。", "，较上年同期有所增长。", "，符合年度经营计划。", "，详见本节相关内容。"]
+_CN_REGIONS = ["华东地区", "华南地区", "海外市场", "西南地区", "华北地区"]
+_CN_KEYWORD_TEMPLATES = [
+    "公司为客户提供{phrase}，覆盖{region}。",
+    "报告期内{phrase}业务收入稳定增长。",
+    "公司在{region}设立团队开展{phrase}。",
+]
+_CN_NEGATED_TEMPLATES = [
+    "公司不提供{phrase}。",
+    "公司目前未提供{phrase}。",
+]
+
+
+def _keywords(lang: str) -> List[str]:
+    if lang == "en":
+        return [p for phrases in KEYWORDS.values() for p in phrases]
+    from servitization_cn.config_keywords_cn import KEYWORDS_CN
+
+    return [p for phrases in KEYWORDS_CN.values() for p in phrases]
+
+
+def _sentence(
+    rng: random.Random,
+    lang: str,
+    phrases: List[str],
+    keyword_density: float,
+    negation_density: float,
+) -> str:
+    if rng.random() < keyword_density:
+        negated = rng.random() < negation_density
+        if lang == "en":
+            templates = _EN_NEGATED_TEMPLATES if negated else _EN_KEYWORD_TEMPLATES
+            region = rng.choice(_EN_REGIONS)
+        else:
+            templates = _CN_NEGATED_TEMPLATES if negated else _CN_KEYWORD_TEMPLATES
+            region = rng.choice(_CN_REGIONS)
+        return rng.choice(templates).format(phrase=rng.choice(phrases), region=region)
+    if lang == "en":
+        return (
+            f"{rng.choice(_EN_SUBJECTS)} {rng.choice(_EN_VERBS)} {rng.choice(_EN_OBJECTS)} "
+            f"{rng.choice(_EN_TAILS)}."
+        )
+    return rng.choice(_CN_SUBJECTS) + rng.choice(_CN_VERBS) + rng.choice(_CN_OBJECTS) + rng.choice(_CN_TAILS)
+
+
+def _body(
+    rng: random.Random,
+    lang: str,
+    n_chars: int,
+    keyword_density: float,
+    negation_density: float,
+    page_chars: int,
+) -> str:
+    phrases = _keywords(lang)
+    sep = " " if lang == "en" else ""
+    out, size, page_size, para = [], 0, 0, []
+    while size < n_chars:
+        para.append(_sentence(rng, lang, phrases, keyword_density, negation_density))
+        if len(para) < 6:
+            continue
+        block = sep.join(para) + "\n\n"
+        para = []
+        out.append(block)
+        size += len(block)
+        page_size += len(block)
+        if page_chars and page_size >= page_chars:
+            out.append(PAGE_BREAK)
+            page_size = 0
+    return "".join(out)
+
+
+def generate_report(
+    lang: str,
+    n_chars: int,
+    keyword_density: float = 0.05,
+    negation_density: float = 0.1,
+    page_chars: int = 3000,
+    seed: int = 0,
+) -> str:
+    """生成一篇约 n_chars 字符的合成年报文本。
+
+    keyword_density 为含关键词句子的比例，negation_density 为其中带否定提示词的比例；
+    page_chars > 0 时约每 page_chars 字符插入一个换页符 \\f。正文约 90% 落在业务章节内。
+    """
+    if lang not in ("en", "cn"):
+        raise ValueError(f"Unknown language {lang!r}; expected 'en' or 'cn'")
+    rng = random.Random(seed)
+    main = _body(rng, lang, int(n_chars * 0.9), keyword_density, negation_density, page_chars)
+    rest = _body(rng, lang, n_chars - int(n_chars * 0.9), keyword_density, negation_density, page_chars)
+    if lang == "en":
+        return (
+            "TABLE OF CONTENTS\nItem 1. Business 1\nItem 1A. Risk Factors 5\nItem 2. Properties 9\n\n"
+            "PART I\n\nItem 1. Business\n\n" + main + "Item 1A. Risk Factors\n\n" + rest
+        )
+    return (
+        "目录\n第一节 重要提示\n第三节 管理层讨论与分析\n第四节 公司治理\n\n"
+        "第一节 重要提示\n\n公司董事会保证年度报告内容的真实、准确、完整。\n\n"
+        "第三节 管理层讨论与分析\n\n" + main + "第四节 公司治理\n\n" + rest
+    )
+
+
+def write_corpus(
+    out_dir: Union[str, Path],
+    lang: str,
+    n_docs: int,
+    n_chars: int,
+    keyword_density: float = 0.05,
+    negation_density: float = 0.1,
+    page_chars: int = 3000,
+    seed: int = 0,
+) -> List[Path]:
+    """在 out_dir 下写出 n_docs 篇合成年报（.txt），文件名符合对应流水线的 COMPANY_YEAR 约定"""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(n_docs):
+        name = f"SYN{i:04d}_2024.txt" if lang == "en" else f"9{i:05d}_2024_合成公司_2024年年度报告.txt"
+        text = generate_report(
+            lang,
+            n_chars,
+            keyword_density=keyword_density,
+            negation_density=negation_density,
+            page_chars=page_chars,
+            seed=seed * 100003 + i,
+        )
+        path = out / name
+        path.write_text(text, encoding="utf-8")
+        paths.append(path)
+    return paths
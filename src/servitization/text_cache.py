@@ -0,0 +1,139 @@
+import hashlib
+import os
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+DEFAULT_CACHE_DIR = "data/cache/text"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 默认 2 GB 上限（按压缩后大小计）
+EVICT_TO = 0.9  # 超限时淘汰到上限的这个比例，之后的一批写入不必每次都重新扫描
+
+_CHUNK_SIZE = 1 << 20
+_SUFFIX = ".txt.z"
+
+# 各缓存目录的总大小（本进程的累计值）：第一次写入时扫描一遍目录，之后每次写入只做加减，超过上限时才重新扫描淘汰。
+# 放在模块级而不是实例上，因为 TextCache 随每个任务 pickle 到 worker，实例上的状态每个任务都会丢掉。
+# 各 worker 看不到彼此的写入，上限因此是近似的：总大小可能暂时超出，某个进程下一次扫描时回到上限以内
+_TOTALS: Dict[str, int] = {}
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """按文件内容计算 sha256，同一份文件换个名字也得到同一个摘要"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def package_version(dist: str) -> str:
+    """已安装包的版本号（用于缓存键）；importlib.metadata 导入较慢，第一次用到时才导入"""
+    from importlib import metadata
+
+    try:
+        return metadata.version(dist)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def make_cache_key(digest: str, extractor: str, version: str) -> str:
+    """缓存键 = 内容摘要 + 抽取器名称 + 抽取器版本；抽取器升级后旧条目自然失效"""
+    raw = f"{digest}:{extractor}:{version}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class TextCache:
+    """磁盘上的抽取文本缓存：zlib 压缩存储，总大小超限时按 LRU 淘汰。
+
+    每个条目是 ``<cache_dir>/<key 前两位>/<key>.txt.z``，命中时刷新 mtime，
+    超限时按 mtime 从旧到新删除，直到总大小回到 ``max_bytes * EVICT_TO`` 以内。
+    写入时只更新累计的总大小，超过上限时才扫描目录（见 _TOTALS），冷启动写 N 个条目不再是 O(N²) 次 stat。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{_SUFFIX}"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._entry_path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            text = zlib.decompress(data).decode("utf-8")
+        except (zlib.error, UnicodeDecodeError):
+            # 损坏的条目直接丢弃，按未命中处理
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = zlib.compress(text.encode("utf-8"), 6)
+        total = _TOTALS.get(str(self.cache_dir))
+        if total is None:
+            total = self.total_bytes()
+        try:
+            total -= path.stat().st_size  # 覆盖已有条目
+        except FileNotFoundError:
+            pass
+        # 先写临时文件再原子替换，避免并发/中断时留下半个条目
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        total += len(data)
+        _TOTALS[str(self.cache_dir)] = total
+        if total > self.max_bytes:
+            self.evict()
+
+    def total_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for path in self.cache_dir.glob(f"*/*{_SUFFIX}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def evict(self) -> int:
+        """总大小超过上限时淘汰最久未使用的条目，直到不超过上限的 EVICT_TO，返回删除的条目数"""
+        entries = self._entries()
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        if total > self.max_bytes:
+            target = int(self.max_bytes * EVICT_TO)
+            for _, path, size in sorted(entries, key=lambda e: e[0]):
+                if total <= target:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        _TOTALS[str(self.cache_dir)] = total
+        return removed
+
+    def clear(self) -> None:
+        for _, path, _ in self._entries():
+            path.unlink(missing_ok=True)
+        _TOTALS[str(self.cache_dir)] = 0
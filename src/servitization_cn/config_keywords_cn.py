@@ -114,3 +114,69 @@ KEYWORDS_CN = {
         "托管运营",
     ],
 }
+
+# 中文否定提示词，可以后续根据需要扩展
+NEGATION_CUES_CN = [
+    "不提供",
+    "未提供",
+    "不再提供",
+]
+
+# 否定词须出现在命中前 NEGATION_WINDOW_BEFORE_CN 个字符以内（如“不提供设备维修服务”），
+# 命中之后的文字不参与判断
+NEGATION_WINDOW_BEFORE_CN = 10
+NEGATION_WINDOW_AFTER_CN = 0
+
+# 宽泛触发词的上下文约束，键为 KEYWORDS_CN 中的短语，只对列出的短语生效：
+# - window：在命中前后各多少个字符内查看上下文（默认 CONTEXT_WINDOW_CN）；
+# - require：窗口内至少出现其中一个词，这次命中才计入（设备、系统、平台等）；
+# - exclude：窗口内出现其中任一词，这次命中不计（如“维护股东合法权益”“维护社会稳定”“城市维护建设税”）。
+# 上下文词须完整落在窗口内，可以与命中本身重叠（如 “城市维护建设” 包含 “维护”）。
+# 上下文词与关键词编译进同一个自动机，仍是一次扫描；每条规则只是按位置索引做一次 bisect 判断。
+CONTEXT_WINDOW_CN = 10
+
+CONTEXT_RULES_CN = {
+    "维护": {
+        "window": 10,
+        "require": [
+            "设备",
+            "系统",
+            "平台",
+            "软件",
+            "硬件",
+            "网络",
+            "设施",
+            "装备",
+            "装置",
+            "机组",
+            "机器",
+            "机械",
+            "仪器",
+            "仪表",
+            "线路",
+            "管道",
+            "产品",
+            "运维",
+            "运行",
+            "保养",
+            "维修",
+            "检修",
+            "售后",
+            "服务",
+        ],
+        "exclude": [
+            "城市维护建设",
+            "股东",
+            "投资者",
+            "权益",
+            "利益",
+            "稳定",
+            "秩序",
+            "形象",
+            "声誉",
+            "信誉",
+            "客户关系",
+            "内部控制",
+        ],
+    },
+}
@@ -1,93 +1,401 @@
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
-from .config_keywords_cn import KEYWORDS_CN, CATEGORY_TYPE_CN
+from servitization.match_cache import MatchCache, automaton_scanner
+from servitization.negation import NegationMatcher, PositionIndex
+from servitization.normalize import fold_phrase, normalize_text
+from servitization.phrase_matcher import PhraseAutomaton
+from servitization.profiling import stage
+from servitization.scoring import Scorer
+from servitization.streaming import NormalizedPageBuffer
 
-# 简单的中文否定模式，可以后续根据需要扩展
-NEGATION_PATTERNS = [
-    "不提供",
-    "未提供",
-    "不再提供",
-]
+from .config_keywords_cn import (
+    KEYWORDS_CN,
+    CATEGORY_TYPE_CN,
+    CONTEXT_RULES_CN,
+    CONTEXT_WINDOW_CN,
+    NEGATION_CUES_CN,
+    NEGATION_WINDOW_BEFORE_CN,
+    NEGATION_WINDOW_AFTER_CN,
+)
 
+# 旧名称保留，否定词表现在统一配置在 config_keywords_cn.NEGATION_CUES_CN
+NEGATION_PATTERNS = NEGATION_CUES_CN
 
-def _is_negated(text: str, phrase: str) -> bool:
-    """极简否定规则：如果出现“不提供X服务”这一类形式则视为否定。
+NEGATION_CN = NegationMatcher(
+    NEGATION_CUES_CN,
+    before=NEGATION_WINDOW_BEFORE_CN,
+    after=NEGATION_WINDOW_AFTER_CN,
+)
 
-    目前实现：检查若干固定否定前缀 + 关键词的组合；以后可以用更复杂的窗口匹配替换。
+# 为了减少重复 snippet 的长度，这里限制每类只保留前若干个命中的片段
+MAX_SNIPPETS_PER_CAT = 20
+WINDOW = 60  # 从匹配位置左右各取约 60 字符作为证据窗口
+
+
+@lru_cache(maxsize=None)
+def _folded(phrase: str) -> str:
+    return fold_phrase(phrase)
+
+
+class ContextRule(NamedTuple):
+    """一个短语的上下文约束（见 config_keywords_cn.CONTEXT_RULES_CN），词均已折叠"""
+
+    window: int
+    require: Tuple[str, ...]
+    exclude: Tuple[str, ...]
+
+
+def compile_context_rules(rules: Dict[str, Dict]) -> Dict[str, ContextRule]:
+    """CONTEXT_RULES_CN -> {折叠后的短语: ContextRule}"""
+    compiled = {}
+    for phrase, spec in rules.items():
+        compiled[_folded(phrase)] = ContextRule(
+            int(spec.get("window", CONTEXT_WINDOW_CN)),
+            tuple(dict.fromkeys(_folded(w) for w in spec.get("require", ()) if w)),
+            tuple(dict.fromkeys(_folded(w) for w in spec.get("exclude", ()) if w)),
+        )
+    return compiled
+
+
+RULES_CN = compile_context_rules(CONTEXT_RULES_CN)
+
+
+def _automaton(phrases: Iterable[str]) -> PhraseAutomaton:
+    """短语连同其约束规则用到的上下文词编译成一个自动机，一次扫描同时拿到两者的位置"""
+    keys = [_folded(p) for p in phrases]
+    context = [w for k in keys if k in RULES_CN for w in RULES_CN[k].require + RULES_CN[k].exclude]
+    return PhraseAutomaton(keys + context)
+
+
+# 整个词表编译成一个自动机，一次扫描拿到所有短语（含 维修 / 维修服务 这类重叠短语）的位置；
+# 短语按 normalize 的口径折叠（如 SaaS -> saas），在归一化之后的文本上匹配
+MATCHER_CN = _automaton(p for phrases in KEYWORDS_CN.values() for p in phrases)
+
+# 识别逻辑本身（不含词表）发生会影响结果的改动时递增，增量运行据此判断旧结果是否可用
+DETECTOR_VERSION_CN = "3"
+
+
+@lru_cache(maxsize=None)
+def _matcher_for(categories: Tuple[str, ...]) -> PhraseAutomaton:
+    return _automaton(p for cat in categories for p in KEYWORDS_CN[cat])
+
+
+class ContextIndex:
+    """一篇文档（或流式缓冲区）上的上下文约束判断。
+
+    require / exclude 词的位置直接取自关键词那次扫描的结果，每组词按需建一个 PositionIndex，
+    之后每个命中只需一次 bisect；没有规则的短语直接放行。
     """
 
-    for neg in NEGATION_PATTERNS:
-        if neg + phrase in text:
+    def __init__(self, positions: Dict[str, List[int]], rules: Optional[Dict[str, ContextRule]] = None):
+        self.positions = positions
+        self.rules = RULES_CN if rules is None else rules
+        self._indexes: Dict[Tuple[str, ...], PositionIndex] = {}
+
+    def _index(self, words: Tuple[str, ...]) -> PositionIndex:
+        idx = self._indexes.get(words)
+        if idx is None:
+            spans = [(s, s + len(w)) for w in words for s in self.positions.get(w, ())]
+            idx = self._indexes[words] = PositionIndex(spans)
+        return idx
+
+    def allows(self, key: str, start: int, end: int) -> bool:
+        """折叠后的短语 key 在 [start, end) 的这次命中是否满足它的上下文约束"""
+        rule = self.rules.get(key)
+        if rule is None:
             return True
-    return False
+        w = rule.window
+        if rule.exclude and self._index(rule.exclude).contains(start, end, w, w):
+            return False
+        return not rule.require or self._index(rule.require).contains(start, end, w, w)
+
+
+def _count_positions(
+    positions: Dict[str, List[int]],
+    neg_index,
+    negation: NegationMatcher,
+    phrases: Iterable[str],
+    context: Optional[ContextIndex] = None,
+) -> Dict[str, List[int]]:
+    if context is None:
+        context = ContextIndex(positions)
+    counts = {}
+    for phrase in dict.fromkeys(phrases):
+        key = _folded(phrase)
+        starts = positions.get(key)
+        if not starts:
+            continue
+        hits = negated = 0
+        next_free = 0
+        for idx in starts:
+            if idx < next_free:
+                continue
+            next_free = idx + len(key)
+            if not context.allows(key, idx, next_free):
+                continue
+            hits += 1
+            if negation.is_negated(neg_index, idx, next_free):
+                negated += 1
+        if hits:
+            counts[phrase] = [hits, negated]
+    return counts
+
+
+def count_phrase_hits_cn(
+    text: str,
+    phrases: Optional[Sequence[str]] = None,
+    negation: Optional[NegationMatcher] = None,
+) -> Dict[str, List[int]]:
+    """逐短语统计命中次数及其中被否定的次数：{phrase: [hits, negated]}，没有命中的短语不出现。
+
+    计数口径与 classify_services_cn 相同（同一短语的自身重叠只计不重叠的那些，不满足上下文约束的命中不计）；
+    phrases 默认为整个词表，传入新短语时只扫描这些短语。
+    """
+    if negation is None:
+        negation = NEGATION_CN
+    if phrases is None:
+        phrases = [p for group in KEYWORDS_CN.values() for p in group]
+        matcher = MATCHER_CN
+    else:
+        matcher = _automaton(phrases)
+    text = normalize_text(text).text
+    return _count_positions(matcher.positions_by_phrase(text), negation.index(text), negation, phrases)
+
 
+# 片段里的换行、回车和换页符（PDF 逐页抽取时页与页之间的 \f）都换成空格
+_SNIPPET_SPACES = str.maketrans("\n\r\f", "   ")
 
-def classify_services_cn(text: str):
+
+def evidence_snippet_cn(text: str, start: int, end: int) -> str:
+    """原文中命中 [start, end) 左右各取 WINDOW 个字符作为证据片段，换行、回车、换页符替换成空格"""
+    return text[max(0, start - WINDOW):min(len(text), end + WINDOW)].translate(_SNIPPET_SPACES)
+
+
+def classify_services_cn(
+    text: str,
+    negation: Optional[NegationMatcher] = None,
+    categories: Optional[Sequence[str]] = None,
+    offsets: bool = False,
+    phrase_counts: Optional[Dict[str, List[int]]] = None,
+    match_cache: Optional[MatchCache] = None,
+):
     """对中文文本做 13 类服务识别，返回 flags, evidence, comp_count, sub_count, service_num, risk_score。
 
     中文文本不做分词，直接基于子串匹配，适合先做一个 baseline，后续可以考虑接入 jieba/HanLP 等。
+    匹配前先做归一化（见 normalize.normalize_text：修复 “维修\\n服务” 这类断行，折叠空白、大小写和全角字符），
+    命中位置映射回 text，证据片段取原文。
+    否定按命中位置判断：只有该次命中前窗口内出现否定词（如“不提供维修服务”）才不计，
+    negation 默认使用 config_keywords_cn 中的中文否定词表和窗口；
+    维护 这类宽泛触发词另按 CONTEXT_RULES_CN 的上下文约束过滤（附近须有 / 不能有某些词，见 ContextIndex），
+    上下文词与关键词在同一次扫描中定位；
+    categories 只识别指定类别（增量运行时只重扫词表有变化的类别）；
+    offsets=True 时证据记为 [start, end, phrase]（text 中的位置，phrase 为折叠后的短语），
+    不复制片段，需要时用 evidence_snippet_cn 取出；
+    传入 phrase_counts（dict）时另外填入各短语的 [hits, negated]（复用本次扫描的位置，见 count_phrase_hits_cn）；
+    传入 match_cache 时按段落归一化和扫描，没变过的段落直接取缓存的结果（见 match_cache.MatchCache），结果不变。
     """
+    if negation is None:
+        negation = NEGATION_CN
+    if categories is None:
+        keywords = KEYWORDS_CN
+        matcher = MATCHER_CN
+    else:
+        keywords = {cat: KEYWORDS_CN[cat] for cat in categories}
+        matcher = _matcher_for(tuple(categories))
 
-    flags: Dict[str, int] = {cat: 0 for cat in KEYWORDS_CN.keys()}
+    flags: Dict[str, int] = {cat: 0 for cat in keywords.keys()}
     evidence: Dict[str, List[str]] = defaultdict(list)
 
-    # 为了减少重复 snippet 的长度，这里限制每类只保留前若干个命中的片段
-    MAX_SNIPPETS_PER_CAT = 20
-    WINDOW = 60  # 从匹配位置左右各取约 60 字符作为证据窗口
-
-    for cat, phrases in KEYWORDS_CN.items():
-        for phrase in phrases:
-            idx = 0
-            while True:
-                idx = text.find(phrase, idx)
-                if idx == -1:
-                    break
-                if _is_negated(text, phrase):
-                    idx += len(phrase)
-                    continue
-                flags[cat] = 1
-                if len(evidence[cat]) < MAX_SNIPPETS_PER_CAT:
-                    start = max(0, idx - WINDOW)
-                    end = min(len(text), idx + len(phrase) + WINDOW)
-                    snippet = text[start:end].replace("\n", " ")
-                    evidence[cat].append(snippet)
-                idx += len(phrase)
-
-    comp_count = sum(
-        flags[cat]
-        for cat, t in CATEGORY_TYPE_CN.items()
-        if t == "complementing"
-    )
-    sub_count = sum(
-        flags[cat]
-        for cat, t in CATEGORY_TYPE_CN.items()
-        if t == "substituting"
-    )
-    service_num = sum(flags.values())
-
-    # 与英文版保持类似的简单风险分数设定
-    risk_score = 2.0 * sub_count + 0.5 * comp_count
+    scan = None
+    with stage("normalize") as info:
+        if match_cache is None:
+            norm = normalize_text(text)
+        else:
+            scan = match_cache.scan(text, automaton_scanner(matcher, negation))
+            norm = scan.norm
+            info.update(paragraphs=scan.paragraphs, cached=scan.cached)
+        info["chars"] = len(norm.text)
+        info["breakpoints"] = len(norm.offsets)
+
+    with stage("match") as info:
+        positions = matcher.positions_by_phrase(norm.text) if scan is None else scan.matches
+        info["matches"] = sum(len(v) for v in positions.values())
 
+    # 每类按词表顺序取至多 MAX_SNIPPETS_PER_CAT 个未被否定的命中；证据已满后每个短语只需确认一次命中
+    with stage("negation") as info:
+        neg_index = negation.index(norm.text) if scan is None else PositionIndex(scan.cues)
+        context = ContextIndex(positions)
+        hits: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        n_negated = n_rejected = 0
+        for cat, phrases in keywords.items():
+            for phrase in phrases:
+                # 同一短语的自身重叠出现只取不重叠的那些，与逐次 text.find 的结果一致
+                key = _folded(phrase)
+                next_free = 0
+                for idx in positions.get(key, ()):
+                    if idx < next_free:
+                        continue
+                    next_free = idx + len(key)
+                    if not context.allows(key, idx, next_free):
+                        n_rejected += 1
+                        continue
+                    if negation.is_negated(neg_index, idx, next_free):
+                        n_negated += 1
+                        continue
+                    flags[cat] = 1
+                    if len(hits[cat]) >= MAX_SNIPPETS_PER_CAT:
+                        break
+                    hits[cat].append((idx, next_free))
+        info["negated"] = n_negated
+        info["context_rejected"] = n_rejected
+
+    if phrase_counts is not None:
+        with stage("phrase_counts"):
+            phrase_counts.update(
+                _count_positions(
+                    positions, neg_index, negation, (p for group in keywords.values() for p in group), context
+                )
+            )
+
+    with stage("evidence") as info:
+        for cat, spans in hits.items():
+            for start, end in spans:
+                if offsets:
+                    evidence[cat].append([*norm.raw_span(start, end), norm.text[start:end]])
+                else:
+                    evidence[cat].append(evidence_snippet_cn(text, *norm.raw_span(start, end)))
+        info["snippets"] = sum(len(spans) for spans in hits.values())
+
+    comp_count, sub_count, service_num, risk_score = _score_flags(flags)
     return flags, evidence, comp_count, sub_count, service_num, risk_score
 
 
-def process_company_item1s_cn(company_id: str, year_texts: Dict[int, str]):
-    """按照英文版的接口风格，对 {year: text} 做批处理，返回行列表。"""
+# 中文版计分与英文版共用 Scorer；CATEGORY_TYPE_CN 里没有的类别只计入 service_num
+SCORER_CN = Scorer(list(KEYWORDS_CN), CATEGORY_TYPE_CN)
+
+
+def _score_flags(flags: Dict[str, int]) -> Tuple[int, int, int, float]:
+    """返回 comp_count, sub_count, service_num, risk_score。"""
+
+    score = SCORER_CN.score(flags)
+    return score["comp_count"], score["sub_count"], score["service_num"], score["risk_score"]
+
+
+def build_row_cn(company_id: str, year: int, flags: Dict[str, int], evidence) -> Dict:
+    """由 flags/evidence 组装一行中文结果。"""
+
+    comp_count, sub_count, service_num, risk_score = _score_flags(flags)
+    return {
+        "company": company_id,
+        "year": year,
+        "service_num": service_num,
+        "comp_count": comp_count,
+        "sub_count": sub_count,
+        "risk_score": risk_score,
+        "flags": flags,
+        "evidence": dict(evidence),
+    }
+
+
+def process_company_item1s_cn(
+    company_id: str,
+    year_texts: Dict[int, str],
+    categories: Optional[Sequence[str]] = None,
+    match_cache: Optional[MatchCache] = None,
+):
+    """按照英文版的接口风格，对 {year: text} 做批处理，返回行列表。
+    与前几年相同的段落不再重扫：match_cache 默认是只在这一批年份之间共享的内存缓存。"""
 
+    if match_cache is None:
+        match_cache = MatchCache(None)
     rows = []
     for year, text in sorted(year_texts.items()):
-        flags, evidence, comp_count, sub_count, service_num, risk_score = classify_services_cn(text)
-        rows.append(
-            {
-                "company": company_id,
-                "year": year,
-                "service_num": service_num,
-                "comp_count": comp_count,
-                "sub_count": sub_count,
-                "risk_score": risk_score,
-                "flags": flags,
-                "evidence": dict(evidence),
-            }
-        )
+        flags, evidence, *_ = classify_services_cn(text, categories=categories, match_cache=match_cache)
+        rows.append(build_row_cn(company_id, year, flags, evidence))
     return rows
+
+
+class ServiceStreamClassifierCN:
+    """classify_services_cn 的流式版本：逐页 feed，close() 返回 (flags, evidence, evidence_pages)。
+
+    各页直接首尾相接后逐页归一化（与整篇 normalize_text 的结果一致），跨页短语和跨页断行照常命中，
+    证据片段按位置映射取原文。为了和整篇识别的证据顺序（按词表中类别、短语的顺序）完全一致，
+    每个 (类别, 短语) 各自暂存至多 MAX_SNIPPETS_PER_CAT 条片段，close() 时再按词表顺序合并截断，内存有上界。
+    """
+
+    def __init__(self, negation: Optional[NegationMatcher] = None):
+        self.negation = NEGATION_CN if negation is None else negation
+        max_len = max((len(p) for p in MATCHER_CN.phrases), default=0)
+        context_window = max((r.window for r in RULES_CN.values()), default=0)
+        self._buf = NormalizedPageBuffer(
+            left_margin=max(WINDOW, self.negation.before, context_window),
+            right_margin=max_len + max(WINDOW, self.negation.after, context_window),
+        )
+        self._next_free: Dict[Tuple[str, int], int] = defaultdict(int)
+        self._snippets: Dict[Tuple[str, int], List[Tuple[str, int]]] = defaultdict(list)
+        self.flags: Dict[str, int] = {cat: 0 for cat in KEYWORDS_CN.keys()}
+
+    def feed(self, page_text: str) -> None:
+        self._buf.append(page_text)
+        self._scan(final=False)
+
+    def close(self):
+        self._scan(final=True)
+        evidence: Dict[str, List[str]] = {}
+        evidence_pages: Dict[str, List[int]] = {}
+        for cat, phrases in KEYWORDS_CN.items():
+            merged = []
+            for i in range(len(phrases)):
+                merged.extend(self._snippets.get((cat, i), ()))
+            if merged:
+                merged = merged[:MAX_SNIPPETS_PER_CAT]
+                evidence[cat] = [snip for snip, _ in merged]
+                evidence_pages[cat] = [page for _, page in merged]
+        return self.flags, evidence, evidence_pages
+
+    def _scan(self, final: bool) -> None:
+        buf = self._buf
+        lo, hi = buf.pending_range(final)
+        if hi <= lo:
+            return
+        off = buf.offset
+        text = buf.buf
+        positions = MATCHER_CN.positions_by_phrase(text)
+        neg_index = self.negation.index(text)
+        context = ContextIndex(positions)
+
+        for cat, phrases in KEYWORDS_CN.items():
+            for i, phrase in enumerate(phrases):
+                key = (cat, i)
+                folded = _folded(phrase)
+                next_free = self._next_free[key]
+                kept = self._snippets[key]
+                for local in positions.get(folded, ()):
+                    idx = local + off
+                    if idx < lo or idx < next_free:
+                        continue
+                    if idx >= hi:
+                        break
+                    next_free = idx + len(folded)
+                    if not context.allows(folded, local, next_free - off):
+                        continue
+                    if self.negation.is_negated(neg_index, local, next_free - off):
+                        continue
+                    self.flags[cat] = 1
+                    if len(kept) < MAX_SNIPPETS_PER_CAT:
+                        start, end = buf.raw_span(idx, next_free)
+                        snippet = evidence_snippet_cn(buf.raw, start - buf.raw_offset, end - buf.raw_offset)
+                        kept.append((snippet, buf.page_of(idx)))
+                self._next_free[key] = next_free
+        buf.advance(hi)
+
+
+def classify_pages_cn(pages: Iterable[str], negation: Optional[NegationMatcher] = None):
+    """对逐页中文文本流做识别，返回 (flags, evidence, evidence_pages)。"""
+
+    stream = ServiceStreamClassifierCN(negation=negation)
+    for page in pages:
+        stream.feed(page)
+    return stream.close()
@@ -1,13 +1,72 @@
 import argparse
-import json
+import sys
 from collections import defaultdict
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Sequence, Tuple
 
-import pandas as pd
-
-from servitization.io_markitdown import convert_file_to_text
-from .detector_cn import process_company_item1s_cn
+from servitization.boilerplate import BoilerplateOptions, boilerplate_state, report_boilerplate, strip_boilerplate
+from servitization.evidence import DEFAULT_DOC_STORE_DIR, DocumentStore
+from servitization.io_markitdown import ExtractOptions, convert_file_to_text, iter_file_pages
+from servitization.output import (
+    ColumnarWriter,
+    JournalError,
+    MultiWriter,
+    RowJournal,
+    RowWriter,
+    write_rows_csv,
+    write_rows_json,
+)
+from servitization.profiling import profile_run, stage
+from servitization.scoring import FlagMatrixWriter
+from servitization.sections import extract_business_sections_cn
+from servitization.manifest import RunManifest, config_state
+from servitization.match_cache import MatchCache
+from servitization.sharding import Shard, select_shard, write_shard_info
+from servitization.pipeline import (
+    add_boilerplate_arguments,
+    add_cache_arguments,
+    add_columnar_argument,
+    add_evidence_arguments,
+    add_extract_arguments,
+    add_incremental_arguments,
+    add_match_cache_argument,
+    add_matrix_argument,
+    add_phrase_index_argument,
+    add_profile_arguments,
+    add_resume_arguments,
+    add_section_argument,
+    add_shard_argument,
+    add_workers_argument,
+    boilerplate_from_args,
+    doc_store_dir_from_args,
+    extract_options_from_args,
+    journal_path_from_args,
+    manifest_path_from_args,
+    open_phrase_index,
+    profile_paths_from_args,
+    process_files,
+    process_files_incremental,
+    save_phrase_index,
+    shard_from_args,
+    stream_files,
+)
+from servitization.text_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, TextCache
+from .config_keywords_cn import (
+    CONTEXT_RULES_CN,
+    CONTEXT_WINDOW_CN,
+    KEYWORDS_CN,
+    NEGATION_CUES_CN,
+    NEGATION_WINDOW_AFTER_CN,
+    NEGATION_WINDOW_BEFORE_CN,
+)
+from .detector_cn import (
+    DETECTOR_VERSION_CN,
+    build_row_cn,
+    classify_pages_cn,
+    classify_services_cn,
+)
 
 
 def parse_company_year_cn(path: Path):
@@ -40,47 +99,326 @@ def parse_company_year_cn(path: Path):
     return company, year
 
 
-def build_company_year_texts_cn(input_dir: Path) -> Dict[str, Dict[int, str]]:
-    """扫描 input_dir 下所有文件，构建 {company: {year: text}}。"""
-
-    mapping: Dict[str, Dict[int, str]] = defaultdict(dict)
+def discover_company_year_files_cn(input_dir: Path) -> List[Tuple[str, int, Path]]:
+    """递归扫描 input_dir，返回 [(company, year, path)]，按 (company, year) 排序。"""
 
+    found: Dict[Tuple[str, int], Path] = {}
     for file in input_dir.rglob("*"):
         if not file.is_file():
             continue
         company, year = parse_company_year_cn(file)
         if company is None or year is None:
             continue
-        text = convert_file_to_text(file)
+        found[(company, year)] = file
+    return [(c, y, f) for (c, y), f in sorted(found.items())]
+
+
+def build_company_year_texts_cn(
+    input_dir: Path,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+) -> Dict[str, Dict[int, str]]:
+    """扫描 input_dir 下所有文件，构建 {company: {year: text}}。"""
+
+    mapping: Dict[str, Dict[int, str]] = defaultdict(dict)
+
+    for company, year, file in discover_company_year_files_cn(input_dir):
+        text = convert_file_to_text(file, cache=cache, refresh_cache=refresh_cache)
         mapping[company][year] = text
 
     return mapping
 
 
-def run_pipeline_cn(input_dir: str, output_csv: str, output_json: str | None = None):
-    input_path = Path(input_dir)
-    if not input_path.exists():
-        raise FileNotFoundError(f"Input dir not found: {input_dir}")
+def process_file_cn(
+    company: str,
+    year: int,
+    path: Path,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    categories: Optional[Sequence[str]] = None,
+    section: bool = True,
+    doc_store: Optional[DocumentStore] = None,
+    phrase_store: Optional[DocumentStore] = None,
+    extract: Optional[ExtractOptions] = None,
+    boilerplate: Optional[BoilerplateOptions] = None,
+    match_cache: Optional[MatchCache] = None,
+) -> Dict:
+    """单个中文年报的转换 + 识别，返回一行结果（进程池里的一个任务）。
+
+    categories 不为 None 时只识别这些类别（增量运行的局部重扫）；
+    section=True 时只扫描 管理层讨论与分析 / 公司业务概要 等节（定位失败时退回全文）；
+    传入 doc_store 时证据记为偏移量，被扫描文本存入 doc_store，行里带 doc_id；
+    传入 phrase_store 时另外统计各短语的命中 / 否定次数（行里的 _phrase_hits），被扫描文本存入 phrase_store；
+    extract 为 PDF 的抽取后端和页码范围（见 io_markitdown.ExtractOptions）；
+    传入 boilerplate 时先剔除数字页、重复的页眉页脚和语料级样板句子再识别，行里带 boilerplate 统计；
+    传入 match_cache 时按段落识别，与缓存里相同的段落不再归一化和扫描（结果不变）。
+    """
+
+    with stage("file", file=str(path)):
+        text = convert_file_to_text(path, cache=cache, refresh_cache=refresh_cache, extract=extract)
+        return classify_document_cn(
+            company, year, text, str(path), categories, section, doc_store, phrase_store, boilerplate, match_cache
+        )
+
+
+def classify_document_cn(
+    company: str,
+    year: int,
+    text: str,
+    label: str = "",
+    categories: Optional[Sequence[str]] = None,
+    section: bool = True,
+    doc_store: Optional[DocumentStore] = None,
+    phrase_store: Optional[DocumentStore] = None,
+    boilerplate: Optional[BoilerplateOptions] = None,
+    match_cache: Optional[MatchCache] = None,
+) -> Dict:
+    """process_file_cn 转换之后的部分：对已抽取的全文定位章节并识别，返回一行结果（参数含义同 process_file_cn）。"""
+
+    document = text
+    if section:
+        with stage("section") as info:
+            text = extract_business_sections_cn(text, label=label)
+            info["chars"] = len(text)
+    removed = None
+    if boilerplate is not None:
+        text, removed = strip_boilerplate(text, boilerplate, document)
+    counts = {} if phrase_store is not None else None
+    flags, evidence, *_ = classify_services_cn(
+        text, categories=categories, offsets=doc_store is not None, phrase_counts=counts, match_cache=match_cache
+    )
+    row = build_row_cn(company, year, flags, evidence)
+    if removed is not None:
+        row["boilerplate"] = removed
+    if doc_store is not None:
+        row["doc_id"] = doc_store.add(text)
+    if phrase_store is not None:
+        row["_phrase_hits"] = {"doc_id": phrase_store.add(text), "counts": counts, "categories": categories}
+    return row
+
+
+def current_config_state_cn(
+    section: bool = True,
+    offsets: bool = False,
+    extract: Optional[ExtractOptions] = None,
+    boilerplate: Optional[BoilerplateOptions] = None,
+) -> Dict:
+    """中文识别配置的指纹（检测器版本、各类别词表、否定设置、扫描范围、证据形式、PDF 抽取设置、样板剔除设置），
+    写入增量运行清单。
+
+    短语的上下文约束计入所属类别的指纹：只改某个短语的规则时只重扫含该短语的类别。"""
+
+    keywords = {}
+    for cat, phrases in KEYWORDS_CN.items():
+        rules = {p: {"window": CONTEXT_WINDOW_CN, **CONTEXT_RULES_CN[p]} for p in phrases if p in CONTEXT_RULES_CN}
+        keywords[cat] = {"phrases": phrases, "context_rules": rules} if rules else phrases
+    shared = {
+        "negation_cues": NEGATION_CUES_CN,
+        "negation_window": [NEGATION_WINDOW_BEFORE_CN, NEGATION_WINDOW_AFTER_CN],
+        "section": section,
+        "evidence_offsets": offsets,
+        "pdf_extract": list(extract or ExtractOptions()),
+    }
+    if boilerplate is not None:
+        shared["boilerplate"] = boilerplate_state(boilerplate)
+    return config_state(DETECTOR_VERSION_CN, keywords, shared)
+
+
+def stream_file_cn(
+    company: str,
+    year: int,
+    path: Path,
+    cache: Optional[TextCache] = None,
+    refresh_cache: bool = False,
+    extract: Optional[ExtractOptions] = None,
+) -> Dict:
+    """流式处理单个中文年报：逐页抽取、逐页识别，结果行额外带 evidence_pages。"""
+
+    with stage("file", file=str(path)):
+        pages = iter_file_pages(path, cache=cache, refresh_cache=refresh_cache, extract=extract)
+        with stage("convert+classify"):
+            flags, evidence, evidence_pages = classify_pages_cn(pages)
+    row = build_row_cn(company, year, flags, evidence)
+    row["evidence_pages"] = evidence_pages
+    return row
+
+
+def run_pipeline_cn(
+    input_dir: str,
+    output_csv: str,
+    output_json: str | None = None,
+    cache_dir: str | None = DEFAULT_CACHE_DIR,
+    refresh_cache: bool = False,
+    cache_max_bytes: int = DEFAULT_MAX_BYTES,
+    workers: int = 1,
+    stream: bool = False,
+    manifest_path: str | None = None,
+    section: bool = True,
+    output_parquet: str | None = None,
+    doc_store_dir: str | None = None,
+    profile: str | None = None,
+    trace: str | None = None,
+    output_matrix: str | None = None,
+    phrase_index: str | None = None,
+    phrase_store_dir: str = DEFAULT_DOC_STORE_DIR,
+    extract: Optional[ExtractOptions] = None,
+    shard: Optional[Shard] = None,
+    journal_path: str | None = None,
+    resume: bool = False,
+    boilerplate: Optional[BoilerplateOptions] = None,
+    match_cache: str | None = None,
+):
+    """cache_dir=None 表示不使用抽取文本缓存；workers>1 时按文件并行转换和识别；
+    extract 为 PDF 的抽取后端和页码范围（默认 markitdown 整份转换）；
+    stream=True 时逐页识别、每完成一个文件就写出一行；
+    manifest_path 不为 None 时按运行清单增量处理（不能与 stream 同时使用）；
+    section=True 时只扫描 管理层讨论与分析 / 公司业务概要（流式模式始终扫描全文）；
+    output_parquet 不为 None 时另外写出 Parquet / Arrow IPC 主表和证据长表；
+    output_matrix 不为 None 时另外写出 (n_firm_years × 类别数) 的 uint8 标记矩阵（.npz，见 scoring.FlagPanel）；
+    doc_store_dir 不为 None 时证据记为 (doc_id, start, end, phrase) 偏移量，被扫描文本存入该目录；
+    profile / trace 不为 None 时记录各文件、各阶段的耗时和计数，写出指标 JSON / Chrome trace 时间线；
+    phrase_index 不为 None 时另外写出文档 × 短语的命中计数索引，被扫描文本存入 phrase_store_dir；
+    shard 不为 None 时只处理分到该分片的文件，并写出分片说明（见 servitization.sharding）；
+    journal_path / resume 为逐行追加的结果日志和断点续跑（同 run_pipeline）；
+    boilerplate 不为 None 时识别前先剔除样板文字并汇总打印删掉了多少（同 run_pipeline，不能与 stream 同时使用）；
+    match_cache 为段落级匹配缓存的 SQLite 文件（同 run_pipeline，不能与 stream 同时使用）"""
+    with profile_run(profile, trace):
+        input_path = Path(input_dir)
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input dir not found: {input_dir}")
+        if stream and manifest_path is not None:
+            raise ValueError("Incremental runs are not supported in streaming mode")
+        if stream and doc_store_dir is not None:
+            raise ValueError("Offset evidence is not supported in streaming mode")
+        if stream and phrase_index is not None:
+            raise ValueError("The phrase index is not supported in streaming mode")
+        if stream and boilerplate is not None:
+            raise ValueError("Boilerplate stripping is not supported in streaming mode")
+        if stream and match_cache is not None:
+            raise ValueError("The paragraph match cache is not supported in streaming mode")
+        if resume and journal_path is None:
+            raise ValueError("Resuming needs the row journal of the interrupted run")
+
+        cache = TextCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+        all_files = discover_company_year_files_cn(input_path)
+        files = select_shard(all_files, shard) if shard is not None else all_files
+        if shard is not None:
+            print(f"[INFO] CN shard {shard}: {len(files)} of {len(all_files)} files")
+        config = current_config_state_cn(
+            section=section, offsets=doc_store_dir is not None, extract=extract, boilerplate=boilerplate
+        )
+        outputs = {"csv": output_csv, "json": output_json, "parquet": output_parquet, "matrix": output_matrix}
+        journal = None
+        if journal_path is not None:
+            journal_state = {**config, "stream": stream, "phrase_index": phrase_index is not None}
+            journal = RowJournal(journal_path, journal_state, resume=resume)
+
+        if stream:
+            columnar = ColumnarWriter(output_parquet, list(KEYWORDS_CN.keys())) if output_parquet else None
+            matrix = FlagMatrixWriter(output_matrix, list(KEYWORDS_CN.keys())) if output_matrix else None
+            with RowWriter(output_csv, output_json) as writer, columnar or nullcontext(), matrix or nullcontext():
+                failures = stream_files(
+                    files,
+                    MultiWriter(writer, columnar, matrix),
+                    cache=cache,
+                    refresh_cache=refresh_cache,
+                    workers=workers,
+                    process_func=stream_file_cn,
+                    process_options={"extract": extract},
+                    journal=journal,
+                )
+            if journal is not None:
+                journal.close()
+            if failures:
+                print(f"[WARN] {len(failures)} of {len(files)} CN files failed", file=sys.stderr)
+            print(f"[INFO] CN CSV results saved to: {writer.csv_path}")
+            if writer.json_path is not None:
+                print(f"[INFO] CN JSON results saved to: {writer.json_path}")
+            if columnar is not None:
+                print(f"[INFO] CN Columnar results saved to: {columnar.path} (evidence: {columnar.evidence_path})")
+            if matrix is not None:
+                print(f"[INFO] CN Flag matrix saved to: {matrix.path}")
+            if shard is not None:
+                info = write_shard_info(
+                    shard, "cn", all_files, files, failures, {**config, "stream": True}, KEYWORDS_CN, outputs
+                )
+                print(f"[INFO] CN shard info saved to: {info}")
+            return
+
+        process_options = {
+            "section": section,
+            "doc_store": DocumentStore(doc_store_dir) if doc_store_dir is not None else None,
+            "phrase_store": None,
+            "extract": extract,
+            "boilerplate": boilerplate,
+            "match_cache": MatchCache(match_cache) if match_cache is not None else None,
+        }
+        index = open_phrase_index(phrase_index, "cn", manifest_path is not None)
+        finalize_rows = None
+        if index is not None:
+            process_options["phrase_store"] = DocumentStore(phrase_store_dir)
+            finalize_rows = partial(index.add_rows, keywords=KEYWORDS_CN)
+        if manifest_path is not None:
+            all_rows, failures = process_files_incremental(
+                files,
+                RunManifest.load(manifest_path),
+                config,
+                list(KEYWORDS_CN.keys()),
+                build_row_func=build_row_cn,
+                cache=cache,
+                refresh_cache=refresh_cache,
+                workers=workers,
+                process_func=process_file_cn,
+                process_options=process_options,
+                finalize_rows=finalize_rows,
+                journal=journal,
+            )
+        else:
+            all_rows, failures = process_files(
+                files,
+                cache=cache,
+                refresh_cache=refresh_cache,
+                workers=workers,
+                process_func=process_file_cn,
+                process_options=process_options,
+                finalize_rows=finalize_rows,
+                journal=journal,
+            )
+        if journal is not None:
+            journal.close()
+        if failures:
+            print(f"[WARN] {len(failures)} of {len(files)} CN files failed", file=sys.stderr)
+        if boilerplate is not None:
+            report_boilerplate(all_rows)
+        if index is not None:
+            save_phrase_index(index, phrase_index, all_rows, KEYWORDS_CN)
+
+        with stage("write_csv"):
+            output_path = write_rows_csv(all_rows, output_csv)
+        print(f"[INFO] CN CSV results saved to: {output_path}")
 
-    company_texts = build_company_year_texts_cn(input_path)
+        if output_json is not None:
+            with stage("write_json"):
+                json_path = write_rows_json(all_rows, output_json)
+            print(f"[INFO] CN JSON results saved to: {json_path}")
 
-    all_rows = []
-    for company, year_dict in company_texts.items():
-        rows = process_company_item1s_cn(company, year_dict)
-        all_rows.extend(rows)
+        if output_parquet is not None:
+            with stage("write_columnar"), ColumnarWriter(output_parquet, list(KEYWORDS_CN.keys())) as columnar:
+                for row in all_rows:
+                    columnar.write(row)
+            print(f"[INFO] CN Columnar results saved to: {columnar.path} (evidence: {columnar.evidence_path})")
 
-    df = pd.DataFrame(all_rows)
-    output_path = Path(output_csv)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(output_path, index=False)
-    print(f"[INFO] CN CSV results saved to: {output_path}")
+        if output_matrix is not None:
+            with stage("write_matrix"), FlagMatrixWriter(output_matrix, list(KEYWORDS_CN.keys())) as matrix:
+                for row in all_rows:
+                    matrix.write(row)
+            print(f"[INFO] CN Flag matrix saved to: {matrix.path}")
 
-    if output_json is not None:
-        json_path = Path(output_json)
-        json_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(all_rows, f, indent=2, ensure_ascii=False)
-        print(f"[INFO] CN JSON results saved to: {json_path}")
+        if shard is not None:
+            info = write_shard_info(
+                shard, "cn", all_files, files, failures, {**config, "stream": False}, KEYWORDS_CN, outputs
+            )
+            print(f"[INFO] CN shard info saved to: {info}")
 
 
 def main():
@@ -105,9 +443,51 @@ def main():
         default="data/outputs/servitization_results_cn.json",
         help="Optional: path to save CN JSON results (with evidence)",
     )
+    add_cache_arguments(parser)
+    add_extract_arguments(parser)
+    add_workers_argument(parser)
+    add_incremental_arguments(parser)
+    add_section_argument(parser)
+    add_columnar_argument(parser)
+    add_matrix_argument(parser)
+    add_phrase_index_argument(parser)
+    add_evidence_arguments(parser)
+    add_profile_arguments(parser)
+    add_shard_argument(parser)
+    add_resume_arguments(parser)
+    add_boilerplate_arguments(parser)
+    add_match_cache_argument(parser)
 
     args = parser.parse_args()
-    run_pipeline_cn(args.input_dir, args.output_csv, args.output_json)
+    profile, trace = profile_paths_from_args(args)
+    try:
+        run_pipeline_cn(
+            args.input_dir,
+            args.output_csv,
+            args.output_json,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            refresh_cache=args.refresh_cache,
+            cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            workers=args.workers,
+            stream=args.stream,
+            manifest_path=manifest_path_from_args(args),
+            section=not args.full_text,
+            output_parquet=args.output_parquet,
+            doc_store_dir=doc_store_dir_from_args(args),
+            profile=profile,
+            trace=trace,
+            output_matrix=args.output_matrix,
+            phrase_index=args.phrase_index,
+            phrase_store_dir=args.doc_store,
+            extract=extract_options_from_args(args),
+            shard=shard_from_args(args),
+            journal_path=journal_path_from_args(args),
+            resume=args.resume,
+            boilerplate=boilerplate_from_args(args),
+            match_cache=args.match_cache,
+        )
+    except JournalError as exc:
+        raise SystemExit(f"[ERROR] {exc}") from None
 
 
 if __name__ == "__main__":